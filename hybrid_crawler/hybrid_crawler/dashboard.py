@@ -6,15 +6,21 @@ import subprocess
 import signal
 import psutil
 import re
+import json
+import hashlib
+import threading
+import math
+from datetime import datetime, timedelta
 from typing import List, Optional
 from collections import deque
 from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from sqlalchemy import create_engine, desc, func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, desc, func, select, literal
+from sqlalchemy.orm import sessionmaker, aliased
 
 # ==========================================
 # 路径配置
@@ -37,7 +43,10 @@ try:
     from hybrid_crawler.models import Base, init_db, SessionLocal
     from hybrid_crawler.models.crawl_status import CrawlStatus
     from hybrid_crawler.models.spider_progress import SpiderProgress # 新增
+    from hybrid_crawler.models.crawl_run import CrawlRun
+    from hybrid_crawler.models.crawl_metric_bucket import CrawlMetricBucket
     from hybrid_crawler.recrawl.manager import RecrawlManager  # 新增
+    from hybrid_crawler.utils.task_store import TaskStore, MissingIdStore
     from run import SPIDER_MAP
 except ImportError as e:
     print(f"⚠️ 导入警告: {e}")
@@ -45,17 +54,47 @@ except ImportError as e:
     SessionLocal = None
     CrawlStatus = None
     SpiderProgress = None
+    CrawlRun = None
+    CrawlMetricBucket = None
     RecrawlManager = None
+    from hybrid_crawler.utils.task_store import TaskStore, MissingIdStore
 
 app = FastAPI(title="Crawler Command Center")
 templates = Jinja2Templates(directory=template_path)
 
 # 内存中维护运行的进程
 RUNNING_PROCESSES = {}
-# 内存中维护运行的补采任务 (spider_name -> crawler_instance)
+# 内存中维护运行的补采任务 (spider_name -> crawler_instance)，任务结束即移除
 RECRAWL_TASKS = {}
-# 异步任务状态存储 (task_id -> status_dict)
-ASYNC_TASK_STATUS = {}
+# 异步任务状态存储 (task_id -> status_dict)：保留最近 DASHBOARD_TASK_MAX 个，已结束超过 DASHBOARD_TASK_TTL_SEC 秒的清理，落盘后重启可查
+TASK_DIR = os.getenv('DASHBOARD_TASK_DIR', os.path.join(log_dir, 'tasks'))
+ASYNC_TASK_STATUS = TaskStore(
+    os.path.join(TASK_DIR, 'tasks.json'),
+    max_tasks=int(os.getenv('DASHBOARD_TASK_MAX', 200)),
+    ttl=float(os.getenv('DASHBOARD_TASK_TTL_SEC', 86400)),
+)
+# 检查结果 (缺失 ID 及完整记录) 写入磁盘，补采时再读取；超过 DASHBOARD_MISSING_TTL_SEC 秒视为过期
+RECRAWL_MISSING_IDS = MissingIdStore(
+    os.path.join(TASK_DIR, 'missing'),
+    ttl=float(os.getenv('DASHBOARD_MISSING_TTL_SEC', 7 * 86400)),
+)
+MISSING_PAGE_SIZE = 50
+# 只读接口的短时缓存 (key -> {'expires': 过期时间, 'value': 数据})：多个 Dashboard 同时刷新时只查一次库
+API_CACHE = {}
+API_CACHE_LOCKS = {}
+API_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL_SEC', 2.0))
+# 日志流 (SSE)：日志文件轮询间隔、进度轮询间隔、心跳间隔 (秒)
+STREAM_LOG_POLL_SEC = float(os.getenv('DASHBOARD_STREAM_LOG_POLL_SEC', 0.5))
+STREAM_PROGRESS_POLL_SEC = float(os.getenv('DASHBOARD_STREAM_PROGRESS_POLL_SEC', 2.0))
+STREAM_HEARTBEAT_SEC = 15
+# 新连接首次推送的日志尾部大小 / 单次最多读取的新增字节
+STREAM_TAIL_BYTES = 1024 * 20
+STREAM_READ_CHUNK = 1024 * 256
+# 爬虫进程写出的运行指标快照目录 (hybrid_crawler.extensions.MetricsExporter)，结束超过 METRICS_STALE_SEC 秒的快照不再输出
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(log_dir, 'metrics'))
+METRICS_STALE_SEC = int(os.getenv('METRICS_STALE_SEC', 300))
+# 最近状态查询的时间窗口 (天)：条件落在分区键 created_at 上，只扫描当前分区
+STATUS_RECENT_DAYS = int(os.getenv('DASHBOARD_STATUS_RECENT_DAYS', 7))
 
 class SpiderTask(BaseModel):
     spiders: List[str]
@@ -66,56 +105,131 @@ class RecrawlRequest(BaseModel):
 # ==========================================
 # 智能日志分析器
 # ==========================================
+# 日志进度解析规则：爬虫名关键字 -> 规则
+#   page:    行内匹配 [当前/总数]，取最新一次
+#   counter: total 匹配总数，step 每出现一次计 1
+LOG_PROGRESS_PATTERNS = {
+    # Log: 📄 药品列表页面 [1/33]
+    'fujian': {'kind': 'page', 'pattern': re.compile(r'\[(\d+)/(\d+)\]'), 'label': 'Page'},
+    # Log: 加载关键词: 146 个 ... 正在采集关键词: 片
+    'hainan': {
+        'kind': 'counter',
+        'total': re.compile(r'加载关键词[:：]\s*(\d+)'),
+        'step': re.compile(r'正在采集关键词'),
+        'label': 'Keyword',
+    },
+}
+# 未命中爬虫名时的通用规则：日志中出现过 "分页" 才按分页进度展示
+DEFAULT_LOG_PROGRESS_PATTERN = {
+    'kind': 'page', 'pattern': re.compile(r'\[(\d+)/(\d+)\]'), 'label': 'Page', 'activate': re.compile(r'分页'),
+}
+
 class LogParser:
-    """解析日志以提取进度信息"""
-    
+    """
+    增量日志进度解析器 (每个爬虫一个实例，见 get_log_parser)
+    - 记住文件偏移与 inode，每次只解析新增的行，计数器常驻内存
+    - RotatingFileHandler 轮转后先读完旧文件 (.1) 的剩余部分，再从新文件开头继续，计数不丢失
+    - 同一 inode 的文件变小 (Dashboard 重启爬虫时以 w 模式重建日志) 视为新一次运行，计数清零
+    """
+    READ_CHUNK = 1024 * 1024
+
+    def __init__(self, spider_name, log_file):
+        self.spider_name = spider_name
+        self.log_file = log_file
+        self.rule = self.match_rule(spider_name)
+        self.lock = threading.Lock()
+        self._reset(None)
+
     @staticmethod
-    def parse_progress(spider_name, log_content):
+    def match_rule(spider_name):
+        for key, rule in LOG_PROGRESS_PATTERNS.items():
+            if key in spider_name:
+                return rule
+        return DEFAULT_LOG_PROGRESS_PATTERN
+
+    def _reset(self, inode):
+        self.inode = inode
+        self.offset = 0
+        self.partial = b""
+        self.active = 'activate' not in self.rule
+        self.current = 0
+        self.total = 0
+
+    def update(self):
         """
-        根据不同的爬虫日志模式，提取进度
+        解析自上次调用以来新增的日志
         返回: (progress_percent, current, total, status_text)
         """
-        if not log_content:
-            return 0, 0, 0, "Waiting for logs..."
-
-        lines = log_content.split('\n')
-        last_lines = lines[-50:] # 只分析最近50行，提高效率
-        full_text = "\n".join(lines) # 全文用于搜索初始化信息
-
-        # 模式1: 福建药店 (分页模式 [1/33])
-        # Log: 📄 药品列表页面 [1/33]
-        if "fujian" in spider_name or "分页" in log_content:
-            # 搜索总页数 (从后往前找最新的进度)
-            for line in reversed(last_lines):
-                match = re.search(r'\[(\d+)/(\d+)\]', line)
-                if match:
-                    current, total = map(int, match.groups())
-                    if total > 0:
-                        return round((current / total) * 100, 1), current, total, f"Page {current}/{total}"
-        
-        # 模式2: 海南药店 (关键词模式)
-        # Log: 加载关键词: 146 个 ... 正在采集关键词: 片
-        if "hainan" in spider_name:
-            # 1. 找总数
-            total = 0
-            total_match = re.search(r'加载关键词[:：]\s*(\d+)', full_text)
-            if total_match:
-                total = int(total_match.group(1))
-            
-            # 2. 找当前进度 (统计"正在采集关键词"出现的次数)
-            # 注意：这种方式在日志被截断时可能不准，但在 tail 模式下我们尽量读取足够多
-            # 更准确的方法是找最后一次出现的关键词索引，但这里简化处理
-            if total > 0:
-                # 统计已完成的关键词数量（简单通过日志行数估算，或者需在日志中打印进度索引）
-                # 假设日志里每处理一个关键词会打印 "正在采集关键词"
-                current = len(re.findall(r'正在采集关键词', full_text))
-                # 修正：防止 current > total (重试可能导致日志重复)
-                current = min(current, total)
-                return round((current / total) * 100, 1), current, total, f"Keyword {current}/{total}"
-
-        # 模式3: 通用模式 (根据 Scraped items 估算，或者无法计算)
+        with self.lock:
+            try:
+                st = os.stat(self.log_file)
+            except OSError:
+                return 0, 0, 0, "Waiting for logs..."
+            if self.inode is not None and st.st_ino != self.inode:
+                # 发生轮转：旧文件已改名为 .1
+                self._consume_rotated()
+                self.offset, self.partial = 0, b""
+            elif st.st_size < self.offset:
+                self._reset(st.st_ino)
+            self.inode = st.st_ino
+            self._consume(self.log_file)
+            return self.result()
+
+    def _consume_rotated(self):
+        rotated = f"{self.log_file}.1"
+        try:
+            if os.stat(rotated).st_ino == self.inode:
+                self._consume(rotated)
+        except OSError:
+            pass
+
+    def _consume(self, path):
+        with open(path, 'rb') as f:
+            f.seek(self.offset)
+            while True:
+                data = f.read(self.READ_CHUNK)
+                if not data:
+                    break
+                self.offset += len(data)
+                lines = (self.partial + data).split(b"\n")
+                self.partial = lines.pop()
+                for line in lines:
+                    self._feed(line.decode('utf-8', errors='ignore'))
+
+    def _feed(self, line):
+        rule = self.rule
+        if not self.active and rule['activate'].search(line):
+            self.active = True
+        if rule['kind'] == 'page':
+            match = rule['pattern'].search(line)
+            if match:
+                current, total = map(int, match.groups())
+                if total > 0:
+                    self.current, self.total = current, total
+        else:
+            match = rule['total'].search(line)
+            if match:
+                self.total = int(match.group(1))
+            elif rule['step'].search(line):
+                self.current += 1
+
+    def result(self):
+        if self.active and self.total > 0:
+            # 防止 current > total (重试可能导致日志重复)
+            current = min(self.current, self.total)
+            return round((current / self.total) * 100, 1), current, self.total, f"{self.rule['label']} {current}/{self.total}"
+        # 通用模式 (无法计算)
         return 0, 0, 0, "Running..."
 
+# spider_name -> LogParser
+LOG_PARSERS = {}
+
+def get_log_parser(spider_name):
+    parser = LOG_PARSERS.get(spider_name)
+    if parser is None:
+        parser = LOG_PARSERS[spider_name] = LogParser(spider_name, os.path.join(log_dir, f"{spider_name}.log"))
+    return parser
+
 # ==========================================
 # API 接口
 # ==========================================
@@ -124,62 +238,106 @@ class LogParser:
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+# ==========================================
+# 查询缓存与 ETag
+# ==========================================
+async def cached_query(key, loader, ttl=None):
+    """
+    在线程池中执行同步查询 loader (不阻塞事件循环)，结果缓存 ttl 秒
+    缓存过期时并发请求等待同一次查询，不会各自打到数据库
+    """
+    ttl = API_CACHE_TTL if ttl is None else ttl
+    entry = API_CACHE.get(key)
+    if entry and entry['expires'] > time.monotonic():
+        return entry['value']
+    lock = API_CACHE_LOCKS.setdefault(key, asyncio.Lock())
+    async with lock:
+        entry = API_CACHE.get(key)
+        if entry and entry['expires'] > time.monotonic():
+            return entry['value']
+        value = await run_in_threadpool(loader)
+        API_CACHE[key] = {'expires': time.monotonic() + ttl, 'value': value}
+        return value
+
+def etag_response(request: Request, payload):
+    """按响应内容生成 ETag；与 If-None-Match 一致时返回 304，浏览器复用本地副本"""
+    body = json.dumps(payload, ensure_ascii=False, default=str, separators=(',', ':'))
+    etag = f'"{hashlib.md5(body.encode("utf-8")).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def load_spider_snapshot():
+    """
+    每个爬虫最近一次运行 (crawl_run 汇总表) 与实时进度 (spider_progress 快照)，各一次查询取回
+    返回纯字典，结果可跨请求缓存
+    """
+    latest_runs = {}
+    progress_map = {}
+    if not SessionLocal:
+        return latest_runs, progress_map
+    db = SessionLocal()
+    try:
+        if CrawlRun:
+            latest_ids = db.query(func.max(CrawlRun.id)).group_by(CrawlRun.spider_name)
+            for r in db.query(CrawlRun).filter(CrawlRun.id.in_(latest_ids)):
+                latest_runs[r.spider_name] = {
+                    "items": r.items_stored,
+                    "errors": r.error_count,
+                    "throughput": r.items_per_second,
+                    "last_run": r.start_time.strftime("%Y-%m-%d %H:%M") if r.start_time else "-"
+                }
+        if SpiderProgress:
+            for p in db.query(SpiderProgress):
+                progress_map[p.spider_name] = {"status": p.status, "progress_percent": p.progress_percent}
+    finally:
+        db.close()
+    return latest_runs, progress_map
+
 @app.get("/api/spiders")
-async def get_spiders():
+async def get_spiders(request: Request):
     """获取爬虫列表及简要状态"""
     spiders_list = []
-    db = SessionLocal() if SessionLocal else None
-    
-    try:
-        for name in SPIDER_MAP.keys():
-            status = "stopped"
-            pid = None
-            
-            # 1. 检查进程状态
-            if name in RUNNING_PROCESSES:
-                proc = RUNNING_PROCESSES[name]
-                if proc.poll() is None:
-                    status = "running"
-                    pid = proc.pid
-                else:
-                    del RUNNING_PROCESSES[name]
-            
-            # 2. 从 DB 获取最后一次运行统计
-            last_stats = {}
-            if db and CrawlStatus:
-                latest_log = db.query(CrawlStatus).filter(
-                    CrawlStatus.spider_name == name
-                ).order_by(desc(CrawlStatus.start_time)).first()
-                if latest_log:
-                    last_stats = {
-                        "items": latest_log.items_stored,
-                        "last_run": latest_log.start_time.strftime("%Y-%m-%d %H:%M") if latest_log.start_time else "-"
-                    }
-            
-            # 3. 尝试从实时进度表获取更准确的状态
-            if db and SpiderProgress:
-                progress = db.query(SpiderProgress).filter_by(spider_name=name).first()
-                if progress:
-                     # 如果进程在跑，但 DB 显示 error，可能需要注意
-                     if status == "running" and progress.status == "error":
-                         status = "warning"
-                     # 如果 DB 显示 running 但进程没了，那是意外退出
-                     elif status == "stopped" and progress.status == "running":
-                         # 这里可以尝试重置 DB 状态，或者显示 "dead"
-                         pass
-                     
-                     if progress.progress_percent > 0:
-                         last_stats["progress"] = f"{progress.progress_percent}%"
-
-            spiders_list.append({
-                "name": name, 
-                "status": status, 
-                "pid": pid,
-                "stats": last_stats
-            })
-    finally:
-        if db: db.close()
-    return {"spiders": spiders_list}
+    latest_runs, progress_map = await cached_query("spiders", load_spider_snapshot)
+
+    for name in SPIDER_MAP.keys():
+        status = "stopped"
+        pid = None
+        
+        # 1. 检查进程状态 (内存数据，不缓存)
+        if name in RUNNING_PROCESSES:
+            proc = RUNNING_PROCESSES[name]
+            if proc.poll() is None:
+                status = "running"
+                pid = proc.pid
+            else:
+                del RUNNING_PROCESSES[name]
+        
+        # 2. 最后一次运行统计
+        last_stats = dict(latest_runs.get(name) or {})
+        
+        # 3. 尝试从实时进度表获取更准确的状态
+        progress = progress_map.get(name)
+        if progress:
+            # 如果进程在跑，但 DB 显示 error，可能需要注意
+            if status == "running" and progress["status"] == "error":
+                status = "warning"
+            # 如果 DB 显示 running 但进程没了，那是意外退出
+            elif status == "stopped" and progress["status"] == "running":
+                # 这里可以尝试重置 DB 状态，或者显示 "dead"
+                pass
+
+            if progress["progress_percent"] > 0:
+                last_stats["progress"] = f"{progress['progress_percent']}%"
+
+        spiders_list.append({
+            "name": name, 
+            "status": status, 
+            "pid": pid,
+            "stats": last_stats
+        })
+    return etag_response(request, {"spiders": spiders_list})
 
 @app.post("/api/start")
 async def start_spiders(task: SpiderTask):
@@ -230,14 +388,232 @@ async def stop_spider(task: SpiderTask):
             stopped.append(name)
     return {"status": "ok", "stopped": stopped}
 
+# ==========================================
+# 任务树 (按 parent_crawl_id 逐层展开)
+# ==========================================
+TREE_PAGE_SIZE = 50
+TREE_MAX_PAGE_SIZE = 500
+
+def tree_node(log, child_count=0):
+    """CrawlStatus 行 -> 任务树节点；children 由前端展开时按需加载"""
+    return {
+        "id": log.crawl_id,
+        "parent_id": log.parent_crawl_id,
+        "stage": log.stage,
+        "status": "success" if log.success else "error",
+        "progress": f"{log.page_no}/{log.total_pages}" if log.total_pages else f"{log.page_no}",
+        "info": f"Found: {log.items_found} | Stored: {log.items_stored}",
+        "timestamp": log.start_time.strftime("%H:%M:%S") if log.start_time else "",
+        "error": log.error_message,
+        "child_count": child_count,
+        "children": []
+    }
+
+def latest_tree_root(db, name):
+    """最近一次运行的根 crawl_id (crawl_run.run_id 与爬虫的 crawl_id 一致)"""
+    if not CrawlRun:
+        return None
+    run = db.query(CrawlRun.run_id).filter(CrawlRun.spider_name == name)\
+        .order_by(desc(CrawlRun.id)).first()
+    return run[0] if run else None
+
+def count_children(db, name, crawl_ids):
+    if not crawl_ids:
+        return {}
+    rows = db.query(CrawlStatus.parent_crawl_id, func.count(CrawlStatus.id))\
+        .filter(CrawlStatus.spider_name == name, CrawlStatus.parent_crawl_id.in_(crawl_ids))\
+        .group_by(CrawlStatus.parent_crawl_id).all()
+    return dict(rows)
+
+def load_tree_children(db, name, parent, offset=0, limit=TREE_PAGE_SIZE):
+    """
+    parent 的直接子节点 (一页)，附带每个子节点的子节点数
+    查询走 (spider_name, parent_crawl_id) 复合索引，与运行规模无关
+    """
+    limit = max(1, min(limit, TREE_MAX_PAGE_SIZE))
+    base = db.query(CrawlStatus).filter(
+        CrawlStatus.spider_name == name, CrawlStatus.parent_crawl_id == parent
+    )
+    total = base.count()
+    rows = base.order_by(CrawlStatus.id).offset(offset).limit(limit).all()
+    counts = count_children(db, name, [r.crawl_id for r in rows])
+    return {
+        "parent": parent,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "nodes": [tree_node(r, counts.get(r.crawl_id, 0)) for r in rows]
+    }
+
+def load_subtree(db, name, root, max_depth=3, max_nodes=TREE_MAX_PAGE_SIZE):
+    """
+    递归 CTE 一次取回 root 以下 max_depth 层 (最多 max_nodes 个节点) 并组装为嵌套结构
+    超出上限时 truncated=True，未展开的节点仍可用 load_tree_children 按需加载
+    """
+    tree = select(CrawlStatus.id, CrawlStatus.crawl_id, literal(1).label("depth"))\
+        .where(CrawlStatus.spider_name == name, CrawlStatus.parent_crawl_id == root)\
+        .cte("task_tree", recursive=True)
+    child = aliased(CrawlStatus)
+    tree = tree.union_all(
+        select(child.id, child.crawl_id, tree.c.depth + 1)
+        .where(child.spider_name == name, child.parent_crawl_id == tree.c.crawl_id, tree.c.depth < max_depth)
+    )
+    rows = db.query(CrawlStatus, tree.c.depth).join(tree, CrawlStatus.id == tree.c.id)\
+        .order_by(tree.c.depth, CrawlStatus.id).limit(max_nodes + 1).all()
+    truncated = len(rows) > max_nodes
+    rows = rows[:max_nodes]
+
+    # 子节点总数另查 (最深一层及被截断的节点，已取回的子节点只是一部分)，便于前端继续展开
+    counts = count_children(db, name, [log.crawl_id for log, _ in rows])
+    nodes = {}
+    roots = []
+    for log, depth in rows:
+        node = nodes[log.crawl_id] = tree_node(log, counts.get(log.crawl_id, 0))
+        parent = nodes.get(log.parent_crawl_id)
+        if parent is not None:
+            parent["children"].append(node)
+        elif depth == 1:
+            roots.append(node)
+    return {"root": root, "truncated": truncated, "nodes": roots}
+
+@app.get("/api/spider/{name}/tree")
+async def get_task_tree(name: str, parent: Optional[str] = None, offset: int = 0, limit: int = TREE_PAGE_SIZE):
+    """
+    任务树分页接口：返回 parent 的直接子节点
+    parent 为空时取最近一次运行的根 (运行的 crawl_id)，即列表页层
+    """
+    if not (SessionLocal and CrawlStatus):
+        return {"parent": parent, "total": 0, "nodes": []}
+
+    def load():
+        db = SessionLocal()
+        try:
+            root = parent or latest_tree_root(db, name)
+            if not root:
+                return {"parent": None, "total": 0, "offset": offset, "limit": limit, "nodes": []}
+            return load_tree_children(db, name, root, max(offset, 0), limit)
+        finally:
+            db.close()
+    return await run_in_threadpool(load)
+
+@app.get("/api/spider/{name}/tree/{crawl_id}/subtree")
+async def get_task_subtree(name: str, crawl_id: str, max_depth: int = 3, max_nodes: int = TREE_MAX_PAGE_SIZE):
+    """一次取回 crawl_id 以下多层子树 (递归 CTE)"""
+    if not (SessionLocal and CrawlStatus):
+        return {"root": crawl_id, "truncated": False, "nodes": []}
+
+    def load():
+        db = SessionLocal()
+        try:
+            return load_subtree(db, name, crawl_id, max(1, min(max_depth, 10)),
+                                max(1, min(max_nodes, TREE_MAX_PAGE_SIZE)))
+        finally:
+            db.close()
+    return await run_in_threadpool(load)
+
+def load_monitor_snapshot(name, tree_limit=TREE_PAGE_SIZE):
+    """
+    单个爬虫监控数据的数据库部分：实时进度、最近一次运行的任务树第一层、分层最新状态
+    同步查询，由接口放入线程池执行
+    """
+    snapshot = {
+        "progress": 0,
+        "current": 0,
+        "total": 0,
+        "status_text": "Initializing...",
+        "detail": {},
+        "task_tree": [],
+        "tree_root": None,
+        "task_tree_total": 0,
+    }
+    detail = snapshot["detail"]
+    db = SessionLocal()
+    try:
+        # 进度信息
+        sp = db.query(SpiderProgress).filter_by(spider_name=name).first()
+        if sp:
+            snapshot["progress"] = sp.progress_percent
+            snapshot["current"] = sp.completed_tasks
+            snapshot["total"] = sp.total_tasks
+            snapshot["status_text"] = sp.current_item or sp.status
+        
+        recent_since = datetime.now() - timedelta(days=STATUS_RECENT_DAYS)
+
+        # --- 任务树 (Task Tree): 最近一次运行的第一层 ---
+        if CrawlStatus:
+            tree_root = snapshot["tree_root"] = latest_tree_root(db, name)
+            if tree_root:
+                page = load_tree_children(db, name, tree_root, 0, tree_limit)
+                snapshot["task_tree"] = page["nodes"]
+                snapshot["task_tree_total"] = page["total"]
+        
+        # 分层状态信息 (保留旧逻辑以兼容)
+        if CrawlStatus:
+            # 1. 列表层 (List Page) - 主任务
+            latest_list = db.query(CrawlStatus).filter_by(spider_name=name, stage='list_page')\
+                .filter(CrawlStatus.created_at >= recent_since)\
+                .order_by(desc(CrawlStatus.id)).first()
+            
+            if latest_list:
+                detail['list_layer'] = {
+                    "api_url": latest_list.api_url,
+                    "params": latest_list.params,
+                    "items_found": latest_list.items_found,
+                    "items_stored": latest_list.items_stored,
+                    "page_no": latest_list.page_no,
+                    "total_pages": latest_list.total_pages,
+                    "timestamp": latest_list.start_time.strftime("%H:%M:%S") if latest_list.start_time else ""
+                }
+            
+            # 2. 详情层 (Detail Page) - 子任务
+            latest_detail = db.query(CrawlStatus).filter_by(spider_name=name, stage='detail_page')\
+                .filter(CrawlStatus.created_at >= recent_since)\
+                .order_by(desc(CrawlStatus.id)).first()
+                
+            if latest_detail:
+                detail['detail_layer'] = {
+                    "api_url": latest_detail.api_url,
+                    "params": latest_detail.params,
+                    "items_found": latest_detail.items_found,
+                    "items_stored": latest_detail.items_stored,
+                    "page_no": latest_detail.page_no,
+                    "total_pages": latest_detail.total_pages,
+                    "error_message": latest_detail.error_message,
+                    "timestamp": latest_detail.start_time.strftime("%H:%M:%S") if latest_detail.start_time else ""
+                }
+            
+            # 兼容旧逻辑的 fallback (如果只查到一条，或者作为总体概览)
+            if not latest_list and not latest_detail:
+                 latest_any = db.query(CrawlStatus).filter_by(spider_name=name)\
+                     .filter(CrawlStatus.created_at >= recent_since)\
+                     .order_by(desc(CrawlStatus.id)).first()
+                 if latest_any:
+                     detail['general'] = {
+                         "stage": latest_any.stage,
+                         "api_url": latest_any.api_url,
+                         "items_stored": latest_any.items_stored
+                     }
+
+    except Exception as e:
+        snapshot["status_text"] = f"DB Error: {str(e)}"
+    finally:
+        db.close()
+    return snapshot
+
 @app.get("/api/spider/{name}/monitor")
-async def get_spider_monitor(name: str):
-    """获取单个爬虫的实时监控数据（日志+进度）"""
+async def get_spider_monitor(name: str, include_logs: bool = True, tree_limit: int = TREE_PAGE_SIZE):
+    """
+    获取单个爬虫的实时监控数据（日志+进度）
+    已订阅 /api/spider/{name}/stream 的页面传 include_logs=false，日志改由 SSE 增量推送
+    任务树只返回最近一次运行的第一层 (tree_limit 个)，子节点通过 /api/spider/{name}/tree 按需展开
+    """
     log_file = os.path.join(log_dir, f"{name}.log")
     
     # 1. 读取日志 (读取最后 10KB) - 保持不变，用于 Debug
     log_content = ""
-    if os.path.exists(log_file):
+    if not include_logs:
+        pass
+    elif os.path.exists(log_file):
         try:
             with open(log_file, 'rb') as f:
                 f.seek(0, 2)
@@ -253,132 +629,18 @@ async def get_spider_monitor(name: str):
     else:
         log_content = "Waiting for logs... (Log file not created yet)"
 
-    # 2. 从 DB 获取精准进度
-    progress = 0
-    current = 0
-    total = 0
-    status_text = "Initializing..."
-    last_status_detail = {}
-    task_tree = []
-    
+    # 2. 从 DB 获取精准进度 (同步查询放入线程池，不阻塞事件循环)
     if SessionLocal and SpiderProgress:
-        db = SessionLocal()
-        try:
-            # 进度信息
-            sp = db.query(SpiderProgress).filter_by(spider_name=name).first()
-            if sp:
-                progress = sp.progress_percent
-                current = sp.completed_tasks
-                total = sp.total_tasks
-                status_text = sp.current_item or sp.status
-            
-            # --- 构建任务树 (Task Tree) ---
-            if CrawlStatus:
-                # 获取最近的 100 条记录
-                recent_logs = db.query(CrawlStatus).filter_by(spider_name=name)\
-                    .order_by(desc(CrawlStatus.id)).limit(200).all()
-                
-                # 1. 将记录按 parent_crawl_id 分组
-                nodes = {}
-                children_map = {}
-                
-                for log in recent_logs:
-                    # 简化节点信息
-                    node = {
-                        "id": log.crawl_id,
-                        "parent_id": log.parent_crawl_id,
-                        "stage": log.stage,
-                        "status": "success" if log.success else "error",
-                        "progress": f"{log.page_no}/{log.total_pages}" if log.total_pages > 0 else f"{log.page_no}",
-                        "info": f"Found: {log.items_found} | Stored: {log.items_stored}",
-                        "timestamp": log.start_time.strftime("%H:%M:%S") if log.start_time else "",
-                        "error": log.error_message,
-                        "children": []
-                    }
-                    nodes[log.crawl_id] = node
-                    
-                    pid = log.parent_crawl_id
-                    if pid:
-                        if pid not in children_map: children_map[pid] = []
-                        children_map[pid].append(node)
-                
-                # 2. 组装树 (自底向上或者自顶向下)
-                # 由于我们只查了最近 N 条，可能找不到 Root，所以我们将所有 parent_id 在本次查询中找不到的节点视为 "Visible Root"
-                
-                visible_roots = []
-                for log in recent_logs:
-                    node = nodes[log.crawl_id]
-                    # 如果有子节点，挂载上去
-                    if log.crawl_id in children_map:
-                        node['children'] = children_map[log.crawl_id]
-                    
-                    # 判断是否为当前视图的根
-                    # 如果没有 parent_id，或者 parent_id 不在本次查出来的节点中
-                    if not log.parent_crawl_id or log.parent_crawl_id not in nodes:
-                        visible_roots.append(node)
-                
-                # 去重 (因为 recent_logs 是按 ID 倒序的，我们可能重复添加了)
-                # 这里的逻辑有点乱，简化一下：
-                # 我们只遍历 visible_roots，但是 visible_roots 可能包含同一个树的多个分支（如果根节点太老没查出来）
-                # 为了展示美观，我们只取最顶层的
-                
-                unique_roots = {}
-                for r in visible_roots:
-                    if r['id'] not in unique_roots:
-                        unique_roots[r['id']] = r
-                
-                task_tree = list(unique_roots.values())
-            
-            # 分层状态信息 (保留旧逻辑以兼容)
-            if CrawlStatus:
-                # 1. 列表层 (List Page) - 主任务
-                latest_list = db.query(CrawlStatus).filter_by(spider_name=name, stage='list_page')\
-                    .order_by(desc(CrawlStatus.id)).first()
-                
-                if latest_list:
-                    last_status_detail['list_layer'] = {
-                        "api_url": latest_list.api_url,
-                        "params": latest_list.params,
-                        "items_found": latest_list.items_found,
-                        "items_stored": latest_list.items_stored,
-                        "page_no": latest_list.page_no,
-                        "total_pages": latest_list.total_pages,
-                        "timestamp": latest_list.start_time.strftime("%H:%M:%S") if latest_list.start_time else ""
-                    }
-                
-                # 2. 详情层 (Detail Page) - 子任务
-                latest_detail = db.query(CrawlStatus).filter_by(spider_name=name, stage='detail_page')\
-                    .order_by(desc(CrawlStatus.id)).first()
-                    
-                if latest_detail:
-                    last_status_detail['detail_layer'] = {
-                        "api_url": latest_detail.api_url,
-                        "params": latest_detail.params,
-                        "items_found": latest_detail.items_found,
-                        "items_stored": latest_detail.items_stored,
-                        "page_no": latest_detail.page_no,
-                        "total_pages": latest_detail.total_pages,
-                        "error_message": latest_detail.error_message,
-                        "timestamp": latest_detail.start_time.strftime("%H:%M:%S") if latest_detail.start_time else ""
-                    }
-                
-                # 兼容旧逻辑的 fallback (如果只查到一条，或者作为总体概览)
-                if not latest_list and not latest_detail:
-                     latest_any = db.query(CrawlStatus).filter_by(spider_name=name).order_by(desc(CrawlStatus.id)).first()
-                     if latest_any:
-                         last_status_detail['general'] = {
-                             "stage": latest_any.stage,
-                             "api_url": latest_any.api_url,
-                             "items_stored": latest_any.items_stored
-                         }
-
-        except Exception as e:
-            status_text = f"DB Error: {str(e)}"
-        finally:
-            db.close()
+        snapshot = await run_in_threadpool(load_monitor_snapshot, name, tree_limit)
+        progress, current, total = snapshot["progress"], snapshot["current"], snapshot["total"]
+        status_text = snapshot["status_text"]
+        last_status_detail = snapshot["detail"]
+        task_tree, tree_root, task_tree_total = snapshot["task_tree"], snapshot["tree_root"], snapshot["task_tree_total"]
     else:
         # Fallback to log parser if DB not available
-        progress, current, total, status_text = LogParser.parse_progress(name, log_content)
+        progress, current, total, status_text = await run_in_threadpool(get_log_parser(name).update)
+        last_status_detail = {}
+        task_tree, tree_root, task_tree_total = [], None, 0
     
     # 3. 判断运行状态
     is_running = False
@@ -394,21 +656,385 @@ async def get_spider_monitor(name: str):
         "status_text": status_text,
         "detail": last_status_detail,
         "task_tree": task_tree, # 新增任务树
+        "task_tree_root": tree_root,
+        "task_tree_total": task_tree_total,
         "logs": log_content
     }
 
-@app.get("/api/dashboard/stats")
-async def get_stats():
-    # 简化的统计接口
-    if not SessionLocal: return {}
+# ==========================================
+# 日志与进度流 (SSE)
+# ==========================================
+def read_log_tail(log_file, size=STREAM_TAIL_BYTES):
+    """读取日志末尾 size 字节，返回 (文本, 文件大小)"""
+    if not os.path.exists(log_file):
+        return "", 0
+    with open(log_file, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        f.seek(max(file_size - size, 0))
+        return f.read().decode('utf-8', errors='ignore'), file_size
+
+def load_spider_progress(name):
+    """spider_progress 中单个爬虫的进度快照"""
+    if not (SessionLocal and SpiderProgress):
+        return {}
+    db = SessionLocal()
+    try:
+        sp = db.query(SpiderProgress).filter_by(spider_name=name).first()
+        if not sp:
+            return {}
+        return {
+            "progress": sp.progress_percent,
+            "current_step": sp.completed_tasks,
+            "total_steps": sp.total_tasks,
+            "status_text": sp.current_item or sp.status,
+        }
+    finally:
+        db.close()
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+class SpiderStream:
+    """
+    单个爬虫的共享日志/进度流
+    - 一个后台任务按字节偏移增量读取日志文件 (轮询文件大小，无新内容时不读文件)，
+      并按 STREAM_PROGRESS_POLL_SEC 查询一次进度，只推送变化的字段
+    - 订阅者只持有一个队列：同一爬虫无论打开多少个页面，文件读取与数据库查询都只有一份
+    - 最后一个订阅者断开后后台任务退出
+    """
+    QUEUE_SIZE = 500
+
+    def __init__(self, name):
+        self.name = name
+        self.log_file = os.path.join(log_dir, f"{name}.log")
+        self.subscribers = set()
+        self.task = None
+        self.offset = None
+        self.partial = b""
+        self.progress = {}
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self.task:
+            self.task.cancel()
+            self.task = None
+            SPIDER_STREAMS.pop(self.name, None)
+
+    def snapshot(self):
+        return {"progress": dict(self.progress), "is_running": self._is_running()}
+
+    def _is_running(self):
+        proc = RUNNING_PROCESSES.get(self.name)
+        return proc is not None and proc.poll() is None
+
+    def _publish(self, event, data):
+        message = format_sse(event, data)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 客户端消费过慢：丢弃本条，不阻塞其他订阅者
+                pass
+
+    def _read_new_lines(self):
+        """从上次偏移处读取新增内容，返回完整的行；文件被截断 (爬虫重启覆盖日志) 时从头读取"""
+        try:
+            size = os.path.getsize(self.log_file)
+        except OSError:
+            return [], False
+        if self.offset is None:
+            # 首次：从当前末尾开始，历史部分由订阅时的快照提供
+            self.offset = size
+            return [], False
+        reset = size < self.offset
+        if reset:
+            self.offset, self.partial = 0, b""
+        if size == self.offset:
+            return [], reset
+        with open(self.log_file, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(STREAM_READ_CHUNK)
+        self.offset += len(data)
+        data = self.partial + data
+        lines = data.split(b"\n")
+        self.partial = lines.pop()
+        return [line.decode('utf-8', errors='ignore') for line in lines], reset
+
+    async def _run(self):
+        last_progress_poll = 0.0
+        last_running = None
+        while self.subscribers:
+            lines, reset = await run_in_threadpool(self._read_new_lines)
+            if reset:
+                self._publish("reset", {})
+            if lines:
+                self._publish("log", {"lines": lines})
+
+            now = time.monotonic()
+            if now - last_progress_poll >= STREAM_PROGRESS_POLL_SEC:
+                last_progress_poll = now
+                try:
+                    progress = await run_in_threadpool(load_spider_progress, self.name)
+                except Exception as e:
+                    progress = {"status_text": f"DB Error: {e}"}
+                delta = {k: v for k, v in progress.items() if self.progress.get(k) != v}
+                running = self._is_running()
+                if running != last_running:
+                    delta["is_running"] = running
+                    last_running = running
+                if delta:
+                    self.progress.update(progress)
+                    self._publish("progress", delta)
+            await asyncio.sleep(STREAM_LOG_POLL_SEC)
+
+# spider_name -> SpiderStream
+SPIDER_STREAMS = {}
+
+async def sse_events(name, initial, extra=None):
+    """
+    订阅爬虫日志流并输出 SSE 事件
+    :param initial: 连接建立时先发送的 (event, data) 列表
+    :param extra: 每个周期调用一次的函数，返回需要额外推送的 (event, data) 列表或 None (结束流)
+    """
+    stream = SPIDER_STREAMS.get(name)
+    if stream is None:
+        stream = SPIDER_STREAMS[name] = SpiderStream(name)
+    queue = stream.subscribe()
+    try:
+        for event, data in initial:
+            yield format_sse(event, data)
+        last_sent = time.monotonic()
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=1.0)
+                last_sent = time.monotonic()
+            except asyncio.TimeoutError:
+                pass
+            if extra:
+                events = extra()
+                if events is None:
+                    break
+                for event, data in events:
+                    yield format_sse(event, data)
+                    last_sent = time.monotonic()
+            if time.monotonic() - last_sent >= STREAM_HEARTBEAT_SEC:
+                # 注释行作为心跳，防止代理断开空闲连接
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+    finally:
+        stream.unsubscribe(queue)
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/api/spider/{name}/stream")
+async def stream_spider(name: str):
+    """
+    SSE: 推送爬虫日志新增行与进度变化
+    事件: snapshot (连接时的日志尾部与进度) / log (新增行) / progress (变化字段) / reset (日志文件被重建)
+    """
+    logs, _ = await run_in_threadpool(read_log_tail, os.path.join(log_dir, f"{name}.log"))
+    stream = SPIDER_STREAMS.get(name)
+    snapshot = stream.snapshot() if stream else {"progress": {}, "is_running": False}
+    if not snapshot["progress"]:
+        snapshot["progress"] = await run_in_threadpool(load_spider_progress, name)
+        snapshot["is_running"] = name in RUNNING_PROCESSES and RUNNING_PROCESSES[name].poll() is None
+    snapshot["logs"] = logs
+    return StreamingResponse(
+        sse_events(name, [("snapshot", snapshot)]),
+        media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+# ==========================================
+# 运行指标 (Prometheus 文本格式)
+# ==========================================
+# 瞬时值 (gauge) 的 stats 键：内存、耗时、缓冲深度、在途批次、Sink 积压 / 滞后 / 吞吐、比例与速率；scrapy_up 亦为 gauge
+GAUGE_STATS = re.compile(
+    r'(^memusage/|^elapsed_time_seconds$|^up$|_last$|_max$|_depth$|_ratio$|_per_second$'
+    r'|/inflight$|/pending$|/lag_seconds$|/throughput$)'
+)
+
+def metric_name(key):
+    """stats 键 -> Prometheus 指标名，如 downloader/response_status_count/200 -> scrapy_downloader_response_status_count_200"""
+    return "scrapy_" + re.sub(r'[^a-zA-Z0-9_]', '_', key).strip('_').lower()
+
+def metric_type(key):
+    """stats 键 -> Prometheus 类型：set_value / max_value 写入的瞬时值与区间速率为 gauge，其余累加计数为 counter"""
+    return "gauge" if GAUGE_STATS.search(key) else "counter"
+
+def load_metric_snapshots():
+    """读取所有爬虫进程的快照；进程已退出且快照过期的文件顺带删除"""
+    snapshots = []
+    if not os.path.isdir(METRICS_DIR):
+        return snapshots
+    now = time.time()
+    for filename in os.listdir(METRICS_DIR):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(METRICS_DIR, filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        alive = snapshot.get('status') == 'running' and psutil.pid_exists(snapshot.get('pid', -1))
+        if not alive and now - snapshot.get('updated_at', 0) > METRICS_STALE_SEC:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        snapshot['alive'] = alive
+        snapshots.append(snapshot)
+    return snapshots
+
+def render_metrics(snapshots):
+    """
+    每个进程的快照单独输出一组序列 (标签 spider + pid)，不跨进程相加：
+    重启后的新进程不会叠加旧进程的计数，buffer_depth 等瞬时值也不会被相加
+    """
+    series = {}
+    for snapshot in snapshots:
+        labels = (snapshot.get('spider') or 'unknown', str(snapshot.get('pid', '')))
+        values = dict(snapshot.get('stats', {}))
+        # 已结束进程的区间速率无意义，记为 0
+        alive = snapshot.get('alive')
+        values.update({k: v if alive else 0 for k, v in snapshot.get('rates', {}).items()})
+        values.update(snapshot.get('derived', {}))
+        values['up'] = 1 if alive else 0
+        for key, value in values.items():
+            name = metric_name(key)
+            entry = series.setdefault(name, {"type": metric_type(key), "samples": {}})
+            entry["samples"][labels] = value
+
+    lines = []
+    for name in sorted(series):
+        lines.append(f"# TYPE {name} {series[name]['type']}")
+        for (spider, pid), value in sorted(series[name]["samples"].items()):
+            label = spider.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'{name}{{spider="{label}",pid="{pid}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+@app.get("/metrics")
+async def get_metrics():
+    """汇总各爬虫进程的运行指标 (请求速率、下载耗时、重试、写入缓冲深度、刷新耗时、去重率等)"""
+    snapshots = await cached_query("metrics", load_metric_snapshots)
+    return PlainTextResponse(render_metrics(snapshots), media_type="text/plain; version=0.0.4")
+
+# ==========================================
+# 历史吞吐曲线 (crawl_metric_bucket 时间桶降采样)
+# ==========================================
+METRIC_COUNTERS = ('status_events', 'list_pages', 'detail_pages', 'items_found', 'items_stored', 'error_count')
+SERIES_MAX_POINTS = 1000
+
+def load_metric_series(spider, start, end, points):
+    """
+    读取 [start, end) 的分钟桶并降采样为不超过 points 个点 (步长为整分钟)
+    spider 为空时汇总所有爬虫；没有数据的时间段补 0，曲线连续
+    """
+    step = max(60, math.ceil((end - start).total_seconds() / points / 60) * 60)
+    columns = [func.sum(getattr(CrawlMetricBucket, c)) for c in METRIC_COUNTERS]
     db = SessionLocal()
     try:
-        total = db.query(func.sum(CrawlStatus.items_stored)).scalar() or 0
-        runs = db.query(func.count(CrawlStatus.crawl_id)).scalar() or 0
-        return {"total_items": total, "total_runs": runs, "chart_data": []}
+        query = db.query(CrawlMetricBucket.bucket_start, *columns)\
+            .filter(CrawlMetricBucket.bucket_start >= start, CrawlMetricBucket.bucket_start < end)
+        if spider:
+            query = query.filter(CrawlMetricBucket.spider_name == spider)
+        rows = query.group_by(CrawlMetricBucket.bucket_start).all()
     finally:
         db.close()
 
+    slots = math.ceil((end - start).total_seconds() / step)
+    series = [dict.fromkeys(METRIC_COUNTERS, 0) for _ in range(slots)]
+    for bucket_start, *values in rows:
+        index = min(int((bucket_start - start).total_seconds() // step), slots - 1)
+        for key, value in zip(METRIC_COUNTERS, values):
+            series[index][key] += int(value or 0)
+
+    minutes = step / 60
+    for index, point in enumerate(series):
+        point["time"] = (start + timedelta(seconds=index * step)).strftime("%Y-%m-%d %H:%M")
+        point["items_per_minute"] = round(point["items_stored"] / minutes, 2)
+        point["error_rate"] = round(point["error_count"] / point["status_events"], 4) if point["status_events"] else 0.0
+    return {"spider": spider, "step_seconds": step, "start": start, "end": end, "series": series}
+
+@app.get("/api/metrics/series")
+async def get_metric_series(spider: Optional[str] = None, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None, points: int = 200):
+    """
+    吞吐 / 错误率时间序列：默认最近 24 小时
+    每个点包含时间桶内的状态数、页数、发现/存储量、错误数、每分钟存储量与错误率
+    """
+    if not (SessionLocal and CrawlMetricBucket):
+        return {"spider": spider, "series": []}
+    # 默认截止到当前分钟桶 (含)
+    end = end or datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    start = start or end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start 必须早于 end")
+    points = max(1, min(points, SERIES_MAX_POINTS))
+    return await cached_query(
+        f"series:{spider}:{start:%Y%m%d%H%M}:{end:%Y%m%d%H%M}:{points}",
+        lambda: load_metric_series(spider, start, end, points)
+    )
+
+def load_run_history(spider, limit):
+    db = SessionLocal()
+    try:
+        query = db.query(CrawlRun)
+        if spider:
+            query = query.filter(CrawlRun.spider_name == spider)
+        runs = query.order_by(desc(CrawlRun.start_time)).limit(limit).all()
+        return [{
+            "run_id": r.run_id,
+            "spider_name": r.spider_name,
+            "start_time": r.start_time.strftime("%Y-%m-%d %H:%M") if r.start_time else None,
+            "duration_seconds": r.duration_seconds,
+            "items_stored": r.items_stored,
+            "items_per_second": r.items_per_second,
+            "error_count": r.error_count,
+            "error_rate": round(r.error_count / r.status_events, 4) if r.status_events else 0.0,
+        } for r in runs]
+    finally:
+        db.close()
+
+@app.get("/api/metrics/runs")
+async def get_run_history(spider: Optional[str] = None, limit: int = 20):
+    """按运行 (周任务) 对比耗时、吞吐与错误率，用于发现周与周之间的性能回退"""
+    if not (SessionLocal and CrawlRun):
+        return {"runs": []}
+    limit = max(1, min(limit, 500))
+    runs = await cached_query(f"runs:{spider}:{limit}", lambda: load_run_history(spider, limit))
+    return {"runs": runs}
+
+def load_dashboard_stats():
+    # 简化的统计接口：读取 crawl_run 汇总表 (每次运行一行)，不扫描 crawl_status
+    db = SessionLocal()
+    try:
+        total, runs, errors = db.query(
+            func.sum(CrawlRun.items_stored), func.count(CrawlRun.id), func.sum(CrawlRun.error_count)
+        ).one()
+    finally:
+        db.close()
+    chart_data = []
+    if CrawlMetricBucket:
+        # 最近 24 小时所有爬虫的吞吐 (30 分钟一个点)
+        end = datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+        chart_data = load_metric_series(None, end - timedelta(hours=24), end, 48)["series"]
+    return {"total_items": total or 0, "total_runs": runs or 0, "total_errors": errors or 0, "chart_data": chart_data}
+
+@app.get("/api/dashboard/stats")
+async def get_stats(request: Request):
+    if not SessionLocal: return {}
+    return etag_response(request, await cached_query("stats", load_dashboard_stats))
+
 @app.post("/api/db/reset")
 async def reset_db():
     if not SessionLocal: raise HTTPException(500, "No DB")
@@ -421,15 +1047,15 @@ async def reset_db():
         raise HTTPException(500, str(e))
 
 @app.get("/api/recrawl/check")
-async def check_recrawl_status():
-    """检查所有爬虫的缺失情况"""
+async def check_recrawl_status(refresh: bool = False):
+    """检查所有爬虫的缺失情况 (refresh=true 时不使用目录快照)"""
     if not RecrawlManager:
         return {"status": "error", "message": "RecrawlManager not available"}
 
     report = {}
     for name in RecrawlManager.list_spiders():
         try:
-            missing_data = await RecrawlManager.find_missing(name)
+            missing_data = await RecrawlManager.find_missing(name, refresh=refresh)
             report[name] = {
                 "spider_name": name,
                 "missing_count": len(missing_data),
@@ -464,14 +1090,9 @@ async def stop_recrawl(task: SpiderTask):
                 
     return {"status": "ok", "stopped": stopped}
 
-# 全局变量：存储检查结果（缺失的ID列表）
-RECRAWL_MISSING_IDS = {}  # {spider_name: set(missing_ids)}
-
 @app.get("/api/recrawl/check/{spider_name}")
-async def check_single_recrawl(spider_name: str, background_tasks: BackgroundTasks):
-    """检查特定爬虫的缺失情况 (异步执行)"""
-    global RECRAWL_MISSING_IDS, ASYNC_TASK_STATUS
-
+async def check_single_recrawl(spider_name: str, background_tasks: BackgroundTasks, refresh: bool = False):
+    """检查特定爬虫的缺失情况 (异步执行，refresh=true 时不使用目录快照)"""
     if not RecrawlManager:
         return {"status": "error", "message": "RecrawlManager not available"}
 
@@ -494,15 +1115,12 @@ async def check_single_recrawl(spider_name: str, background_tasks: BackgroundTas
         try:
             RECRAWL_TASKS[spider_name] = True
 
-            missing_ids = asyncio.run(RecrawlManager.find_missing(spider_name))
-            missing_count = len(missing_ids) if missing_ids else 0
+            missing_ids = asyncio.run(RecrawlManager.find_missing(spider_name, refresh=refresh))
 
-            # 保存检查结果，供补采时使用
-            RECRAWL_MISSING_IDS[spider_name] = missing_ids
-
-            # 将 ID 列表转换为 list，方便 JSON 序列化
-            missing_ids_list = list(missing_ids) if missing_ids else []
-            preview_ids = missing_ids_list[:50]  # 预览前50个
+            # 检查结果写入磁盘供补采时使用，内存中只保留第一页预览
+            missing_count = RECRAWL_MISSING_IDS.save(spider_name, missing_ids)
+            del missing_ids
+            preview_ids = RECRAWL_MISSING_IDS.page(spider_name, 0, MISSING_PAGE_SIZE)
 
             ASYNC_TASK_STATUS[task_id] = {
                 "type": "check",
@@ -511,7 +1129,7 @@ async def check_single_recrawl(spider_name: str, background_tasks: BackgroundTas
                 "message": f"发现 {missing_count} 条缺失数据",
                 "missing_count": missing_count,
                 "missing_ids": preview_ids,
-                "has_more": len(missing_ids_list) > 50
+                "has_more": missing_count > MISSING_PAGE_SIZE
             }
         except Exception as e:
             import traceback
@@ -531,6 +1149,23 @@ async def check_single_recrawl(spider_name: str, background_tasks: BackgroundTas
     return {"status": "ok", "task_id": task_id, "message": "检查任务已启动"}
 
 
+@app.get("/api/recrawl/missing/{spider_name}")
+async def get_missing_ids(spider_name: str, offset: int = 0, limit: int = MISSING_PAGE_SIZE):
+    """分页获取最近一次检查得到的缺失 ID"""
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), 1000)
+    total = await run_in_threadpool(RECRAWL_MISSING_IDS.count, spider_name)
+    ids = await run_in_threadpool(RECRAWL_MISSING_IDS.page, spider_name, offset, limit)
+    return {
+        "status": "ok",
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "missing_ids": ids,
+        "has_more": offset + len(ids) < total
+    }
+
+
 @app.get("/api/recrawl/task/{task_id}")
 async def get_task_status(task_id: str):
     """获取异步任务状态及日志"""
@@ -561,10 +1196,43 @@ async def get_task_status(task_id: str):
     return {"status": "ok", "task": task_info, "logs": logs}
 
 
+@app.get("/api/recrawl/task/{task_id}/stream")
+async def stream_task(task_id: str):
+    """
+    SSE: 推送补采任务状态变化与对应爬虫的日志新增行
+    事件: task (任务状态变化) / log / progress / reset；任务完成或失败后推送最终状态并结束
+    任务记录在推送期间被清理 (TTL / 容量淘汰) 时推送 interrupted 状态并结束，不再空转
+    """
+    task_info = ASYNC_TASK_STATUS.get(task_id)
+    if task_info is None:
+        raise HTTPException(404, "任务不存在")
+    spider_name = task_info.get("spider_name", "") or "_recrawl_all"
+    state = {"last": None, "done": False}
+
+    def task_events():
+        if state["done"]:
+            return None
+        task_info = ASYNC_TASK_STATUS.get(task_id)
+        if task_info is None:
+            state["done"] = True
+            return [("task", {"task_id": task_id, "status": "interrupted", "message": "任务记录已被清理，最终状态未知"})]
+        task_info = dict(task_info)
+        if task_info == state["last"]:
+            return []
+        state["last"] = task_info
+        state["done"] = task_info.get("status") in ("completed", "error", "interrupted")
+        return [("task", task_info)]
+
+    return StreamingResponse(
+        sse_events(spider_name, task_events() or [], task_events),
+        media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
 @app.get("/api/recrawl/tasks")
 async def get_all_tasks():
     """获取所有运行中的补采任务状态"""
-    running_tasks = {k: v for k, v in ASYNC_TASK_STATUS.items() if v.get("status") == "running"}
+    running_tasks = ASYNC_TASK_STATUS.running()
     active_crawlers = list(RECRAWL_TASKS.keys())
     return {
         "status": "ok",
@@ -576,8 +1244,6 @@ async def get_all_tasks():
 @app.post("/api/recrawl/start/{spider_name}")
 async def start_recrawl(spider_name: str, background_tasks: BackgroundTasks, body: RecrawlRequest = None):
     """开始特定爬虫的补采 - 使用检查时保存的缺失ID (异步执行)"""
-    global RECRAWL_MISSING_IDS, ASYNC_TASK_STATUS
-
     if not RecrawlManager:
         return {"status": "error", "message": "RecrawlManager not available"}
 
@@ -594,15 +1260,16 @@ async def start_recrawl(spider_name: str, background_tasks: BackgroundTasks, bod
     if body and body.missing_ids:
         missing_ids = body.missing_ids
         print(f"[{spider_name}] 使用用户提供的 {len(missing_ids)} 个ID进行补采")
-    # 2. 其次使用后端缓存的 ID
-    elif spider_name in RECRAWL_MISSING_IDS and RECRAWL_MISSING_IDS[spider_name]:
-        missing_ids = RECRAWL_MISSING_IDS[spider_name]
-        print(f"[{spider_name}] 使用缓存的 {len(missing_ids)} 个ID进行补采")
+    # 2. 其次使用检查时落盘的结果 (补采开始时才读取完整记录)
+    elif RECRAWL_MISSING_IDS.count(spider_name):
+        total_count = RECRAWL_MISSING_IDS.count(spider_name)
+        print(f"[{spider_name}] 使用已保存的 {total_count} 个ID进行补采")
     else:
         return {"status": "error", "message": "请先执行检查缺失数据，或直接提供 ID 列表"}
 
     task_id = f"recrawl_{spider_name}_{int(time.time())}"
-    total_count = len(missing_ids) if missing_ids else 0
+    if missing_ids is not None:
+        total_count = len(missing_ids)
 
     ASYNC_TASK_STATUS[task_id] = {
         "type": "recrawl",
@@ -616,10 +1283,11 @@ async def start_recrawl(spider_name: str, background_tasks: BackgroundTasks, bod
         try:
             RECRAWL_TASKS[spider_name] = True
 
-            collected = asyncio.run(RecrawlManager.recrawl(spider_name, missing_ids))
+            targets = missing_ids if missing_ids is not None else RECRAWL_MISSING_IDS.load(spider_name)
+            collected = asyncio.run(RecrawlManager.recrawl(spider_name, targets))
 
             # 补采完成后清除保存的缺失ID
-            RECRAWL_MISSING_IDS.pop(spider_name, None)
+            RECRAWL_MISSING_IDS.discard(spider_name)
 
             ASYNC_TASK_STATUS[task_id] = {
                 "type": "recrawl",
@@ -648,8 +1316,6 @@ async def start_recrawl(spider_name: str, background_tasks: BackgroundTasks, bod
 @app.post("/api/recrawl/start-all")
 async def start_all_recrawl(background_tasks: BackgroundTasks):
     """一键检查并补充采集所有爬虫 (异步执行)"""
-    global ASYNC_TASK_STATUS
-
     if not RecrawlManager:
         return {"status": "error", "message": "RecrawlManager not available"}
 
@@ -674,7 +1340,7 @@ async def start_all_recrawl(background_tasks: BackgroundTasks):
                     continue
 
                 # 更新状态
-                ASYNC_TASK_STATUS[task_id]["message"] = f"正在处理 {spider_name}..."
+                ASYNC_TASK_STATUS.update(task_id, message=f"正在处理 {spider_name}...")
 
                 RECRAWL_TASKS[spider_name] = True
 
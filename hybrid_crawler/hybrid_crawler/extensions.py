@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import logging
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+logger = logging.getLogger(__name__)
+
+class MetricsExporter:
+    """
+    【运行指标导出扩展】
+    作用：采集进行中定期把 crawler.stats (含批量写入 / 状态写入管道计数) 写为快照文件，
+    Dashboard 汇总所有爬虫进程的快照，在 /metrics 以 Prometheus 文本格式输出。
+    - 快照文件: METRICS_DIR/<爬虫名>-<pid>.json，先写临时文件再改名，读取方不会读到半个文件
+    - 热路径只在 response_received 中累加一次下载耗时，其余工作每 METRICS_INTERVAL_SEC 秒一次
+    """
+
+    def __init__(self, stats, metrics_dir, interval):
+        self.stats = stats
+        self.metrics_dir = metrics_dir
+        self.interval = interval
+        self.pid = os.getpid()
+        self.spider_name = None
+        self.path = None
+        self.loop = None
+        self.started = None
+        # 下载耗时 (download_latency) 累计
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.latency_max = 0.0
+        # 上一次快照的计数，用于计算区间速率
+        self.last_time = None
+        self.last_counts = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('METRICS_ENABLED', True):
+            raise NotConfigured
+        ext = cls(
+            crawler.stats,
+            settings.get('METRICS_DIR'),
+            settings.getfloat('METRICS_INTERVAL_SEC', 5.0),
+        )
+        if not ext.metrics_dir:
+            raise NotConfigured
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        return ext
+
+    def spider_opened(self, spider):
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        self.spider_name = spider.name
+        self.path = os.path.join(self.metrics_dir, f"{spider.name}-{self.pid}.json")
+        self.started = time.time()
+        self.last_time = self.started
+        self.loop = task.LoopingCall(self._write_snapshot)
+        self.loop.start(self.interval, now=True)
+
+    def spider_closed(self, spider, reason):
+        if self.loop and self.loop.running:
+            self.loop.stop()
+        self._write_snapshot(finished=True, reason=reason)
+
+    def response_received(self, response, request, spider):
+        latency = request.meta.get('download_latency')
+        if latency is None:
+            return
+        self.latency_sum += latency
+        self.latency_count += 1
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    def _numeric_stats(self):
+        """只导出数值型统计 (时间、字符串类统计跳过)"""
+        return {
+            key: value for key, value in self.stats.get_stats().items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+
+    def _rates(self, values, now):
+        """自上次快照以来的每秒速率"""
+        elapsed = max(now - self.last_time, 1e-6)
+        rates = {}
+        for name, key in (
+            ('requests_per_second', 'downloader/request_count'),
+            ('responses_per_second', 'downloader/response_count'),
+            ('items_per_second', 'item_scraped_count'),
+            ('retries_per_second', 'retry/count'),
+        ):
+            current = values.get(key, 0)
+            rates[name] = round((current - self.last_counts.get(key, 0)) / elapsed, 3)
+            self.last_counts[key] = current
+        self.last_time = now
+        return rates
+
+    def _derived(self, values):
+        derived = {
+            'response_latency_seconds_sum': round(self.latency_sum, 3),
+            'response_latency_seconds_count': self.latency_count,
+            'response_latency_seconds_max': round(self.latency_max, 3),
+        }
+        written = sum(values.get(f'batch_write/items_{k}', 0) for k in ('inserted', 'updated', 'ignored'))
+        if written:
+            # 去重率：写入批次中因已存在而被忽略的比例
+            derived['dedupe_ratio'] = round(values.get('batch_write/items_ignored', 0) / written, 4)
+        return derived
+
+    def _write_snapshot(self, finished=False, reason=None):
+        if not self.path:
+            return
+        now = time.time()
+        values = self._numeric_stats()
+        snapshot = {
+            'spider': self.spider_name,
+            'pid': self.pid,
+            'status': 'finished' if finished else 'running',
+            'reason': reason,
+            'start_time': self.started,
+            'updated_at': now,
+            'stats': values,
+            'rates': self._rates(values, now),
+            'derived': self._derived(values),
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️ 写入运行指标失败 ({self.path}): {e}")
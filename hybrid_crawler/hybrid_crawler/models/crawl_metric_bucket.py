@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, Integer, DateTime, UniqueConstraint
+from . import BaseModel
+
+class CrawlMetricBucket(BaseModel):
+    """
+    爬虫吞吐时间桶表 (每个爬虫每分钟一行)
+    由 CrawlStatusPipeline 随状态批次增量累加 (冲突时数值相加)；
+    Dashboard 的历史曲线从本表按需降采样，不扫描 crawl_status
+    """
+    __tablename__ = 'crawl_metric_bucket'
+    __table_args__ = (
+        UniqueConstraint('spider_name', 'bucket_start', name='uq_crawl_metric_bucket'),
+    )
+
+    spider_name = Column(String(64), nullable=False, comment="爬虫名称")
+    bucket_start = Column(DateTime, nullable=False, index=True, comment="时间桶起点 (整分钟)")
+
+    status_events = Column(Integer, default=0, comment="状态记录数")
+    list_pages = Column(Integer, default=0, comment="列表页数")
+    detail_pages = Column(Integer, default=0, comment="详情页数")
+    items_found = Column(Integer, default=0, comment="发现数据量")
+    items_stored = Column(Integer, default=0, comment="存储数据量")
+    error_count = Column(Integer, default=0, comment="错误数")
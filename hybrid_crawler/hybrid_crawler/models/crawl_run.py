@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, Integer, DateTime, Float, Text
+from . import BaseModel
+
+class CrawlRun(BaseModel):
+    """
+    爬虫运行汇总表 (Rollup)
+    每次爬虫运行一行，由 CrawlStatusPipeline 在内存中累计、随状态批次增量 Upsert；
+    Dashboard 的统计与列表接口只读本表，查询代价不随 crawl_status 增长
+    """
+    __tablename__ = 'crawl_run'
+
+    run_id = Column(String(64), nullable=False, unique=True, comment="运行ID (唯一键)")
+    spider_name = Column(String(64), nullable=False, index=True, comment="爬虫名称")
+    status = Column(String(32), default="running", comment="状态: running, finished")
+
+    # 时间
+    start_time = Column(DateTime, nullable=False, index=True, comment="开始时间")
+    end_time = Column(DateTime, nullable=True, comment="结束时间")
+    last_event_time = Column(DateTime, nullable=True, comment="最后一条状态时间")
+
+    # 累计统计
+    status_events = Column(Integer, default=0, comment="状态记录数")
+    list_pages = Column(Integer, default=0, comment="列表页数")
+    detail_pages = Column(Integer, default=0, comment="详情页数")
+    items_found = Column(Integer, default=0, comment="发现数据量")
+    items_stored = Column(Integer, default=0, comment="存储数据量")
+    error_count = Column(Integer, default=0, comment="错误数")
+    last_error = Column(Text, nullable=True, comment="最近一次错误信息")
+
+    # 吞吐 (items_stored / 运行秒数)
+    duration_seconds = Column(Float, default=0.0, comment="运行时长 (秒)")
+    items_per_second = Column(Float, default=0.0, comment="吞吐 (条/秒)")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, JSON, Text
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, JSON, Text, Index
 from sqlalchemy.sql import func
 from . import BaseModel
 
@@ -8,6 +8,10 @@ class CrawlStatus(BaseModel):
     用于数据完整性验证和遗漏分析
     """
     __tablename__ = 'crawl_status'
+    __table_args__ = (
+        # 任务树按父节点逐层展开 / 分页 (Dashboard /api/spider/{name}/tree)
+        Index('ix_crawl_status_spider_parent', 'spider_name', 'parent_crawl_id'),
+    )
     
     spider_name = Column(String(64), nullable=False, index=True, comment="爬虫名称")
     crawl_id = Column(String(64), nullable=False, index=True, comment="本次采集唯一标识")
@@ -55,7 +55,7 @@ class LiaoningDrug(BaseModel):
     id = Column(Integer, primary_key=True, autoincrement=True, comment="自增主键")
     
     # MD5唯一ID（对所有采集信息进行MD5计算）
-    md5_id = Column(String(32), comment="MD5唯一标识")
+    md5_id = Column(String(32), index=True, comment="MD5唯一标识")
     
     
     # 药品信息字段
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, Text
+from . import BaseModel
+
+class WriteDeadLetter(BaseModel):
+    """
+    写入死信表
+    批量写入时经二分隔离出的坏数据行，连同数据库报错一起保存，便于排查后重放
+    """
+    __tablename__ = 'write_dead_letter'
+
+    table_name = Column(String(128), nullable=False, index=True, comment="目标表名")
+    md5_id = Column(String(32), nullable=True, index=True, comment="数据行 md5_id")
+    payload = Column(Text, nullable=True, comment="数据行内容 (JSON)")
+    error_message = Column(Text, nullable=True, comment="数据库错误信息")
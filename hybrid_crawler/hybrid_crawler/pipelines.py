@@ -1,14 +1,21 @@
+import os
+import uuid
 import logging
 import time
-from twisted.internet import threads, defer
+import threading
+from datetime import datetime
+from twisted.internet import threads, defer, task
 from itemadapter import ItemAdapter
-from sqlalchemy.dialects.mysql import insert
 from sqlalchemy.sql import func
+from sqlalchemy.exc import IntegrityError, DataError
 from .models import SessionLocal
 from .models.crawl_status import CrawlStatus
 from .models.spider_progress import SpiderProgress
+from .models.crawl_run import CrawlRun
+from .models.crawl_metric_bucket import CrawlMetricBucket
 from .models.crawl_data import CrawlData # Fallback
 from .exceptions import DataValidationError
+from .utils.sql_dialect import upsert_statement
 
 logger = logging.getLogger(__name__)
 
@@ -30,34 +37,188 @@ class UniversalBatchWritePipeline:
     根据配置选择存储后端 (MySQL/ES)，并执行批量写入。
     """
     
-    def __init__(self, settings):
+    def __init__(self, settings, stats=None):
         self.buffer = []
         self.buffer_size = settings.getint('BUFFER_THRESHOLD', 500)
         self.timeout = settings.getfloat('BUFFER_TIMEOUT_SEC', 1.5)
         self.last_flush_time = time.time()
+        self.stats = stats
         
         # 使用 set 仅存储当前活跃的异步任务
         self.active_tasks = set()
+        # 同时进行的写入任务上限，超出后 process_item 返回 Deferred 形成背压
+        self.max_inflight = max(settings.getint('BUFFER_MAX_INFLIGHT', 4), 1)
+        # 因背压挂起的 Item Deferred，写入槽位空出后放行
+        self.waiters = []
+        # 周期性刷新定时器 (open_spider 时启动)，避免爬虫空闲时 Buffer 滞留
+        self.flush_loop = None
+
+        # md5_id 成员索引 (open_spider 时构建): {Model类: Md5MembershipIndex}
+        self.membership_enabled = settings.getbool('MEMBERSHIP_INDEX_ENABLED', False)
+        self.membership_fp_rate = settings.getfloat('MEMBERSHIP_INDEX_FP_RATE', 0.01)
+        self.membership_headroom = settings.getfloat('MEMBERSHIP_INDEX_HEADROOM', 0.2)
+        self.membership = {}
+        # 当前 Buffer 中已确认为新数据的 md5_id，随批次交给写入线程
+        self.buffer_known_new = set()
+        self.membership_stats = {'skipped_check': 0, 'possible_hit': 0}
         
-        # 初始化存储后端
-        backend_type = settings.get('STORAGE_BACKEND', 'mysql').lower()
-        logger.info(f"Initializing Storage Backend: {backend_type}")
+        # 本地预写日志 (open_spider 时按爬虫创建)
+        self.spool_enabled = settings.getbool('SPOOL_ENABLED', True)
+        self.spool_dir = settings.get('SPOOL_DIR')
+        self.spool_segment_bytes = settings.getint('SPOOL_SEGMENT_MB', 64) * 1024 * 1024
+        self.spool_fsync = settings.getbool('SPOOL_FSYNC', False)
+        self.spool_replay_on_start = settings.getbool('SPOOL_REPLAY_ON_START', True)
+        self.spool_replay_chunk = settings.getint('SPOOL_REPLAY_CHUNK', 5000)
+        self.spool = None
+        # 已写入但后端尚未持久化 (如 Parquet 文件未封存) 的 WAL 批次，持久化后统一确认
+        self.deferred_acks = []
+        self.ack_lock = threading.Lock()
         
+        # 初始化存储后端
+        self.storage = self.create_storage(settings)
+
+    @staticmethod
+    def create_storage(settings):
+        """
+        根据 STORAGE_BACKEND 创建存储后端 (WAL 重放脚本复用)
+        逗号分隔多个后端时创建扇出组合存储，第一个为主后端，例如 mysql,elasticsearch
+        """
+        backend_types = [b.strip().lower() for b in settings.get('STORAGE_BACKEND', 'mysql').split(',') if b.strip()]
+        logger.info(f"Initializing Storage Backend: {', '.join(backend_types)}")
+
+        if len(backend_types) == 1:
+            return UniversalBatchWritePipeline.create_backend(backend_types[0], settings)
+
+        from .storage.composite import CompositeStorage, StorageSink
+        sink_options = settings.getdict('STORAGE_SINK_OPTIONS')
+        sinks = []
+        for backend_type in backend_types:
+            options = sink_options.get(backend_type, {})
+            sinks.append(StorageSink(
+                backend_type,
+                UniversalBatchWritePipeline.create_backend(backend_type, settings),
+                batch_size=options.get('batch_size', settings.getint('STORAGE_SINK_BATCH_SIZE', 500)),
+                max_retries=options.get('max_retries', settings.getint('STORAGE_SINK_MAX_RETRIES', 3)),
+                retry_backoff=options.get('retry_backoff', settings.getfloat('STORAGE_SINK_RETRY_BACKOFF', 1.0)),
+                max_pending=options.get('max_pending', settings.getint('STORAGE_SINK_MAX_PENDING', 50000)),
+                linger_sec=options.get('linger_sec', settings.getfloat('STORAGE_SINK_LINGER_SEC', 5.0)),
+            ))
+        # 从 Sink 放弃的批次写入 SPOOL_DIR/<爬虫>/sink-<名称>/ 死信 WAL
+        dead_letter_dir = settings.get('SPOOL_DIR') if settings.getbool('SPOOL_ENABLED', True) else None
+        return CompositeStorage(sinks, dead_letter_dir=dead_letter_dir)
+
+    @staticmethod
+    def create_backend(backend_type, settings):
+        """创建单个存储后端"""
         if backend_type == 'elasticsearch':
             from .storage.elasticsearch import ElasticsearchStorage
-            self.storage = ElasticsearchStorage(
+            return ElasticsearchStorage(
                 hosts=settings.get('ES_HOSTS', ['http://localhost:9200']),
                 user=settings.get('ES_USER'),
                 password=settings.get('ES_PASSWORD'),
-                index_prefix=settings.get('ES_INDEX_PREFIX', 'drug_store')
+                index_prefix=settings.get('ES_INDEX_PREFIX', 'drug_store'),
+                bulk_mode=settings.get('ES_BULK_MODE', 'bulk'),
+                chunk_size=settings.getint('ES_BULK_CHUNK_SIZE', 500),
+                max_chunk_bytes=settings.getint('ES_BULK_MAX_CHUNK_MB', 10) * 1024 * 1024,
+                thread_count=settings.getint('ES_BULK_THREADS', 4),
+                max_retries=settings.getint('ES_BULK_MAX_RETRIES', 3),
+                initial_backoff=settings.getfloat('ES_BULK_INITIAL_BACKOFF', 2),
+                max_backoff=settings.getfloat('ES_BULK_MAX_BACKOFF', 60),
+                tune_for_bulk=settings.getbool('ES_TUNE_INDEX_FOR_BULK', False)
+            )
+        elif backend_type == 'parquet':
+            from .storage.parquet import ParquetStorage
+            return ParquetStorage(
+                root_dir=settings.get('PARQUET_DIR'),
+                compression=settings.get('PARQUET_COMPRESSION', 'zstd'),
+                row_groups_per_file=settings.getint('PARQUET_ROW_GROUPS_PER_FILE', 20)
+            )
+        elif backend_type == 'sqlite':
+            from .storage.sqlite import SQLiteStorage
+            return SQLiteStorage(
+                write_mode=settings.get('MYSQL_WRITE_MODE', 'orm'),
+                write_mode_overrides=settings.getdict('MYSQL_WRITE_MODE_OVERRIDES'),
+                bulk_chunk_size=settings.getint('MYSQL_BULK_CHUNK_SIZE', 500),
+                failure_isolation=settings.get('MYSQL_FAILURE_ISOLATION', 'bisect')
             )
         else:
             from .storage.mysql import MySQLStorage
-            self.storage = MySQLStorage()
+            return MySQLStorage(
+                write_mode=settings.get('MYSQL_WRITE_MODE', 'orm'),
+                write_mode_overrides=settings.getdict('MYSQL_WRITE_MODE_OVERRIDES'),
+                bulk_chunk_size=settings.getint('MYSQL_BULK_CHUNK_SIZE', 500),
+                failure_isolation=settings.get('MYSQL_FAILURE_ISOLATION', 'bisect')
+            )
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(settings=crawler.settings)
+        return cls(settings=crawler.settings, stats=crawler.stats)
+
+    def open_spider(self, spider):
+        """
+        启动周期刷新定时器；
+        在线程池中重放上次残留的 WAL、构建目标表的 md5_id 成员索引，完成后爬虫才开始产出
+        """
+        self.storage.open(spider.name)
+        self.flush_loop = task.LoopingCall(self._periodic_flush)
+        self.flush_loop.start(self.timeout, now=False)
+
+        if self.spool_enabled:
+            from .storage.spool import WriteAheadSpool
+            self.spool = WriteAheadSpool(
+                os.path.join(self.spool_dir, spider.name),
+                segment_bytes=self.spool_segment_bytes,
+                fsync=self.spool_fsync
+            )
+
+        model_classes = []
+        if self.membership_enabled and hasattr(self.storage, 'build_membership_index'):
+            model_classes = self._resolve_target_models(spider)
+        replay = self.spool_replay_on_start and (
+            (self.spool and self.spool.leftover_segments) or getattr(self.storage, 'dead_letter_segments', 0)
+        )
+        if not model_classes and not replay:
+            return None
+        return threads.deferToThread(self._prepare_storage, model_classes, replay)
+
+    def _prepare_storage(self, model_classes, replay):
+        # 先重放，成员索引才能包含重放写入的数据
+        if replay and self.spool and self.spool.leftover_segments:
+            logger.info(f"♻️ 发现 {len(self.spool.leftover_segments)} 个残留 WAL 段，开始重放...")
+            count = self.spool.replay(self.storage, chunk_size=self.spool_replay_chunk)
+            if count is not None:
+                logger.info(f"♻️ WAL 重放完成: {count} 条")
+        if replay and getattr(self.storage, 'dead_letter_segments', 0):
+            # 组合存储：从 Sink 上次放弃的批次只重放到对应后端
+            for name, count in self.storage.replay_dead_letters(self.spool_replay_chunk).items():
+                if count:
+                    logger.info(f"♻️ [{name}] 死信重放完成: {count} 条")
+        if model_classes:
+            self._build_membership(model_classes)
+
+    @staticmethod
+    def _resolve_target_models(spider):
+        """根据 spider.recrawl_config['table_name'] 找到目标 Model 类"""
+        from .models import Base
+        table_name = (getattr(spider, 'recrawl_config', None) or {}).get('table_name')
+        if not table_name:
+            return []
+        return [
+            mapper.class_ for mapper in Base.registry.mappers
+            if getattr(mapper.class_, '__tablename__', None) == table_name
+        ]
+
+    def _build_membership(self, model_classes):
+        for model_cls in model_classes:
+            try:
+                index = self.storage.build_membership_index(
+                    model_cls, fp_rate=self.membership_fp_rate, headroom=self.membership_headroom
+                )
+                if index:
+                    self.membership[model_cls] = index
+            except Exception as e:
+                # 构建失败不影响采集，退回到写入线程查重
+                logger.warning(f"⚠️ 构建 {model_cls.__tablename__} 成员索引失败，使用数据库查重: {e}")
 
     def process_item(self, item, spider):
         # 1. 过滤 None 或 状态 Item
@@ -67,13 +228,52 @@ class UniversalBatchWritePipeline:
 
         # 2. 添加到 Buffer
         self.buffer.append(item)
+        if self.membership:
+            self._check_membership(item)
 
         # 3. 检查是否满足写入条件
         if self._should_flush():
+            if len(self.active_tasks) >= self.max_inflight:
+                # 写入落后：返回 Deferred，Scrapy 暂停该 Item 的处理链，
+                # 积压达到 SCRAPER_SLOT_MAX_ACTIVE_SIZE 后不再向下游派发响应
+                self._inc_stat('batch_write/backpressure_count')
+                waiter = defer.Deferred()
+                waiter.addCallback(lambda _: item)
+                self.waiters.append(waiter)
+                return waiter
             self._trigger_flush()
 
         return item
 
+    def _periodic_flush(self):
+        """LoopingCall 回调：超时未写入的 Buffer 由定时器刷新，不依赖新 Item 到达"""
+        self._set_stat('batch_write/buffer_depth', len(self.buffer))
+        if len(self.active_tasks) < self.max_inflight and self._should_flush():
+            self._trigger_flush()
+        if hasattr(self.storage, 'get_sink_stats'):
+            # 组合存储：提交从 Sink 中滞留的缓冲，并刷新各 Sink 的滞后与吞吐
+            self.storage.flush_idle()
+            self._record_sink_stats()
+
+    def _check_membership(self, item):
+        """
+        成员索引预判：索引中一定不存在的 md5_id 标记为新数据，写入线程跳过查重；
+        可能存在的 (含误报) 仍由写入线程查库确认
+        """
+        model_cls = item.get_model_class() if hasattr(item, 'get_model_class') else None
+        index = self.membership.get(model_cls)
+        if index is None:
+            return
+        md5_id = ItemAdapter(item).get('md5_id')
+        if not md5_id:
+            return
+        if index.might_contain(md5_id):
+            self.membership_stats['possible_hit'] += 1
+        else:
+            index.add(md5_id)
+            self.buffer_known_new.add(md5_id)
+            self.membership_stats['skipped_check'] += 1
+
     def _should_flush(self):
         """判断是否需要刷新"""
         has_data = len(self.buffer) > 0
@@ -84,24 +284,68 @@ class UniversalBatchWritePipeline:
     def _trigger_flush(self):
         """触发异步写入任务"""
         items_to_write = self.buffer
+        known_new = self.buffer_known_new
         self.buffer = [] # 指向新列表
+        self.buffer_known_new = set()
         self.last_flush_time = time.time()
 
         if not items_to_write:
             return
 
         logger.debug(f"🚀 触发异步写入: {len(items_to_write)} 条")
-        df = threads.deferToThread(self._flush_buffer, items_to_write)
+        df = threads.deferToThread(self._flush_buffer, items_to_write, known_new)
         
         self.active_tasks.add(df)
+        self._set_stat('batch_write/buffer_depth', 0)
+        self._set_stat('batch_write/inflight', len(self.active_tasks))
+        df.addCallback(self._record_flush)
         df.addBoth(self._cleanup_task, df)
         df.addErrback(self._log_error)
 
+    def _record_flush(self, result):
+        """写入完成后在 reactor 线程中记录统计 (result 为 _flush_buffer 的返回值)"""
+        write_stats, latency, spool_failed = result
+        self._inc_stat('batch_write/flush_count')
+        if spool_failed:
+            self._inc_stat('batch_write/spool_append_failed')
+        self._set_stat('batch_write/flush_latency_last', round(latency, 3))
+        if self.stats:
+            self.stats.max_value('batch_write/flush_latency_max', round(latency, 3))
+        for key, value in (write_stats or {}).items():
+            self._inc_stat(f'batch_write/items_{key}', value)
+        return result
+
+    def _record_sink_stats(self):
+        """组合存储各 Sink 的累计写入量、积压、滞后秒数与吞吐: batch_write/sink/<name>/<key>"""
+        for name, sink_stats in self.storage.get_sink_stats().items():
+            for key, value in sink_stats.items():
+                self._set_stat(f'batch_write/sink/{name}/{key}', value)
+
     def _cleanup_task(self, result, df):
-        """任务完成后的清理回调"""
+        """任务完成后的清理回调，空出的写入槽位用于放行背压中的 Item"""
         self.active_tasks.discard(df)
+        self._set_stat('batch_write/inflight', len(self.active_tasks))
+        self._release_waiters()
         return result
 
+    def _release_waiters(self):
+        """写入槽位空出：先把积压的 Buffer 交给写入线程，再放行挂起的 Item"""
+        if not self.waiters or len(self.active_tasks) >= self.max_inflight:
+            return
+        if self.buffer:
+            self._trigger_flush()
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            waiter.callback(None)
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
+
+    def _set_stat(self, key, value):
+        if self.stats:
+            self.stats.set_value(key, value)
+
     def _log_error(self, failure):
         """错误日志回调"""
         logger.error(f"🔥 异步写入严重异常: {failure.getErrorMessage()}")
@@ -111,138 +355,472 @@ class UniversalBatchWritePipeline:
     def close_spider(self, spider):
         """优雅关闭"""
         logger.info(f"⏳ 爬虫关闭中... 剩余 Buffer: {len(self.buffer)} | 进行中任务: {len(self.active_tasks)}")
+
+        if self.flush_loop and self.flush_loop.running:
+            self.flush_loop.stop()
         
         if self.buffer:
             self._trigger_flush()
+
+        # 关闭阶段不再限流，放行所有挂起的 Item
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            waiter.callback(None)
         
         if self.active_tasks:
             yield defer.DeferredList(list(self.active_tasks))
+
+        # 关闭存储后端 (组合存储在此等待从 Sink 写完积压数据，Parquet 在此封存文件)
+        yield threads.deferToThread(self.storage.close)
+        if hasattr(self.storage, 'get_sink_stats'):
+            self._record_sink_stats()
+
+        if self.spool:
+            self._ack_durable()
+            if self.spool.pending_batches:
+                logger.warning(
+                    f"⚠️ {self.spool.pending_batches} 个批次未能落库，已保留在 WAL ({self.spool.directory})，下次启动时重放"
+                )
+            self.spool.close()
+
+        if self.membership:
+            logger.info(
+                f"🔎 成员索引: 跳过查重 {self.membership_stats['skipped_check']} 条 | "
+                f"可能重复 {self.membership_stats['possible_hit']} 条"
+            )
             
         logger.info("✅ Pipeline 关闭完成：所有数据已安全落库。")
 
-    def _flush_buffer(self, items):
-        """执行数据库写入（运行在线程池中）"""
+    def _ack_durable(self, batch_id=None):
+        """
+        确认 WAL 批次：后端已持久化 (is_durable) 时确认本批及此前暂存的批次，否则暂存
+        暂存的批次都在本次检查之前写入，检查为 True 时它们必然已落盘
+        """
+        with self.ack_lock:
+            if batch_id is not None:
+                self.deferred_acks.append(batch_id)
+            if not self.deferred_acks or not self.storage.is_durable():
+                return
+            batch_ids, self.deferred_acks = self.deferred_acks, []
+            for deferred_id in batch_ids:
+                self.spool.ack(deferred_id)
+
+    def _flush_buffer(self, items, known_new=None):
+        """执行数据库写入（运行在线程池中），返回 (写入统计, 耗时秒, WAL 是否追加失败)"""
+        start = time.time()
+        stats = None
+        batch_id = None
+        spool_failed = False
+        # 写库前先落盘 WAL，写库成功后确认；WAL 只是兜底，追加失败 (磁盘满、无权限) 仍照常写库
+        if self.spool:
+            try:
+                batch_id = self.spool.append(items)
+            except Exception as e:
+                spool_failed = True
+                logger.error(f"⚠️ WAL 追加失败，本批 {len(items)} 条直接写库 (不受 WAL 保护): {e}")
         try:
-            count = self.storage.save_batch(items)
-            logger.info(f"💾 批量写入成功: {count} 条 (新增)")
+            stats = self.storage.save_batch_stats(items, known_new=known_new)
+            if batch_id is not None:
+                self._ack_durable(batch_id)
+            logger.info(
+                f"💾 批量写入成功: 新增 {stats['inserted']} 条 | 更新 {stats['updated']} 条 | 忽略 {stats['ignored']} 条"
+            )
         except Exception as e:
-            logger.error(f"⚠️ 批量写入失败: {e}")
+            if batch_id is not None:
+                logger.error(f"⚠️ 批量写入失败，{len(items)} 条已保留在 WAL 待重放: {e}")
+            else:
+                logger.error(f"⚠️ 批量写入失败: {e}")
+        return stats, time.time() - start, spool_failed
 
 
 class CrawlStatusPipeline:
     """
     爬虫状态记录管道
+    状态 Item 不再逐条开启事务：先进入内存队列并立即放行，由定时器 / 队列阈值触发多行批量写入 crawl_status；
+    实时进度 (含 items_scraped) 与本次运行汇总 (crawl_run) 在内存中累计，每个刷新周期各 Upsert 一次；
+    每分钟吞吐 (crawl_metric_bucket) 在内存中按时间桶累计增量，刷新时累加写入
     """
-    
+    BUCKET_COUNTERS = ('status_events', 'list_pages', 'detail_pages', 'items_found', 'items_stored', 'error_count')
+
+    def __init__(self, settings=None, stats=None):
+        self.stats = stats
+        self.batch_size = settings.getint('STATUS_BATCH_SIZE', 200) if settings else 200
+        self.interval = settings.getfloat('STATUS_FLUSH_INTERVAL_SEC', 2.0) if settings else 2.0
+        # 写入失败的行放回队列重试，队列超过上限时丢弃最早的行
+        self.max_queue = settings.getint('STATUS_QUEUE_MAX', 10000) if settings else 10000
+        # 待写入的 crawl_status 行
+        self.queue = []
+        # 内存中的实时进度: {spider_name: SpiderProgress 列字典}
+        self.progress = {}
+        # 自上次刷新后有变化的爬虫
+        self.dirty = set()
+        # 本次运行汇总 (crawl_run 列字典)，open_spider 时创建
+        self.run = None
+        self.run_dirty = False
+        # 自上次刷新后的时间桶增量: {(spider_name, 整分钟): 计数字典}
+        self.buckets = {}
+        self.flushing = None
+        self.flush_loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(settings=crawler.settings, stats=crawler.stats)
+
+    def open_spider(self, spider):
+        now = datetime.now()
+        self.run = {
+            # 与爬虫的根 crawl_id 一致：状态记录的 parent_crawl_id 指向它，任务树以此为根
+            'run_id': getattr(spider, 'crawl_id', None) or uuid.uuid4().hex,
+            'spider_name': spider.name,
+            'status': 'running',
+            'start_time': now,
+            'end_time': None,
+            'last_event_time': now,
+            'status_events': 0,
+            'list_pages': 0,
+            'detail_pages': 0,
+            'items_found': 0,
+            'items_stored': 0,
+            'error_count': 0,
+            'last_error': None,
+        }
+        self.run_dirty = True
+        self.flush_loop = task.LoopingCall(self._periodic_flush)
+        self.flush_loop.start(self.interval, now=False)
+        # items_scraped 为该爬虫历史累计值：启动时查询一次作为基数，之后在内存中累加
+        return threads.deferToThread(self._seed_items_scraped, spider.name)
+
+    def _seed_items_scraped(self, spider_name):
+        session = SessionLocal()
+        try:
+            # 从 crawl_run 汇总：crawl_status 过期分区被删除后累计值不丢失
+            total = session.query(func.sum(CrawlRun.items_stored))\
+                .filter(CrawlRun.spider_name == spider_name).scalar() or 0
+            self._get_progress(spider_name)['items_scraped'] += int(total)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取 {spider_name} 历史采集量失败，items_scraped 从 0 开始累计: {e}")
+        finally:
+            session.close()
+
     def process_item(self, item, spider):
         # 检查是否为状态记录item
         if isinstance(item, dict) and item.get('_status_'):
-            return threads.deferToThread(self._save_status, item, spider)
+            self._enqueue_status(item, spider)
         return item
-    
-    def _save_status(self, status_item, spider):
-        """保存采集状态 (运行在线程池中)"""
+
+    def _enqueue_status(self, status_item, spider):
+        """记录状态行并更新内存进度 (reactor 线程，不访问数据库)"""
+        self.queue.append(self._build_status_row(status_item, spider))
+        self._update_progress(status_item, spider)
+        self._update_run(status_item)
+        self._update_bucket(status_item, spider)
+        self._inc_stat('crawl_status/queued')
+        if len(self.queue) >= self.batch_size and not self.flushing:
+            self._trigger_flush()
+
+    @staticmethod
+    def _build_status_row(status_item, spider):
+        """
+        状态 Item -> crawl_status 列字典 (所有行键一致，便于多行 INSERT)
+        入队时记录事件时间：批量写入 / 失败重试时的入库时间不代表状态发生时间 (created_at 亦为分区键)
+        """
+        now = datetime.now()
+        return {
+            'start_time': now,
+            'created_at': now,
+            'updated_at': now,
+            'spider_name': status_item.get('spider_name', spider.name),
+            'crawl_id': status_item.get('crawl_id'),
+            'stage': status_item.get('stage'),
+            'page_no': status_item.get('page_no', 1),
+            'total_pages': status_item.get('total_pages', 0),
+            'page_size': status_item.get('page_size', 0),
+            'items_found': status_item.get('items_found', 0),
+            'items_stored': status_item.get('items_stored', 0),
+            'params': status_item.get('params'),
+            'api_url': status_item.get('api_url'),
+            'success': status_item.get('success', True),
+            'error_message': status_item.get('error_message'),
+            'parent_crawl_id': status_item.get('parent_crawl_id'),
+            'reference_id': status_item.get('reference_id'),
+        }
+
+    def _get_progress(self, spider_name):
+        progress = self.progress.get(spider_name)
+        if progress is None:
+            progress = self.progress[spider_name] = {
+                'spider_name': spider_name,
+                'run_id': 'unknown',
+                'status': 'running',
+                'completed_tasks': 0,
+                'total_tasks': 0,
+                'progress_percent': 0.0,
+                'current_stage': 'unknown',
+                'current_item': None,
+                'items_scraped': 0,
+            }
+        return progress
+
+    def _update_progress(self, item, spider):
+        """
+        在内存中更新爬虫实时进度，由 _flush_status 统一 Upsert 到 spider_progress
+        """
+        spider_name = item.get('spider_name', spider.name)
+        is_new = spider_name not in self.progress
+        progress = self._get_progress(spider_name)
+
+        progress['run_id'] = item.get('crawl_id', 'unknown')
+        progress['status'] = 'running' if item.get('success', True) else 'error'
+        progress['current_stage'] = item.get('stage', 'unknown')
+        progress['items_scraped'] += item.get('items_stored', 0) or 0
+
+        # 关键修改：只有 list_page 阶段才更新主进度
+        # 这样可以避免 detail_page 的进度 (如 1/1) 覆盖了 list_page 的总进度 (如 8/33)
+        current_stage = item.get('stage', '')
+        if is_new or 'list' in current_stage or current_stage == 'start_requests':
+            progress['completed_tasks'] = item.get('page_no', 1)
+            progress['total_tasks'] = item.get('total_pages', 0)
+            if progress['total_tasks'] > 0:
+                progress['progress_percent'] = round((progress['completed_tasks'] / progress['total_tasks']) * 100, 2)
+            else:
+                progress['progress_percent'] = 0.0
+
+        # 构建描述信息
+        desc = f"Stage: {progress['current_stage']}"
+        page_no, total_pages = item.get('page_no', 1), item.get('total_pages', 0)
+        if total_pages > 0:
+            desc += f" | Page {page_no}/{total_pages}"
+        if item.get('error_message'):
+            desc += f" | Error: {item.get('error_message')}"
+        progress['current_item'] = desc[:255]
+
+        self.dirty.add(spider_name)
+
+    def _update_run(self, item):
+        """累计本次运行汇总"""
+        if self.run is None:
+            return
+        run = self.run
+        stage = item.get('stage') or ''
+        run['status_events'] += 1
+        run['last_event_time'] = datetime.now()
+        run['items_found'] += item.get('items_found', 0) or 0
+        run['items_stored'] += item.get('items_stored', 0) or 0
+        if 'list' in stage:
+            run['list_pages'] += 1
+        elif 'detail' in stage:
+            run['detail_pages'] += 1
+        if not item.get('success', True):
+            run['error_count'] += 1
+            run['last_error'] = item.get('error_message')
+        self.run_dirty = True
+
+    def _update_bucket(self, item, spider):
+        """累计当前分钟时间桶的增量"""
+        now = datetime.now()
+        key = (item.get('spider_name', spider.name), now.replace(second=0, microsecond=0))
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = dict.fromkeys(self.BUCKET_COUNTERS, 0)
+        stage = item.get('stage') or ''
+        bucket['status_events'] += 1
+        bucket['items_found'] += item.get('items_found', 0) or 0
+        bucket['items_stored'] += item.get('items_stored', 0) or 0
+        if 'list' in stage:
+            bucket['list_pages'] += 1
+        elif 'detail' in stage:
+            bucket['detail_pages'] += 1
+        if not item.get('success', True):
+            bucket['error_count'] += 1
+
+    def _run_snapshot(self):
+        """当前运行汇总 (含运行时长与吞吐)"""
+        snapshot = dict(self.run)
+        end = snapshot['end_time'] or snapshot['last_event_time']
+        duration = max((end - snapshot['start_time']).total_seconds(), 0.0)
+        snapshot['duration_seconds'] = round(duration, 3)
+        snapshot['items_per_second'] = round(snapshot['items_stored'] / duration, 3) if duration else 0.0
+        return snapshot
+
+    def _periodic_flush(self):
+        """LoopingCall 回调：上一轮写入未完成时跳过，积压留到下一轮"""
+        if not self.flushing and (self.queue or self.dirty or self.run_dirty or self.buckets):
+            self._trigger_flush()
+
+    def _trigger_flush(self):
+        rows, self.queue = self.queue, []
+        snapshots = [dict(self.progress[name]) for name in self.dirty]
+        self.dirty = set()
+        run = self._run_snapshot() if self.run and self.run_dirty else None
+        self.run_dirty = False
+        buckets = [
+            dict(counters, spider_name=spider_name, bucket_start=bucket_start)
+            for (spider_name, bucket_start), counters in self.buckets.items()
+        ]
+        self.buckets = {}
+        self.flushing = threads.deferToThread(self._flush_status, rows, snapshots, run, buckets)
+        self.flushing.addCallback(self._record_flush, snapshots, run, buckets)
+        self.flushing.addErrback(lambda f: logger.error(f"❌ 状态写入异常: {f.getErrorMessage()}"))
+        self.flushing.addBoth(self._flush_done)
+        return self.flushing
+
+    def _flush_done(self, _):
+        self.flushing = None
+
+    def _flush_status(self, rows, snapshots, run=None, buckets=None):
+        """
+        多行写入 crawl_status + 每个爬虫一次 spider_progress Upsert + crawl_run 汇总 Upsert
+        + 时间桶累加 Upsert (运行在线程池中)
+        个别行违反约束 (IntegrityError / DataError) 时二分隔离坏行，其余行照常写入；
+        连接中断等其他错误整批回滚，行由 _record_flush 放回队列，进度 / 汇总 / 时间桶增量合并回内存
+        返回 (写入行数, 丢弃行数, 需重新入队的行, 进度与汇总是否已提交)
+        """
         session = SessionLocal()
+        written, failed, requeue = 0, 0, rows
         try:
-            status = CrawlStatus(
-                spider_name=status_item.get('spider_name', spider.name),
-                crawl_id=status_item.get('crawl_id'),
-                stage=status_item.get('stage'),
-                page_no=status_item.get('page_no', 1),
-                total_pages=status_item.get('total_pages', 0),
-                page_size=status_item.get('page_size', 0),
-                items_found=status_item.get('items_found', 0),
-                items_stored=status_item.get('items_stored', 0),
-                params=status_item.get('params'),
-                api_url=status_item.get('api_url'),
-                success=status_item.get('success', True),
-                error_message=status_item.get('error_message'),
-                parent_crawl_id=status_item.get('parent_crawl_id'),
-                reference_id=status_item.get('reference_id')
-            )
-            session.add(status)
-            self._update_progress(session, status_item, spider)
-            session.commit()
+            try:
+                if rows:
+                    # executemany：SQLAlchemy 合并为多行 INSERT
+                    session.execute(CrawlStatus.__table__.insert(), rows)
+                self._upsert_summaries(session, snapshots, run, buckets)
+                session.commit()
+                return len(rows), 0, [], True
+            except (IntegrityError, DataError) as e:
+                session.rollback()
+                if not rows:
+                    raise
+                logger.warning(f"⚠️ 状态批量写入遇到数据错误，二分隔离坏行 ({len(rows)} 条): {getattr(e, 'orig', e)}")
+                failed = self._bisect_insert(session, rows, e)
+                written, requeue = len(rows) - failed, []
+                self._upsert_summaries(session, snapshots, run, buckets)
+                session.commit()
+                return written, failed, [], True
         except Exception as e:
             session.rollback()
-            logger.error(f"❌ 保存采集状态失败: {e}")
+            logger.error(f"❌ 保存采集状态失败 ({len(requeue)} 条待重试): {e}")
+            return written, failed, requeue, False
         finally:
             session.close()
-        return status_item
-        
-    def _update_progress(self, session, item, spider):
+
+    def _bisect_insert(self, session, rows, error):
+        """
+        rows 整体写入已因 error 失败：单行即为坏行 (丢弃)，否则对半拆分，两半分别写入并提交
+        返回丢弃行数
         """
-        更新爬虫实时进度表
-        使用 MySQL 原生 Upsert (INSERT ... ON DUPLICATE KEY UPDATE) 
+        if len(rows) == 1:
+            row = rows[0]
+            logger.error(f"❌ 丢弃无法写入的状态记录 {row.get('spider_name')}/{row.get('stage')}: {getattr(error, 'orig', error)}")
+            return 1
+        failed = 0
+        mid = len(rows) // 2
+        for part in (rows[:mid], rows[mid:]):
+            try:
+                session.execute(CrawlStatus.__table__.insert(), part)
+                session.commit()
+            except (IntegrityError, DataError) as e:
+                session.rollback()
+                failed += self._bisect_insert(session, part, e)
+        return failed
+
+    def _upsert_summaries(self, session, snapshots, run=None, buckets=None):
+        for data in snapshots:
+            self._upsert_progress(session, data)
+        if run:
+            self._upsert_run(session, run)
+        if buckets:
+            self._upsert_buckets(session, buckets)
+
+    @staticmethod
+    def _upsert_progress(session, data):
+        """
+        使用原生 Upsert (MySQL: ON DUPLICATE KEY UPDATE / SQLite: ON CONFLICT DO UPDATE)
         彻底解决并发下的唯一键冲突和事务回滚问题
         """
-        try:
-            spider_name = item.get('spider_name', spider.name)
-            run_id = item.get('crawl_id', 'unknown')
-            
-            # 1. 准备数据字典
-            data = {
-                'spider_name': spider_name,
-                'run_id': run_id,
-                'status': 'running' if item.get('success', True) else 'error',
-                'completed_tasks': item.get('page_no', 1),
-                'total_tasks': item.get('total_pages', 0),
-                'current_stage': item.get('stage', 'unknown'),
-                'updated_at': func.now()
-            }
+        update_columns = [
+            'run_id', 'status', 'current_stage', 'items_scraped', 'current_item',
+            'completed_tasks', 'total_tasks', 'progress_percent',
+        ]
+        upsert_stmt = upsert_statement(
+            session.get_bind().dialect.name, SpiderProgress.__table__,
+            dict(data, updated_at=func.now()),
+            index_elements=['spider_name'], update_columns=update_columns,
+            overrides={'updated_at': func.now()}
+        )
+        # 使用 execute 直接执行，绕过 ORM 对象缓存
+        session.execute(upsert_stmt)
 
-            # 2. 计算进度百分比
-            if data['total_tasks'] > 0:
-                data['progress_percent'] = round((data['completed_tasks'] / data['total_tasks']) * 100, 2)
-            else:
-                data['progress_percent'] = 0.0
-
-            # 3. 计算 items_scraped (仍然需要查询一次，但这是读操作，不会锁表太久)
-            # 注意：如果对性能要求极高，可以改为 Redis 计数或增量更新
-            total_items = session.query(func.sum(CrawlStatus.items_stored))\
-                .filter(CrawlStatus.spider_name == spider_name).scalar() or 0
-            data['items_scraped'] = total_items
-
-            # 4. 构建描述信息
-            desc = f"Stage: {data['current_stage']}"
-            if data['total_tasks'] > 0:
-                desc += f" | Page {data['completed_tasks']}/{data['total_tasks']}"
-            if item.get('error_message'):
-                desc += f" | Error: {item.get('error_message')}"
-            data['current_item'] = desc
-
-            # 5. 执行原子 Upsert
-            stmt = insert(SpiderProgress).values(data)
-            
-            # 指定发生冲突时需要更新的字段
-            # 注意：spider_name 是唯一键，作为冲突判断依据
-            update_dict = {
-                'run_id': stmt.inserted.run_id,
-                'status': stmt.inserted.status,
-                'current_stage': stmt.inserted.current_stage,
-                'items_scraped': stmt.inserted.items_scraped,
-                'current_item': stmt.inserted.current_item,
-                'updated_at': func.now()
-            }
+    @staticmethod
+    def _upsert_run(session, run):
+        """crawl_run 汇总为内存中的累计值，冲突时整行覆盖 (幂等)"""
+        update_columns = [c for c in run if c not in ('run_id', 'spider_name', 'start_time')]
+        session.execute(upsert_statement(
+            session.get_bind().dialect.name, CrawlRun.__table__, run,
+            index_elements=['run_id'], update_columns=update_columns,
+            overrides={'updated_at': func.now()}
+        ))
 
-            # 关键修改：只有 list_page 阶段才更新主进度
-            # 这样可以避免 detail_page 的进度 (如 1/1) 覆盖了 list_page 的总进度 (如 8/33)
-            current_stage = item.get('stage', '')
-            if 'list' in current_stage or current_stage == 'start_requests':
-                 update_dict.update({
-                    'completed_tasks': stmt.inserted.completed_tasks,
-                    'total_tasks': stmt.inserted.total_tasks,
-                    'progress_percent': stmt.inserted.progress_percent,
-                 })
-            
-            upsert_stmt = stmt.on_duplicate_key_update(**update_dict)
-            
-            # 使用 execute 直接执行，绕过 ORM 对象缓存
-            session.execute(upsert_stmt)
-            
-        except Exception as e:
-            logger.error(f"⚠️ 更新实时进度失败: {e}")
-            # 不抛出异常，保证主流程继续
+    @classmethod
+    def _upsert_buckets(cls, session, buckets):
+        """时间桶为本周期增量，冲突时在原值上累加"""
+        session.execute(upsert_statement(
+            session.get_bind().dialect.name, CrawlMetricBucket.__table__, buckets,
+            index_elements=['spider_name', 'bucket_start'], update_columns=[],
+            overrides={'updated_at': func.now()}, increment_columns=cls.BUCKET_COUNTERS
+        ))
+
+    def _record_flush(self, result, snapshots, run, buckets):
+        written, failed, requeue, committed = result
+        self._inc_stat('crawl_status/written', written)
+        if failed:
+            self._inc_stat('crawl_status/failed', failed)
+        if requeue:
+            self._requeue(requeue)
+        if not committed:
+            self._restore_summaries(snapshots, run, buckets)
+        return result
+
+    def _restore_summaries(self, snapshots, run, buckets):
+        """
+        进度与汇总未能提交 (reactor 线程)：时间桶增量合并回内存 (与刷新期间新产生的增量累加)，
+        进度与运行汇总重新标记为待写入，下一轮发送最新快照
+        """
+        for row in buckets:
+            key = (row['spider_name'], row['bucket_start'])
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = dict.fromkeys(self.BUCKET_COUNTERS, 0)
+            for counter in self.BUCKET_COUNTERS:
+                bucket[counter] += row[counter]
+        self.dirty.update(data['spider_name'] for data in snapshots)
+        if run:
+            self.run_dirty = True
 
+    def _requeue(self, rows):
+        """写入失败的行放回队列头部 (保持先后顺序)，超出 max_queue 时丢弃其中最早的行"""
+        overflow = min(len(rows), len(rows) + len(self.queue) - self.max_queue)
+        if overflow > 0:
+            rows = rows[overflow:]
+            self._inc_stat('crawl_status/failed', overflow)
+            logger.error(f"❌ 状态队列已满 ({self.max_queue} 条)，丢弃最早的 {overflow} 条状态记录")
+        self.queue[:0] = rows
+        self._inc_stat('crawl_status/requeued', len(rows))
+
+    def _inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
+
+    @defer.inlineCallbacks
     def close_spider(self, spider):
-        pass
+        """停止定时器，写完剩余状态与最终进度"""
+        if self.flush_loop and self.flush_loop.running:
+            self.flush_loop.stop()
+        if self.flushing:
+            yield self.flushing
+        if self.run:
+            self.run['status'] = 'finished'
+            self.run['end_time'] = datetime.now()
+            self.run_dirty = True
+        if self.queue or self.dirty or self.run_dirty or self.buckets:
+            yield self._trigger_flush()
+        if self.queue:
+            logger.error(f"❌ 爬虫关闭时仍有 {len(self.queue)} 条状态记录未能写入")
@@ -3,9 +3,8 @@
 """
 import json
 import hashlib
-import aiohttp
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from ..base_adapter import BaseRecrawlAdapter
 from ..registry import register_adapter
@@ -29,7 +28,7 @@ class FujianRecrawlAdapter(BaseRecrawlAdapter):
         page_size = 1000
         headers = {**self.default_headers, 'Content-Type': 'application/json;charset=utf-8'}
 
-        async with aiohttp.ClientSession(headers=headers) as session:
+        async with self.client(headers) as session:
             while True:
                 if self._should_stop():
                     break
@@ -44,6 +43,8 @@ class FujianRecrawlAdapter(BaseRecrawlAdapter):
                         res_json = await resp.json()
 
                     if res_json.get("code") != 0:
+                        self.logger.error(f"[{self.spider_name}] 列表接口返回错误 code={res_json.get('code')}: {res_json.get('message')}")
+                        self._mark_catalog_incomplete()
                         break
 
                     data_block = res_json.get("data", {})
@@ -75,102 +76,74 @@ class FujianRecrawlAdapter(BaseRecrawlAdapter):
 
                 except Exception as e:
                     self.logger.error(f"[{self.spider_name}] 请求API失败: {e}")
+                    self._mark_catalog_incomplete()
                     break
 
         return api_data
 
-    async def recrawl_by_ids(self, missing_data: Dict[str, Any], db_session) -> int:
+    def session_headers(self) -> Dict[str, str]:
+        return {**self.default_headers, 'Content-Type': 'application/json;charset=utf-8'}
+
+    async def recrawl_one(self, session, ext_code: str, base_info: Dict[str, Any]) -> Optional[List[Any]]:
         """根据缺失的 ext_code 调用医院API进行补采"""
         from ...models.fujian_drug import FujianDrug
 
-        success_count = 0
-        headers = {**self.default_headers, 'Content-Type': 'application/json;charset=utf-8'}
-
-        async with aiohttp.ClientSession(headers=headers) as session:
-            for ext_code, base_info in missing_data.items():
-                if self._should_stop():
-                    break
-                try:
-                    hospital_payload = {
-                        "area": "", "hospitalName": "", "pageNo": 1,
-                        "pageSize": 100, "productId": ext_code, "tenditmType": ""
-                    }
-                    async with session.post(self.hospital_api_url, json=hospital_payload, timeout=30) as resp:
-                        res_json = await resp.json()
-
-                    inner_data_str = res_json.get("data")
-                    if inner_data_str and isinstance(inner_data_str, str):
-                        inner_json = json.loads(inner_data_str)
-                        hospitals = inner_json.get("data", [])
-
-                        if hospitals:
-                            # 针对 update_only 模式的优化：避免在一对多关系中重复执行全量更新
-                            if self.update_only:
-                                updated = self._touch_by_unique_id(db_session, FujianDrug, ext_code)
-                                if updated > 0:
-                                    self.logger.info(f"[{self.spider_name}] 批量更新 ext_code={ext_code} 完成，共 {updated} 条")
-                                
-                                # 提交事务
-                                db_session.commit()
-                                success_count += 1
-                                await self._delay()
-                                continue
-
-                            for hosp in hospitals:
-                                record = FujianDrug(
-                                    ext_code=base_info.get('ext_code'),
-                                    drug_list_code=base_info.get('drug_list_code'),
-                                    drug_name=base_info.get('drug_name'),
-                                    drug_list_name=base_info.get('drug_list_name'),
-                                    dosform=base_info.get('dosform'),
-                                    spec=base_info.get('spec'),
-                                    pac=base_info.get('pac'),
-                                    rute_name=base_info.get('rute_name'),
-                                    prod_entp=base_info.get('prod_entp'),
-                                    source_data=base_info.get('source_data'),
-                                    has_hospital_record=True,
-                                    hospital_name=hosp.get('hospitalName'),
-                                    medins_code=hosp.get('medinsCode'),
-                                    area_name=hosp.get('areaName'),
-                                    area_code=hosp.get('areaCode'),
-                                    collect_time=datetime.now()
-                                )
-                                field_values = {
-                                    'ext_code': ext_code,
-                                    'hospital_name': hosp.get('hospitalName'),
-                                    'medins_code': hosp.get('medinsCode'),
-                                }
-                                record.md5_id = hashlib.md5(
-                                    json.dumps(field_values, sort_keys=True, ensure_ascii=False).encode()
-                                ).hexdigest()
-
-                                self._persist_record(db_session, FujianDrug, record, ext_code)
-                        else:
-                            record = FujianDrug(
-                                ext_code=base_info.get('ext_code'),
-                                drug_list_code=base_info.get('drug_list_code'),
-                                drug_name=base_info.get('drug_name'),
-                                drug_list_name=base_info.get('drug_list_name'),
-                                dosform=base_info.get('dosform'),
-                                spec=base_info.get('spec'),
-                                pac=base_info.get('pac'),
-                                rute_name=base_info.get('rute_name'),
-                                prod_entp=base_info.get('prod_entp'),
-                                source_data=base_info.get('source_data'),
-                                has_hospital_record=False,
-                                collect_time=datetime.now()
-                            )
-                            record.md5_id = hashlib.md5(ext_code.encode()).hexdigest()
-
-                            self._persist_record(db_session, FujianDrug, record, ext_code)
-
-                    success_count += 1
-                    self.logger.info(f"[{self.spider_name}] 补采 ext_code={ext_code} 成功")
-
-                except Exception as e:
-                    self.logger.error(f"[{self.spider_name}] 补采 ext_code={ext_code} 失败: {e}")
-
-                await self._delay()
-
-        db_session.commit()
-        return success_count
+        hospital_payload = {
+            "area": "", "hospitalName": "", "pageNo": 1,
+            "pageSize": 100, "productId": ext_code, "tenditmType": ""
+        }
+        res_json = await self._fetch_json(session, 'POST', self.hospital_api_url, json=hospital_payload)
+
+        inner_data_str = res_json.get("data")
+        if not inner_data_str or not isinstance(inner_data_str, str):
+            return []
+        hospitals = json.loads(inner_data_str).get("data", [])
+
+        if not hospitals:
+            record = FujianDrug(
+                ext_code=base_info.get('ext_code'),
+                drug_list_code=base_info.get('drug_list_code'),
+                drug_name=base_info.get('drug_name'),
+                drug_list_name=base_info.get('drug_list_name'),
+                dosform=base_info.get('dosform'),
+                spec=base_info.get('spec'),
+                pac=base_info.get('pac'),
+                rute_name=base_info.get('rute_name'),
+                prod_entp=base_info.get('prod_entp'),
+                source_data=base_info.get('source_data'),
+                has_hospital_record=False,
+                collect_time=datetime.now()
+            )
+            record.md5_id = hashlib.md5(ext_code.encode()).hexdigest()
+            return [record]
+
+        records = []
+        for hosp in hospitals:
+            record = FujianDrug(
+                ext_code=base_info.get('ext_code'),
+                drug_list_code=base_info.get('drug_list_code'),
+                drug_name=base_info.get('drug_name'),
+                drug_list_name=base_info.get('drug_list_name'),
+                dosform=base_info.get('dosform'),
+                spec=base_info.get('spec'),
+                pac=base_info.get('pac'),
+                rute_name=base_info.get('rute_name'),
+                prod_entp=base_info.get('prod_entp'),
+                source_data=base_info.get('source_data'),
+                has_hospital_record=True,
+                hospital_name=hosp.get('hospitalName'),
+                medins_code=hosp.get('medinsCode'),
+                area_name=hosp.get('areaName'),
+                area_code=hosp.get('areaCode'),
+                collect_time=datetime.now()
+            )
+            field_values = {
+                'ext_code': ext_code,
+                'hospital_name': hosp.get('hospitalName'),
+                'medins_code': hosp.get('medinsCode'),
+            }
+            record.md5_id = hashlib.md5(
+                json.dumps(field_values, sort_keys=True, ensure_ascii=False).encode()
+            ).hexdigest()
+            records.append(record)
+        return records
@@ -3,9 +3,8 @@
 """
 import json
 import hashlib
-import aiohttp
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from ..base_adapter import BaseRecrawlAdapter
 from ..registry import register_adapter
@@ -28,7 +27,7 @@ class HainanRecrawlAdapter(BaseRecrawlAdapter):
         current = 1
         page_size = 500
 
-        async with aiohttp.ClientSession(headers=self.default_headers) as session:
+        async with self.client() as session:
             while True:
                 if self._should_stop():
                     break
@@ -63,84 +62,56 @@ class HainanRecrawlAdapter(BaseRecrawlAdapter):
 
                 except Exception as e:
                     self.logger.error(f"[{self.spider_name}] 请求API失败: {e}")
+                    self._mark_catalog_incomplete()
                     break
 
         return api_data
 
-    async def recrawl_by_ids(self, missing_data: Dict[str, Any], db_session) -> int:
+    async def recrawl_one(self, session, drug_code: str, base_info: Dict[str, Any]) -> Optional[List[Any]]:
         """根据缺失的 drug_code 调用门店API进行补采"""
         from ...models.hainan_drug import HainanDrug
 
-        success_count = 0
-
-        async with aiohttp.ClientSession(headers=self.default_headers) as session:
-            for drug_code, base_info in missing_data.items():
-                if self._should_stop():
-                    break
-                try:
-                    params = {"current": 1, "size": 20, "drugCode": drug_code}
-                    async with session.get(self.detail_api_url, params=params, timeout=30) as resp:
-                        res_json = await resp.json()
-
-                    data = res_json.get("data", {})
-                    shops = data.get("records", [])
-
-                    if shops:
-                        # 针对 update_only 模式的优化：避免在一对多关系中重复执行全量更新
-                        if self.update_only:
-                            updated = self._touch_by_unique_id(db_session, HainanDrug, drug_code)
-                            if updated > 0:
-                                self.logger.info(f"[{self.spider_name}] 批量更新 drug_code={drug_code} 完成，共 {updated} 条")
-                            
-                            # 提交事务防止超时
-                            db_session.commit()
-                            success_count += 1
-                            await self._delay()
-                            continue
-
-                        for shop in shops:
-                            record = HainanDrug(
-                                drug_code=base_info.get('drug_code'),
-                                prod_name=base_info.get('prod_name'),
-                                dosform=base_info.get('dosform'),
-                                spec=base_info.get('spec'),
-                                pac=base_info.get('pac'),
-                                prod_entp=base_info.get('prod_entp'),
-                                source_data=base_info.get('source_data'),
-                                has_shop_record=True,
-                                shop_name=shop.get('medinsName'),
-                                shop_code=shop.get('medinsCode'),
-                                price=shop.get('pric'),
-                                inventory=shop.get('invCnt'),
-                                collect_time=datetime.now()
-                            )
-                            field_values = {'drug_code': drug_code, 'shop_code': shop.get('medinsCode')}
-                            record.md5_id = hashlib.md5(
-                                json.dumps(field_values, sort_keys=True, ensure_ascii=False).encode()
-                            ).hexdigest()
-                            self._persist_record(db_session, HainanDrug, record, drug_code)
-                    else:
-                        record = HainanDrug(
-                            drug_code=base_info.get('drug_code'),
-                            prod_name=base_info.get('prod_name'),
-                            dosform=base_info.get('dosform'),
-                            spec=base_info.get('spec'),
-                            pac=base_info.get('pac'),
-                            prod_entp=base_info.get('prod_entp'),
-                            source_data=base_info.get('source_data'),
-                            has_shop_record=False,
-                            collect_time=datetime.now()
-                        )
-                        record.md5_id = hashlib.md5(drug_code.encode()).hexdigest()
-                        self._persist_record(db_session, HainanDrug, record, drug_code)
-
-                    success_count += 1
-                    self.logger.info(f"[{self.spider_name}] 补采 drug_code={drug_code} 成功")
-
-                except Exception as e:
-                    self.logger.error(f"[{self.spider_name}] 补采 drug_code={drug_code} 失败: {e}")
-
-                await self._delay()
-
-        db_session.commit()
-        return success_count
+        params = {"current": 1, "size": 20, "drugCode": drug_code}
+        res_json = await self._fetch_json(session, 'GET', self.detail_api_url, params=params)
+
+        data = res_json.get("data", {})
+        shops = data.get("records", [])
+
+        if not shops:
+            record = HainanDrug(
+                drug_code=base_info.get('drug_code'),
+                prod_name=base_info.get('prod_name'),
+                dosform=base_info.get('dosform'),
+                spec=base_info.get('spec'),
+                pac=base_info.get('pac'),
+                prod_entp=base_info.get('prod_entp'),
+                source_data=base_info.get('source_data'),
+                has_shop_record=False,
+                collect_time=datetime.now()
+            )
+            record.md5_id = hashlib.md5(drug_code.encode()).hexdigest()
+            return [record]
+
+        records = []
+        for shop in shops:
+            record = HainanDrug(
+                drug_code=base_info.get('drug_code'),
+                prod_name=base_info.get('prod_name'),
+                dosform=base_info.get('dosform'),
+                spec=base_info.get('spec'),
+                pac=base_info.get('pac'),
+                prod_entp=base_info.get('prod_entp'),
+                source_data=base_info.get('source_data'),
+                has_shop_record=True,
+                shop_name=shop.get('medinsName'),
+                shop_code=shop.get('medinsCode'),
+                price=shop.get('pric'),
+                inventory=shop.get('invCnt'),
+                collect_time=datetime.now()
+            )
+            field_values = {'drug_code': drug_code, 'shop_code': shop.get('medinsCode')}
+            record.md5_id = hashlib.md5(
+                json.dumps(field_values, sort_keys=True, ensure_ascii=False).encode()
+            ).hexdigest()
+            records.append(record)
+        return records
@@ -4,10 +4,9 @@
 import json
 import hashlib
 import os
-import aiohttp
 import pandas as pd
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from ..base_adapter import BaseRecrawlAdapter
 from ..registry import register_adapter
@@ -52,7 +51,7 @@ class LiaoningRecrawlAdapter(BaseRecrawlAdapter):
 
         headers = {**self.default_headers, 'Content-Type': 'application/x-www-form-urlencoded'}
 
-        async with aiohttp.ClientSession(headers=headers) as session:
+        async with self.client(headers) as session:
             for keyword in keywords:
                 if self._should_stop():
                     break
@@ -88,40 +87,24 @@ class LiaoningRecrawlAdapter(BaseRecrawlAdapter):
 
                     except Exception as e:
                         self.logger.error(f"[{self.spider_name}] 请求API失败: {e}")
+                        self._mark_catalog_incomplete()
                         break
 
         return api_data
 
-    async def recrawl_by_ids(self, missing_data: Dict[str, Any], db_session) -> int:
-        """辽宁补采 - 直接保存缺失的数据"""
+    async def recrawl_one(self, session, md5_id: str, drug_info: Dict[str, Any]) -> Optional[List[Any]]:
+        """辽宁补采 - 列表数据即完整记录，直接保存缺失的数据"""
         from ...models.liaoning_drug import LiaoningDrug
 
-        success_count = 0
-        for md5_id, drug_info in missing_data.items():
-            if self._should_stop():
-                break
-            try:
-                record = LiaoningDrug(
-                    md5_id=md5_id,
-                    ProductName=drug_info.get('ProductName'),
-                    MedicineModelName=drug_info.get('MedicineModelName'),
-                    Outlookc=drug_info.get('Outlookc'),
-                    HospitalName=drug_info.get('HospitalName'),
-                    Pack=drug_info.get('Pack'),
-                    GoodsName=drug_info.get('GoodsName'),
-                    SubmiTime=drug_info.get('SubmiTime'),
-                    collect_time=datetime.now()
-                )
-
-                self._persist_record(db_session, LiaoningDrug, record, md5_id)
-
-                success_count += 1
-                self.logger.info(f"[{self.spider_name}] 补采 md5_id={md5_id[:8]}... 成功")
-
-            except Exception as e:
-                self.logger.error(f"[{self.spider_name}] 补采 md5_id={md5_id[:8]}... 失败: {e}")
-
-            await self._delay()
-
-        db_session.commit()
-        return success_count
+        record = LiaoningDrug(
+            md5_id=md5_id,
+            ProductName=drug_info.get('ProductName'),
+            MedicineModelName=drug_info.get('MedicineModelName'),
+            Outlookc=drug_info.get('Outlookc'),
+            HospitalName=drug_info.get('HospitalName'),
+            Pack=drug_info.get('Pack'),
+            GoodsName=drug_info.get('GoodsName'),
+            SubmiTime=drug_info.get('SubmiTime'),
+            collect_time=datetime.now()
+        )
+        return [record]
@@ -6,13 +6,13 @@ import hashlib
 import random
 import string
 import os
-import aiohttp
 import pandas as pd
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from ..base_adapter import BaseRecrawlAdapter
 from ..registry import register_adapter
+from ...utils.projection import fill_item
 
 # 获取关键词文件路径
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -62,7 +62,7 @@ class TianjinRecrawlAdapter(BaseRecrawlAdapter):
 
         headers = {**self.default_headers, 'Content-Type': 'application/json'}
 
-        async with aiohttp.ClientSession(headers=headers) as session:
+        async with self.client(headers) as session:
             for keyword in keywords:
                 if self._should_stop():
                     break
@@ -75,6 +75,8 @@ class TianjinRecrawlAdapter(BaseRecrawlAdapter):
                         res_json = await resp.json()
 
                     if res_json.get("code") != 200:
+                        self.logger.error(f"[{self.spider_name}] 关键词[{keyword}] 接口返回错误 code={res_json.get('code')}: {res_json.get('message')}")
+                        self._mark_catalog_incomplete()
                         continue
 
                     data = res_json.get("data", {})
@@ -98,115 +100,61 @@ class TianjinRecrawlAdapter(BaseRecrawlAdapter):
 
                 except Exception as e:
                     self.logger.error(f"[{self.spider_name}] 请求API失败: {e}")
+                    self._mark_catalog_incomplete()
 
                 await self._delay()
 
         return api_data
 
-    async def recrawl_by_ids(self, missing_data: Dict[str, Any], db_session) -> int:
+    def session_headers(self) -> Dict[str, str]:
+        return {**self.default_headers, 'Content-Type': 'application/json'}
+
+    async def recrawl_one(self, session, med_id: str, base_info: Dict[str, Any]) -> Optional[List[Any]]:
         """根据缺失的 med_id 调用医院API进行补采"""
         from ...models.tianjin_drug import TianjinDrug, TianjinDrugItem
 
-        success_count = 0
-        headers = {**self.default_headers, 'Content-Type': 'application/json'}
-
-        async with aiohttp.ClientSession(headers=headers) as session:
-            for med_id, base_info in missing_data.items():
-                if self._should_stop():
-                    break
-                try:
-                    hospital_payload = {
-                        "verificationCode": self._get_verification_code(),
-                        "genname": base_info.get('gen_name'),
-                        "dosform": base_info.get('dosform'),
-                        "spec": base_info.get('spec'),
-                        "pac": base_info.get('pac')
-                    }
-                    async with session.post(self.hospital_list_url, json=hospital_payload, timeout=30) as resp:
-                        res_json = await resp.json()
-
-                    if res_json.get("code") != 200:
-                        continue
-
-                    data = res_json.get("data", {})
-                    hosp_list = data.get("list", [])
-
-                    if hosp_list:
-                        # 针对 update_only 模式的优化：避免在一对多关系中重复执行全量更新
-                        if self.update_only:
-                            updated = self._touch_by_unique_id(db_session, TianjinDrug, med_id)
-                            if updated > 0:
-                                self.logger.info(f"[{self.spider_name}] 批量更新 med_id={med_id} 完成，共 {updated} 条")
-                            
-                            # 提交事务
-                            db_session.commit()
-                            success_count += 1
-                            await self._delay()
-                            continue
-
-                        for hosp in hosp_list:
-                            # 构造Item以生成MD5
-                            item = TianjinDrugItem()
-                            # 仅更新Item中定义的字段
-                            for field in item.fields:
-                                if field in base_info:
-                                    item[field] = base_info[field]
-                                    
-                            item['has_hospital_record'] = True
-                            item['hs_name'] = hosp.get('hsname')
-                            item['hs_lav'] = hosp.get('hslav')
-                            item['got_time'] = hosp.get('gottime')
-                            item.generate_md5_id()
-                            
-                            record = TianjinDrug(
-                                med_id=base_info.get('med_id'),
-                                gen_name=base_info.get('gen_name'),
-                                prod_name=base_info.get('prod_name'),
-                                dosform=base_info.get('dosform'),
-                                spec=base_info.get('spec'),
-                                pac=base_info.get('pac'),
-                                prod_entp=base_info.get('prod_entp'),
-                                source_data=base_info.get('source_data'),
-                                has_hospital_record=True,
-                                hs_name=hosp.get('hsname'),
-                                hs_lav=hosp.get('hslav'),
-                                got_time=hosp.get('gottime'),
-                                collect_time=datetime.now(),
-                                md5_id=item['md5_id']
-                            )
-                            self._persist_record(db_session, TianjinDrug, record, med_id)
-                    else:
-                        item = TianjinDrugItem()
-                        # 仅更新Item中定义的字段
-                        for field in item.fields:
-                            if field in base_info:
-                                item[field] = base_info[field]
-                                
-                        item['has_hospital_record'] = False
-                        item.generate_md5_id()
-                        
-                        record = TianjinDrug(
-                            med_id=base_info.get('med_id'),
-                            gen_name=base_info.get('gen_name'),
-                            prod_name=base_info.get('prod_name'),
-                            dosform=base_info.get('dosform'),
-                            spec=base_info.get('spec'),
-                            pac=base_info.get('pac'),
-                            prod_entp=base_info.get('prod_entp'),
-                            source_data=base_info.get('source_data'),
-                            has_hospital_record=False,
-                            collect_time=datetime.now(),
-                            md5_id=item['md5_id']
-                        )
-                        self._persist_record(db_session, TianjinDrug, record, med_id)
-
-                    success_count += 1
-                    self.logger.info(f"[{self.spider_name}] 补采 med_id={med_id} 成功")
-
-                except Exception as e:
-                    self.logger.error(f"[{self.spider_name}] 补采 med_id={med_id} 失败: {e}")
-
-                await self._delay()
-
-        db_session.commit()
-        return success_count
+        hospital_payload = {
+            "verificationCode": self._get_verification_code(),
+            "genname": base_info.get('gen_name'),
+            "dosform": base_info.get('dosform'),
+            "spec": base_info.get('spec'),
+            "pac": base_info.get('pac')
+        }
+        res_json = await self._fetch_json(session, 'POST', self.hospital_list_url, json=hospital_payload)
+
+        if res_json.get("code") != 200:
+            return None
+
+        data = res_json.get("data", {})
+        hosp_list = data.get("list", [])
+
+        records = []
+        # 无医院数据时保存一条 has_hospital_record=False 的记录
+        for hosp in hosp_list or [None]:
+            # 构造Item以生成MD5，仅更新Item中定义的字段
+            item = fill_item(TianjinDrugItem(), base_info)
+            item['has_hospital_record'] = hosp is not None
+            if hosp is not None:
+                item['hs_name'] = hosp.get('hsname')
+                item['hs_lav'] = hosp.get('hslav')
+                item['got_time'] = hosp.get('gottime')
+            item.generate_md5_id()
+
+            record = TianjinDrug(
+                med_id=base_info.get('med_id'),
+                gen_name=base_info.get('gen_name'),
+                prod_name=base_info.get('prod_name'),
+                dosform=base_info.get('dosform'),
+                spec=base_info.get('spec'),
+                pac=base_info.get('pac'),
+                prod_entp=base_info.get('prod_entp'),
+                source_data=base_info.get('source_data'),
+                has_hospital_record=hosp is not None,
+                hs_name=hosp.get('hsname') if hosp else None,
+                hs_lav=hosp.get('hslav') if hosp else None,
+                got_time=hosp.get('gottime') if hosp else None,
+                collect_time=datetime.now(),
+                md5_id=item['md5_id']
+            )
+            records.append(record)
+        return records
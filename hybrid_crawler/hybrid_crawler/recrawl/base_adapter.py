@@ -1,13 +1,30 @@
 """
 BaseRecrawlAdapter - 补充采集适配器抽象基类
 """
+import os
+import json
+import time
 import asyncio
 import aiohttp
 from datetime import datetime
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Callable
-from ..models import SessionLocal
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from sqlalchemy import Table, MetaData, Column, String, select, exists, table, column, text, insert, update
+from sqlalchemy import inspect as sa_inspect
+from ..models import SessionLocal, engine
+from ..storage.mysql import MySQLStorage
+from ..utils.sql_dialect import upsert_statement, insert_ignore_statement
 from ..utils.logger_utils import get_spider_logger
+from .rate_limiter import HostRateLimiter, ThrottledError
+from .catalog import CATALOG
+from .http_pool import ClientPool
+
+# 视为限流的响应状态码
+THROTTLE_STATUSES = (429, 503)
+# 单个ID可重试的错误 (限流、超时、连接错误)
+RETRYABLE_ERRORS = (ThrottledError, asyncio.TimeoutError, aiohttp.ClientError)
 
 
 class BaseRecrawlAdapter(ABC):
@@ -16,7 +33,10 @@ class BaseRecrawlAdapter(ABC):
 
     子类需要实现:
     - fetch_all_ids() - 从官网API获取所有ID
-    - recrawl_by_ids() - 根据缺失ID执行补采
+    - recrawl_one() - 补采单个ID，返回待保存的记录
+
+    recrawl_by_ids() 以 concurrency 个并发 worker 调度 recrawl_one()，
+    请求经 _fetch_json() 按目标主机令牌桶限速 (requests_per_second)，遇到限流或错误时自动降速
     """
 
     # 子类必须定义
@@ -25,69 +45,119 @@ class BaseRecrawlAdapter(ABC):
     unique_id: str = None
 
     # 可选配置
-    request_delay: float = 3.0  # 请求间隔(秒)
+    request_delay: float = 3.0  # 请求间隔(秒)，用于 fetch_all_ids 翻页
+    concurrency: int = int(os.getenv('RECRAWL_CONCURRENCY', 4))  # 补采并发数
+    requests_per_second: float = float(os.getenv('RECRAWL_REQUESTS_PER_SECOND', 1.0))  # 每个主机的请求速率上限
+    min_requests_per_second: float = 0.1  # 自适应降速的下限
+    request_timeout: float = 30  # 补采请求超时(秒)
+    max_retries: int = 2  # 单个ID遇到限流/超时/连接错误时的重试次数
+    commit_every: int = 50  # 每补采多少个ID批量写入并提交一次
+    write_chunk: int = 500  # 批量写入 / IN 条件每条语句的行数
+    find_missing_mode: str = os.getenv('RECRAWL_FIND_MISSING_MODE', 'db')  # db: 数据库反连接求差集 / memory: 内存比较
+    missing_stage_chunk: int = 5000  # 写入临时表 / 流式读取的批大小
     default_headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
         'Accept': 'application/json, text/plain, */*',
     }
 
-    def __init__(self, stop_check: Callable = None, update_only: bool = False):
+    def __init__(self, stop_check: Callable = None, update_only: bool = False, http_pool: ClientPool = None):
         self.logger = get_spider_logger(self.spider_name)
         self.stop_check = stop_check
         self.update_only = update_only
-
-    def _touch_updated_at(self, record) -> None:
+        self.rate_limiters: Dict[str, HostRateLimiter] = {}
+        # RecrawlManager 持有的连接池，Adapter 在整个生命周期内借用
+        self.http_pool = http_pool
+        # 最近一次 fetch_all_ids 是否翻完全部页 (中途放弃时由 _mark_catalog_incomplete 置为 False)
+        self.catalog_complete = True
+
+    @staticmethod
+    def _touch_values(model_cls) -> Dict[str, datetime]:
+        """刷新采集时间的列与值"""
         now = datetime.now()
-        if hasattr(record, 'updated_at'):
-            record.updated_at = now
-        if hasattr(record, 'collect_time'):
-            record.collect_time = now
+        return {name: now for name in ('updated_at', 'collect_time') if hasattr(model_cls, name)}
 
-    def _touch_by_unique_id(self, db_session, model_cls, unique_id_value) -> int:
-        now = datetime.now()
-        values = {}
-        if hasattr(model_cls, 'updated_at'):
-            values['updated_at'] = now
-        if hasattr(model_cls, 'collect_time'):
-            values['collect_time'] = now
-        if not values:
-            return 0
-        unique_col = getattr(model_cls, self.unique_id, None)
-        if unique_col is None:
-            return 0
-        match_count = db_session.query(model_cls).filter(unique_col == unique_id_value).count()
-        if match_count == 0:
-            return 0
-        
-        # 允许更新多条记录（针对一对多关系的表）
-        updated_rows = db_session.query(model_cls).filter(unique_col == unique_id_value).update(values, synchronize_session=False)
-        if updated_rows > 1000:
-             self.logger.warning(f"[{self.spider_name}] unique_id={unique_id_value} updated {updated_rows} rows")
-        return updated_rows
-
-    def _touch_by_md5_id(self, db_session, model_cls, md5_value) -> int:
-        now = datetime.now()
-        values = {}
-        if hasattr(model_cls, 'updated_at'):
-            values['updated_at'] = now
-        if hasattr(model_cls, 'collect_time'):
-            values['collect_time'] = now
-        if not values:
+    def _touch_in(self, db_session, model_cls, column_name: str, values) -> int:
+        """UPDATE ... SET 采集时间 WHERE column IN (...)，每 write_chunk 个值一条语句"""
+        touch = self._touch_values(model_cls)
+        column = model_cls.__table__.columns.get(column_name)
+        if not touch or column is None:
             return 0
-        return db_session.query(model_cls).filter(model_cls.md5_id == md5_value).update(values, synchronize_session=False)
-
-    def _persist_record(self, db_session, model_cls, record, unique_id_value) -> None:
-        md5_value = getattr(record, 'md5_id', None)
-        if md5_value:
-            updated = self._touch_by_md5_id(db_session, model_cls, md5_value)
-            if updated:
-                return
-
-        if self.update_only:
-            self._touch_by_unique_id(db_session, model_cls, unique_id_value)
-            return
-
-        db_session.add(record)
+        values = list(dict.fromkeys(values))
+        updated = 0
+        for start in range(0, len(values), self.write_chunk):
+            chunk = values[start:start + self.write_chunk]
+            result = db_session.execute(update(model_cls.__table__).where(column.in_(chunk)).values(**touch))
+            updated += max(result.rowcount or 0, 0)
+        return updated
+
+    def _touch_by_unique_ids(self, db_session, model_cls, unique_ids) -> int:
+        """按 unique_id 批量刷新采集时间 (一对多的表一次更新该ID下的所有行)"""
+        return self._touch_in(db_session, model_cls, self.unique_id, unique_ids)
+
+    @staticmethod
+    def _record_row(record) -> Dict[str, Any]:
+        """ORM 记录 -> 列字典，只取已赋值的属性 (其余列由 _align_rows / 列默认值补齐)"""
+        state = record.__dict__
+        return {
+            attr.columns[0].name: state[attr.key]
+            for attr in sa_inspect(type(record)).column_attrs if attr.key in state
+        }
+
+    def _write_records(self, db_session, model_cls, records: List[Any]) -> None:
+        """
+        批量写入补采记录：已存在 (同 md5_id) 的只刷新采集时间，其余插入
+        - md5_id 有唯一索引：每块一条多行 UPSERT (冲突时只更新采集时间)
+        - 无唯一索引：每块一次 md5_id IN 查询 + 一条 UPDATE ... IN + 一条多行 INSERT
+        """
+        table = model_cls.__table__
+        dialect_name = db_session.get_bind().dialect.name
+        touch = self._touch_values(model_cls)
+        unique_md5 = MySQLStorage._has_unique_md5(model_cls)
+
+        # 同一批内 md5_id 重复的记录只写一次
+        rows, seen = [], set()
+        for row in (self._record_row(r) for r in records):
+            md5_value = row.get('md5_id')
+            if md5_value:
+                if md5_value in seen:
+                    continue
+                seen.add(md5_value)
+            rows.append(row)
+
+        for start in range(0, len(rows), self.write_chunk):
+            chunk = MySQLStorage._align_rows(rows[start:start + self.write_chunk], model_cls)
+            if unique_md5:
+                if touch:
+                    stmt = upsert_statement(dialect_name, table, chunk, ['md5_id'], [], overrides=touch)
+                else:
+                    stmt = insert_ignore_statement(dialect_name, table, chunk)
+                db_session.execute(stmt)
+                continue
+            md5_values = [row['md5_id'] for row in chunk if row.get('md5_id')]
+            existing = {
+                r[0] for r in db_session.execute(select(table.c.md5_id).where(table.c.md5_id.in_(md5_values)))
+            } if md5_values else set()
+            if existing:
+                self._touch_in(db_session, model_cls, 'md5_id', existing)
+            new_rows = [row for row in chunk if row.get('md5_id') not in existing]
+            if new_rows:
+                db_session.execute(insert(table).values(new_rows))
+
+    def _write_batch(self, db_session, batch: List[Tuple[Any, List[Any]]]) -> None:
+        """写入一批ID的补采结果 (按模型合并；update_only 时只按 unique_id 刷新采集时间)"""
+        by_model: Dict[Any, Tuple[List[Any], List[Any]]] = {}
+        for unique_id, records in batch:
+            if not records:
+                continue
+            ids, model_records = by_model.setdefault(type(records[0]), ([], []))
+            ids.append(unique_id)
+            model_records.extend(records)
+        for model_cls, (ids, records) in by_model.items():
+            if self.update_only:
+                updated = self._touch_by_unique_ids(db_session, model_cls, ids)
+                self.logger.info(f"[{self.spider_name}] 批量更新 {len(ids)} 个 {self.unique_id} 完成，共 {updated} 条")
+            else:
+                self._write_records(db_session, model_cls, records)
 
     def _should_stop(self) -> bool:
         """检查是否应该停止"""
@@ -97,59 +167,283 @@ class BaseRecrawlAdapter(ABC):
         """请求间隔延迟（异步）"""
         await asyncio.sleep(self.request_delay)
 
+    def _mark_catalog_incomplete(self) -> None:
+        """fetch_all_ids 因请求失败 / 接口报错放弃翻页时调用：已获取的部分照常返回，但不保存为目录快照"""
+        self.catalog_complete = False
+
     @abstractmethod
     async def fetch_all_ids(self) -> Dict[str, Any]:
         """
         从官网API获取所有ID及其基础信息
+        请求失败提前结束翻页时须调用 _mark_catalog_incomplete()
 
         Returns:
             {unique_id: base_info_dict} 字典
         """
         pass
 
+    async def load_catalog(self, refresh: bool = False, ids=None) -> Dict[str, Any]:
+        """
+        官网目录 (fetch_all_ids 的结果)：TTL 内复用最近的目录快照，否则重新翻页并保存快照
+
+        Args:
+            refresh: 忽略快照，强制重新翻页
+            ids: 只返回这些ID的基础信息
+        """
+        if not refresh:
+            snapshot = CATALOG.latest(self.spider_name)
+            if snapshot:
+                age = int(time.time() - snapshot['fetched_at'])
+                self.logger.info(f"[{self.spider_name}] 使用 {age} 秒前的目录快照 ({snapshot['total']} 条)")
+                return CATALOG.load(snapshot['id'], ids)
+
+        self.catalog_complete = True
+        api_data = await self.fetch_all_ids()
+        # 中途停止或请求失败的翻页结果不完整，不作为快照 (否则 TTL 内的补采都会基于残缺目录)
+        if not self.catalog_complete:
+            self.logger.warning(f"[{self.spider_name}] 目录翻页未完成 ({len(api_data)} 条)，不保存快照")
+        elif api_data and not self._should_stop():
+            try:
+                CATALOG.save(self.spider_name, api_data)
+            except Exception as e:
+                self.logger.warning(f"[{self.spider_name}] 保存目录快照失败: {e}")
+        if ids is not None:
+            wanted = {str(i) for i in ids}
+            api_data = {k: v for k, v in api_data.items() if str(k) in wanted}
+        return api_data
+
     @abstractmethod
+    async def recrawl_one(self, session: aiohttp.ClientSession, unique_id: str, base_info: Any) -> Optional[List[Any]]:
+        """
+        补采单个ID
+
+        Args:
+            session: 补采共用的 HTTP 会话 (请求应通过 _fetch_json 发出以受限速控制)
+            unique_id: 缺失的ID
+            base_info: fetch_all_ids 中该ID的基础信息
+
+        Returns:
+            待保存的 ORM 记录列表；返回 None 表示跳过 (不计入成功数)，抛出异常表示失败
+        """
+        pass
+
+    @asynccontextmanager
+    async def client(self, headers: Dict[str, str] = None):
+        """
+        借用本站点的 HTTP 会话 (同站点共享 Cookie，连接在各阶段间复用)
+        未传入连接池时 (单独使用 Adapter) 临时创建一个，退出时关闭
+        """
+        headers = headers or self.default_headers
+        if self.http_pool is not None:
+            yield self.http_pool.session(self.spider_name, headers)
+            return
+        async with ClientPool() as pool:
+            yield pool.session(self.spider_name, headers)
+
+    def session_headers(self) -> Dict[str, str]:
+        """补采 HTTP 会话的请求头"""
+        return self.default_headers
+
+    async def prepare_session(self, session: aiohttp.ClientSession) -> None:
+        """补采开始前的会话预热 (如先请求列表页获取 Cookie)"""
+        pass
+
+    def _limiter(self, url: str) -> HostRateLimiter:
+        host = urlsplit(url).netloc
+        limiter = self.rate_limiters.get(host)
+        if limiter is None:
+            limiter = self.rate_limiters[host] = HostRateLimiter(
+                host, self.requests_per_second, min_rate=self.min_requests_per_second, logger=self.logger
+            )
+        return limiter
+
+    async def _fetch_json(self, session: aiohttp.ClientSession, method: str, url: str, **kwargs) -> Any:
+        """
+        限速请求并解析 JSON (忽略 Content-Type)
+        429/503 抛出 ThrottledError，其他非 200 状态抛出 ValueError
+        """
+        kwargs.setdefault('timeout', aiohttp.ClientTimeout(total=self.request_timeout))
+        limiter = self._limiter(url)
+        await limiter.acquire()
+        try:
+            async with session.request(method, url, **kwargs) as resp:
+                resp_text = await resp.text()
+                if resp.status in THROTTLE_STATUSES:
+                    retry_after = resp.headers.get('Retry-After', '')
+                    raise ThrottledError(
+                        f"HTTP {resp.status}",
+                        float(retry_after) if retry_after.isdigit() else None
+                    )
+                if resp.status != 200:
+                    raise ValueError(f"HTTP {resp.status}: {resp_text[:200]}")
+        except ThrottledError as e:
+            limiter.on_throttled(e.retry_after)
+            raise
+        except (asyncio.TimeoutError, aiohttp.ClientError, ValueError):
+            limiter.on_error()
+            raise
+        limiter.on_success()
+        try:
+            return json.loads(resp_text)
+        except json.JSONDecodeError:
+            raise ValueError(f"JSON解析失败: {resp_text[:200]}")
+
+    async def _recrawl_with_retry(self, session, unique_id, base_info) -> Optional[List[Any]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.recrawl_one(session, unique_id, base_info)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries or self._should_stop():
+                    raise
+                self.logger.warning(
+                    f"[{self.spider_name}] {self.unique_id}={unique_id} 第{attempt + 1}次失败，重试: {type(e).__name__} {e}"
+                )
+
     async def recrawl_by_ids(self, missing_data: Dict[str, Any], db_session) -> int:
         """
-        根据缺失数据执行补采
+        根据缺失数据执行补采：concurrency 个 worker 共享 ID 迭代器，网络请求并发进行；
+        结果攒够 commit_every 个ID后交给线程池批量写入并提交 (不阻塞事件循环上的请求)，
+        写入按锁串行，同一时刻只有一个线程使用 db_session；
+        批量写入失败时逐个ID重试 (保存点隔离)，只丢弃写不进去的ID
 
         Args:
             missing_data: {unique_id: base_info} 字典
             db_session: 数据库会话
 
         Returns:
-            成功补采的记录数
+            成功补采的ID数
         """
-        pass
+        pending = iter(missing_data.items())
+        counts = {'success': 0}
+        batch: List[Tuple[Any, List[Any]]] = []
+        write_lock = asyncio.Lock()
+
+        def write(items: List[Tuple[Any, List[Any]]]) -> int:
+            """在线程池中写入一批结果并提交，返回写入失败的ID数"""
+            failed = 0
+            try:
+                with db_session.begin_nested():
+                    self._write_batch(db_session, items)
+            except Exception as e:
+                self.logger.warning(f"[{self.spider_name}] 批量写入 {len(items)} 个ID失败，逐个重试: {type(e).__name__} {e}")
+                for unique_id, records in items:
+                    try:
+                        with db_session.begin_nested():
+                            self._write_batch(db_session, [(unique_id, records)])
+                    except Exception as row_error:
+                        failed += 1
+                        self.logger.error(
+                            f"[{self.spider_name}] 保存 {self.unique_id}={unique_id} 失败: {type(row_error).__name__} {row_error}"
+                        )
+            db_session.commit()
+            return failed
+
+        async def flush():
+            if not batch:
+                return
+            # 先取走当前批次，写入期间其他 worker 继续向新批次追加结果
+            items = batch[:]
+            batch.clear()
+            async with write_lock:
+                failed = await asyncio.to_thread(write, items)
+            counts['success'] -= failed
+
+        async def worker(session):
+            for unique_id, base_info in pending:
+                if self._should_stop():
+                    break
+                try:
+                    records = await self._recrawl_with_retry(session, unique_id, base_info)
+                    if records is not None:
+                        batch.append((unique_id, records))
+                        counts['success'] += 1
+                        self.logger.info(f"[{self.spider_name}] 补采 {self.unique_id}={unique_id} 成功，记录数: {len(records)}")
+                except Exception as e:
+                    self.logger.error(f"[{self.spider_name}] 补采 {self.unique_id}={unique_id} 失败: {type(e).__name__} {e}")
+                if len(batch) >= self.commit_every:
+                    await flush()
+
+        async with self.client(self.session_headers()) as session:
+            await self.prepare_session(session)
+            await asyncio.gather(*(worker(session) for _ in range(max(self.concurrency, 1))))
+
+        await flush()
+        return counts['success']
+
+    def _find_missing_in_db(self, api_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        数据库侧求差集：API 的ID分批写入临时表 (主键即索引)，
+        再以 NOT EXISTS 反连接到业务表的 unique_id 索引，只流式读回缺失的ID
+        临时表只对当前连接可见，结束时删除
+        """
+        keys = {str(k): k for k in api_data}
+        stage = Table(
+            f"tmp_recrawl_{self.spider_name}"[:64], MetaData(),
+            Column('uid', String(255), primary_key=True),
+            prefixes=['TEMPORARY'],
+        )
+        target = table(self.table_name, column(self.unique_id))
+        missing_data = {}
+        with engine.connect() as conn:
+            stage.create(conn)
+            try:
+                uids = list(keys)
+                for start in range(0, len(uids), self.missing_stage_chunk):
+                    conn.execute(stage.insert(), [{'uid': uid} for uid in uids[start:start + self.missing_stage_chunk]])
+                query = select(stage.c.uid).where(
+                    ~exists().where(target.c[self.unique_id] == stage.c.uid)
+                )
+                # 服务端游标：缺失ID逐批读回，不在客户端缓冲整个结果集
+                result = conn.execution_options(stream_results=True, yield_per=self.missing_stage_chunk).execute(query)
+                for (uid,) in result:
+                    key = keys[uid]
+                    missing_data[key] = api_data[key]
+            finally:
+                stage.drop(conn, checkfirst=True)
+                conn.commit()
+        return missing_data
+
+    def _find_missing_in_memory(self, api_data: Dict[str, Any]) -> Dict[str, Any]:
+        """内存求差集：流式读取业务表已有的ID，与 API 的ID比较"""
+        db = SessionLocal()
+        try:
+            sql = text(f"SELECT DISTINCT {self.unique_id} FROM {self.table_name}")
+            result = db.execute(sql.execution_options(stream_results=True, yield_per=self.missing_stage_chunk))
+            existing_ids = {str(row[0]) for row in result if row[0] is not None}
+            self.logger.info(f"[{self.spider_name}] 数据库中已有 {len(existing_ids)} 条记录")
+        finally:
+            db.close()
+        return {k: v for k, v in api_data.items() if str(k) not in existing_ids}
 
-    async def find_missing(self) -> Dict[str, Any]:
+    async def find_missing(self, refresh: bool = False) -> Dict[str, Any]:
         """
         查找缺失的数据
+        find_missing_mode='db' (默认) 在数据库中反连接求差集，失败时回退为内存比较
+        官网目录在 RECRAWL_CATALOG_TTL_SEC 内复用快照，refresh=True 时重新翻页
 
         Returns:
             {unique_id: base_info} 缺失数据字典
         """
-        from sqlalchemy import text
-
         if not self.table_name or not self.unique_id:
             self.logger.warning(f"[{self.spider_name}] table_name 或 unique_id 未配置")
             return {}
 
-        db = SessionLocal()
         try:
-            # 获取数据库中已有的ID
-            self.logger.info(f"[{self.spider_name}] 从数据库获取现有 {self.unique_id}...")
-            sql = text(f"SELECT DISTINCT {self.unique_id} FROM {self.table_name}")
-            result = db.execute(sql)
-            existing_ids = {str(row[0]) for row in result if row[0] is not None}
-            self.logger.info(f"[{self.spider_name}] 数据库中已有 {len(existing_ids)} 条记录")
-
-            # 从API获取所有ID
+            # 先完成耗时的 API 翻页，期间不占用数据库连接
             self.logger.info(f"[{self.spider_name}] 从官网API获取所有 {self.unique_id}...")
-            api_data = await self.fetch_all_ids()
+            api_data = await self.load_catalog(refresh)
             self.logger.info(f"[{self.spider_name}] 官网API共有 {len(api_data)} 条记录")
-
-            # 计算缺失
-            missing_data = {k: v for k, v in api_data.items() if k not in existing_ids}
+            if not api_data:
+                return {}
+
+            missing_data = None
+            if self.find_missing_mode == 'db':
+                try:
+                    missing_data = self._find_missing_in_db(api_data)
+                except Exception as e:
+                    self.logger.warning(f"[{self.spider_name}] 数据库侧求差集失败，改为内存比较: {e}")
+            if missing_data is None:
+                missing_data = self._find_missing_in_memory(api_data)
             self.logger.info(f"[{self.spider_name}] 发现 {len(missing_data)} 条缺失数据")
 
             return missing_data
@@ -157,8 +451,6 @@ class BaseRecrawlAdapter(ABC):
         except Exception as e:
             self.logger.error(f"[{self.spider_name}] 检查缺失数据失败: {e}")
             return {}
-        finally:
-            db.close()
 
     async def recrawl(self, missing_ids=None) -> int:
         """
@@ -174,10 +466,9 @@ class BaseRecrawlAdapter(ABC):
         if missing_ids is None:
             missing_data = await self.find_missing()
         elif isinstance(missing_ids, (list, set, tuple)):
-            # 如果传入的是ID列表，需要重新获取完整信息
+            # 如果传入的是ID列表，从目录快照 (过期时重新翻页) 中取完整信息
             self.logger.info(f"[{self.spider_name}] 收到ID列表，正在获取完整信息...")
-            all_data = await self.fetch_all_ids()
-            missing_data = {k: v for k, v in all_data.items() if k in missing_ids}
+            missing_data = await self.load_catalog(ids=missing_ids)
         else:
             # 假设是字典格式
             missing_data = missing_ids
@@ -0,0 +1,128 @@
+"""
+CatalogStore - 官网 API 目录快照 (fetch_all_ids 的结果)
+
+find_missing、按ID列表补采、周统计、Dashboard 在 TTL 内复用同一次翻页结果，不再重复抓取整个目录
+- 存储: 本地 SQLite 文件 (与业务库无关)，每条记录为 zlib 压缩的 JSON，按 (快照, ID) 主键查询
+- 每个爬虫只保留最近 CATALOG_KEEP 个快照，超过 ttl 的快照不再使用
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CATALOG_PATH = os.getenv('RECRAWL_CATALOG_PATH', os.path.join(project_root, 'catalog', 'recrawl_catalog.db'))
+CATALOG_TTL_SEC = float(os.getenv('RECRAWL_CATALOG_TTL_SEC', 3600))
+CATALOG_KEEP = 2
+# 按ID查询时每条 SQL 的参数个数 (SQLite 参数上限)
+LOOKUP_CHUNK = 500
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS snapshot ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT, spider TEXT NOT NULL, fetched_at REAL NOT NULL, total INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_snapshot_spider ON snapshot (spider, fetched_at)",
+    "CREATE TABLE IF NOT EXISTS record ("
+    " snapshot_id INTEGER NOT NULL, uid TEXT NOT NULL, data BLOB NOT NULL,"
+    " PRIMARY KEY (snapshot_id, uid)) WITHOUT ROWID",
+)
+
+
+def _pack(key, value) -> bytes:
+    # 连同原始 key 一起保存，读取时保持 key 的类型不变
+    return zlib.compress(json.dumps([key, value], ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def _unpack(blob: bytes):
+    key, value = json.loads(zlib.decompress(blob).decode('utf-8'))
+    return key, value
+
+
+class CatalogStore:
+    """目录快照存储 (每次操作使用独立连接，可在多线程 / 多进程中共用同一文件)"""
+
+    def __init__(self, path: str = CATALOG_PATH, ttl: float = CATALOG_TTL_SEC):
+        self.path = path
+        self.ttl = ttl
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                conn.execute('PRAGMA journal_mode=WAL')
+                for sql in SCHEMA:
+                    conn.execute(sql)
+                self._initialized = True
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def latest(self, spider_name: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """最近一次未过期的快照 {'id', 'fetched_at', 'total'}，没有时返回 None"""
+        max_age = self.ttl if max_age is None else max_age
+        if max_age <= 0:
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, fetched_at, total FROM snapshot WHERE spider = ? AND fetched_at >= ? "
+                "ORDER BY fetched_at DESC LIMIT 1",
+                (spider_name, time.time() - max_age)
+            ).fetchone()
+        return {'id': row[0], 'fetched_at': row[1], 'total': row[2]} if row else None
+
+    def save(self, spider_name: str, api_data: Dict[str, Any]) -> int:
+        """写入新快照，并删除该爬虫更早的快照 (只保留最近 CATALOG_KEEP 个)"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO snapshot (spider, fetched_at, total) VALUES (?, ?, ?)",
+                (spider_name, time.time(), len(api_data))
+            )
+            snapshot_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT OR REPLACE INTO record (snapshot_id, uid, data) VALUES (?, ?, ?)",
+                ((snapshot_id, str(k), _pack(k, v)) for k, v in api_data.items())
+            )
+            stale = [r[0] for r in conn.execute(
+                "SELECT id FROM snapshot WHERE spider = ? ORDER BY fetched_at DESC LIMIT -1 OFFSET ?",
+                (spider_name, CATALOG_KEEP)
+            )]
+            for old_id in stale:
+                conn.execute("DELETE FROM record WHERE snapshot_id = ?", (old_id,))
+                conn.execute("DELETE FROM snapshot WHERE id = ?", (old_id,))
+        logger.info(f"📚 {spider_name} 目录快照已保存: {len(api_data)} 条")
+        return snapshot_id
+
+    def load(self, snapshot_id: int, ids: Optional[Iterable] = None) -> Dict[str, Any]:
+        """读取快照；指定 ids 时只按主键读取这些ID"""
+        result = {}
+        with self._connect() as conn:
+            if ids is None:
+                rows = conn.execute("SELECT data FROM record WHERE snapshot_id = ?", (snapshot_id,))
+                for (blob,) in rows:
+                    key, value = _unpack(blob)
+                    result[key] = value
+                return result
+            uids = [str(i) for i in ids]
+            for start in range(0, len(uids), LOOKUP_CHUNK):
+                chunk = uids[start:start + LOOKUP_CHUNK]
+                rows = conn.execute(
+                    f"SELECT data FROM record WHERE snapshot_id = ? AND uid IN ({','.join('?' * len(chunk))})",
+                    (snapshot_id, *chunk)
+                )
+                for (blob,) in rows:
+                    key, value = _unpack(blob)
+                    result[key] = value
+        return result
+
+
+CATALOG = CatalogStore()
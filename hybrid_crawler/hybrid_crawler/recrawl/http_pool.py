@@ -0,0 +1,76 @@
+"""
+ClientPool - 补采共用的 aiohttp 连接池
+
+RecrawlManager 每次运行持有一个连接池，运行中的所有 Adapter (检查、补采、依次处理的各省) 共用：
+- 一个 TCPConnector：总连接数与每主机连接数上限、DNS 缓存、keep-alive，连接与 TLS 会话在各阶段间复用
+- 每个站点一个 CookieJar：同一站点不同请求头的会话共享 Cookie (如列表页下发、详情接口校验的会话 Cookie)
+aiohttp 的连接器绑定事件循环，连接池需在使用它的事件循环内创建和关闭
+"""
+import os
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+POOL_LIMIT = int(os.getenv('RECRAWL_POOL_LIMIT', 100))
+POOL_LIMIT_PER_HOST = int(os.getenv('RECRAWL_POOL_LIMIT_PER_HOST', 8))
+DNS_CACHE_TTL_SEC = int(os.getenv('RECRAWL_DNS_CACHE_TTL_SEC', 300))
+KEEPALIVE_SEC = float(os.getenv('RECRAWL_KEEPALIVE_SEC', 30))
+
+
+class ClientPool:
+    """按 (站点, 请求头) 复用 ClientSession，所有会话共用同一个连接器"""
+
+    def __init__(self, limit: int = POOL_LIMIT, limit_per_host: int = POOL_LIMIT_PER_HOST,
+                 dns_ttl: int = DNS_CACHE_TTL_SEC, keepalive: float = KEEPALIVE_SEC):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.connector: Optional[aiohttp.TCPConnector] = None
+        self.cookie_jars: Dict[str, aiohttp.CookieJar] = {}
+        self.sessions: Dict[Tuple, aiohttp.ClientSession] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_connector(self) -> aiohttp.TCPConnector:
+        if self.connector is None or self.connector.closed:
+            self.connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive,
+            )
+        return self.connector
+
+    def session(self, site: str, headers: Optional[Dict[str, str]] = None) -> aiohttp.ClientSession:
+        """借用站点会话 (由连接池负责关闭，调用方不要关闭)"""
+        headers = headers or {}
+        key = (site, tuple(sorted(headers.items())))
+        session = self.sessions.get(key)
+        if session is None or session.closed:
+            jar = self.cookie_jars.get(site)
+            if jar is None:
+                # unsafe=True: 允许 IP 地址形式的站点保存 Cookie
+                jar = self.cookie_jars[site] = aiohttp.CookieJar(unsafe=True)
+            session = self.sessions[key] = aiohttp.ClientSession(
+                connector=self._get_connector(),
+                connector_owner=False,
+                cookie_jar=jar,
+                headers=headers,
+            )
+        return session
+
+    async def close(self):
+        for session in self.sessions.values():
+            if not session.closed:
+                await session.close()
+        self.sessions.clear()
+        self.cookie_jars.clear()
+        if self.connector is not None and not self.connector.closed:
+            await self.connector.close()
+        self.connector = None
@@ -3,51 +3,50 @@ RecrawlManager - 补充采集统一管理器（异步版本）
 """
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional, List, Callable
 
 from .registry import get_adapter, list_adapters, is_registered
+from .http_pool import ClientPool
 
 logger = logging.getLogger(__name__)
 
 
 class RecrawlManager:
-    """补充采集统一管理器 - 异步版本"""
+    """
+    补充采集统一管理器 - 异步版本
+    每次调用持有一个 ClientPool，期间创建的 Adapter 共用其连接与 Cookie；
+    recrawl_all / check_all 依次处理各省时共用同一个连接池
+    """
 
     @staticmethod
-    async def find_missing(spider_name: str, stop_check: Callable = None) -> Dict[str, Any]:
-        """查找指定爬虫的缺失数据"""
-        _ensure_adapters_loaded()
-
-        if not is_registered(spider_name):
-            logger.warning(f"未找到 spider '{spider_name}' 的 Adapter")
-            return {}
-
-        adapter = get_adapter(spider_name, stop_check=stop_check)
-        return await adapter.find_missing()
+    async def find_missing(spider_name: str, stop_check: Callable = None, refresh: bool = False,
+                           http_pool: ClientPool = None) -> Dict[str, Any]:
+        """查找指定爬虫的缺失数据 (refresh=True 时不使用目录快照)"""
+        async with _borrow_pool(http_pool) as pool:
+            adapter = _get_adapter(spider_name, stop_check, pool)
+            if adapter is None:
+                return {}
+            return await adapter.find_missing(refresh)
 
     @staticmethod
-    async def recrawl(spider_name: str, missing_ids=None, stop_check: Callable = None) -> int:
+    async def recrawl(spider_name: str, missing_ids=None, stop_check: Callable = None,
+                      http_pool: ClientPool = None) -> int:
         """执行指定爬虫的补充采集"""
-        _ensure_adapters_loaded()
-
-        if not is_registered(spider_name):
-            logger.warning(f"未找到 spider '{spider_name}' 的 Adapter")
-            return 0
-
-        adapter = get_adapter(spider_name, stop_check=stop_check)
-        return await adapter.recrawl(missing_ids)
+        async with _borrow_pool(http_pool) as pool:
+            adapter = _get_adapter(spider_name, stop_check, pool)
+            if adapter is None:
+                return 0
+            return await adapter.recrawl(missing_ids)
 
     @staticmethod
-    async def full_recrawl(spider_name: str, stop_check: Callable = None) -> int:
+    async def full_recrawl(spider_name: str, stop_check: Callable = None, http_pool: ClientPool = None) -> int:
         """执行完整的补采流程：查找缺失 -> 补采"""
-        _ensure_adapters_loaded()
-
-        if not is_registered(spider_name):
-            logger.warning(f"未找到 spider '{spider_name}' 的 Adapter")
-            return 0
-
-        adapter = get_adapter(spider_name, stop_check=stop_check)
-        return await adapter.recrawl()
+        async with _borrow_pool(http_pool) as pool:
+            adapter = _get_adapter(spider_name, stop_check, pool)
+            if adapter is None:
+                return 0
+            return await adapter.recrawl()
 
     @staticmethod
     def list_spiders() -> List[str]:
@@ -61,21 +60,22 @@ class RecrawlManager:
         _ensure_adapters_loaded()
 
         results = {}
-        for spider_name in list_adapters().keys():
-            if stop_check and stop_check():
-                break
-            try:
-                missing = await RecrawlManager.find_missing(spider_name, stop_check)
-                results[spider_name] = {
-                    'missing_count': len(missing),
-                    'missing_data': missing
-                }
-            except Exception as e:
-                logger.error(f"检查 {spider_name} 失败: {e}")
-                results[spider_name] = {
-                    'missing_count': -1,
-                    'error': str(e)
-                }
+        async with ClientPool() as pool:
+            for spider_name in list_adapters().keys():
+                if stop_check and stop_check():
+                    break
+                try:
+                    missing = await RecrawlManager.find_missing(spider_name, stop_check, http_pool=pool)
+                    results[spider_name] = {
+                        'missing_count': len(missing),
+                        'missing_data': missing
+                    }
+                except Exception as e:
+                    logger.error(f"检查 {spider_name} 失败: {e}")
+                    results[spider_name] = {
+                        'missing_count': -1,
+                        'error': str(e)
+                    }
         return results
 
     @staticmethod
@@ -84,18 +84,37 @@ class RecrawlManager:
         _ensure_adapters_loaded()
 
         results = {}
-        for spider_name in list_adapters().keys():
-            if stop_check and stop_check():
-                break
-            try:
-                count = await RecrawlManager.full_recrawl(spider_name, stop_check)
-                results[spider_name] = count
-            except Exception as e:
-                logger.error(f"补采 {spider_name} 失败: {e}")
-                results[spider_name] = -1
+        async with ClientPool() as pool:
+            for spider_name in list_adapters().keys():
+                if stop_check and stop_check():
+                    break
+                try:
+                    count = await RecrawlManager.full_recrawl(spider_name, stop_check, http_pool=pool)
+                    results[spider_name] = count
+                except Exception as e:
+                    logger.error(f"补采 {spider_name} 失败: {e}")
+                    results[spider_name] = -1
         return results
 
 
+@asynccontextmanager
+async def _borrow_pool(http_pool: Optional[ClientPool]):
+    """沿用调用方的连接池，未传入时为本次调用创建一个"""
+    if http_pool is not None:
+        yield http_pool
+        return
+    async with ClientPool() as pool:
+        yield pool
+
+
+def _get_adapter(spider_name: str, stop_check: Callable, http_pool: ClientPool):
+    _ensure_adapters_loaded()
+    if not is_registered(spider_name):
+        logger.warning(f"未找到 spider '{spider_name}' 的 Adapter")
+        return None
+    return get_adapter(spider_name, stop_check=stop_check, http_pool=http_pool)
+
+
 _adapters_loaded = False
 
 
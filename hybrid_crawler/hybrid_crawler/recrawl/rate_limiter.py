@@ -0,0 +1,69 @@
+"""
+HostRateLimiter - 按目标主机的令牌桶限速 (补采并发请求共用)
+"""
+import asyncio
+import time
+from typing import Optional
+
+
+class ThrottledError(Exception):
+    """目标站点限流 (HTTP 429/503)，retry_after 为响应头 Retry-After 的秒数"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class HostRateLimiter:
+    """
+    令牌桶限速，并按响应自适应调整速率
+    - 每次请求前 acquire() 取一个令牌，令牌按 rate 个/秒补充，最多积累 burst 个
+    - 被限流时速率减半并暂停 retry_after 秒，其他错误时降为 70%
+    - 请求成功后每次恢复 max_rate 的 5%，直至 max_rate
+    事件循环单线程，取令牌的检查与扣减之间没有 await，无需加锁
+    """
+
+    def __init__(self, host: str, rate: float, burst: int = 1, min_rate: float = 0.1, logger=None):
+        self.host = host
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.logger = logger
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_error(self):
+        self._slow_down(0.7)
+
+    def on_throttled(self, retry_after: Optional[float] = None):
+        self._slow_down(0.5)
+        pause = retry_after if retry_after else 1 / self.rate
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        if self.logger:
+            self.logger.warning(f"⚠️ {self.host} 限流，暂停 {pause:.1f}s，速率降至 {self.rate:.2f} 次/秒")
+
+    def _slow_down(self, factor: float):
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.tokens = min(self.tokens, 0.0)
@@ -8,6 +8,12 @@ import time
 import uuid
 import requests
 from .mixins import SpiderStatusMixin
+from ..utils.projection import fill_item
+
+# _create_item 中需要单独处理、不从药品信息复制的字段
+DRUG_EXCLUDE_FIELDS = ('md5_id', 'collect_time', 'url', 'url_hash', 'hospital_purchases', 'page_num', 'hospital_name')
+# 补采时还需排除医院相关字段
+HOSPITAL_FIELDS = DRUG_EXCLUDE_FIELDS + ('hospital_admdvs', 'hospital_shp_cnt', 'hospital_shp_time', 'hospital_is_public')
 
 # http://ylbzj.hebei.gov.cn/category/162
 class HebeiDrugSpider(SpiderStatusMixin, BaseRequestSpider):
@@ -107,12 +113,7 @@ class HebeiDrugSpider(SpiderStatusMixin, BaseRequestSpider):
                 url = f"{cls.hospital_api_url}?pageNo=1&pageSize=1000&prodCode={prod_code}&prodEntpCode={prodentp_code}"
                 if hospital_list:
                     for hosp in hospital_list:
-                        item = HebeiDrugItem()
-                        for field_name in item.fields:
-                            if field_name in ['md5_id', 'collect_time', 'url', 'url_hash', 'hospital_purchases', 'page_num', 'hospital_name', 'hospital_admdvs', 'hospital_shp_cnt', 'hospital_shp_time', 'hospital_is_public']:
-                                continue
-                            if field_name in drug_info:
-                                item[field_name] = drug_info[field_name]
+                        item = fill_item(HebeiDrugItem(), drug_info, exclude=HOSPITAL_FIELDS)
                         item['hospital_purchases'] = hosp
                         item['hospital_name'] = hosp.get('prodEntpName') or hosp.get('hospitalName') or hosp.get('medinsName')
                         item['hospital_admdvs'] = hosp.get('prodEntpAdmdvs') or hosp.get('admdvsName')
@@ -147,12 +148,7 @@ class HebeiDrugSpider(SpiderStatusMixin, BaseRequestSpider):
                         )
                         db_session.add(record)
                 else:
-                    item = HebeiDrugItem()
-                    for field_name in item.fields:
-                        if field_name in ['md5_id', 'collect_time', 'url', 'url_hash', 'hospital_purchases', 'page_num', 'hospital_name', 'hospital_admdvs', 'hospital_shp_cnt', 'hospital_shp_time', 'hospital_is_public']:
-                            continue
-                        if field_name in drug_info:
-                            item[field_name] = drug_info[field_name]
+                    item = fill_item(HebeiDrugItem(), drug_info, exclude=HOSPITAL_FIELDS)
                     item['hospital_purchases'] = None
                     item['hospital_name'] = None
                     item['hospital_admdvs'] = None
@@ -502,17 +498,11 @@ class HebeiDrugSpider(SpiderStatusMixin, BaseRequestSpider):
         """
         构建 HebeiDrugItem
         """
-        base_item = HebeiDrugItem()
-        
         prodentp_code = drug_info.get("prodentpCode")
         prod_code = drug_info.get("prodCode")
         
         # 1. 设置药品基础信息
-        for field_name in base_item.fields:
-            if field_name in ['md5_id', 'collect_time', 'url', 'url_hash', 'hospital_purchases', 'page_num', 'hospital_name']:
-                continue
-            if field_name in drug_info:
-                base_item[field_name] = drug_info[field_name]
+        base_item = fill_item(HebeiDrugItem(), drug_info, exclude=DRUG_EXCLUDE_FIELDS)
 
         url = f"{self.hospital_api_url}?pageNo=1&pageSize=1000&prodCode={prod_code}&prodEntpCode={prodentp_code}"
         items = []
@@ -11,8 +11,12 @@ import requests
 from scrapy.http import JsonRequest, FormRequest
 import os
 from .mixins import SpiderStatusMixin
+from ..utils.projection import fill_item
 from scrapy.utils.project import get_project_settings
 
+# 需要单独处理、不从 API 数据复制的字段
+SYSTEM_FIELDS = ('id', 'collect_time', 'url', 'url_hash', 'page_num')
+
 class LiaoningDrugSpider(SpiderStatusMixin, BaseRequestSpider):
     """
     辽宁药店数据爬虫
@@ -115,11 +119,8 @@ class LiaoningDrugSpider(SpiderStatusMixin, BaseRequestSpider):
             time.sleep(3)
             try:
                 # 1. 使用 Item 生成正确的 MD5 指纹
-                item = LiaoningDrugItem()
                 # 填充 Item 字段
-                for k in item.fields:
-                    if k in drug_info:
-                        item[k] = drug_info[k]
+                item = fill_item(LiaoningDrugItem(), drug_info)
                 
                 # 生成指纹 (使用 Mixin 逻辑)
                 item.generate_md5_id()
@@ -361,13 +362,8 @@ class LiaoningDrugSpider(SpiderStatusMixin, BaseRequestSpider):
         :param drug_item: 请求获取的药品信息 (Dict)
         :param page_num: 采集页码
         """
-        item = LiaoningDrugItem()
-        
-        # 直接使用API返回的字段名（驼峰命名）
-        for field_name in item.fields:
-            if field_name in ['id', 'collect_time', 'url', 'url_hash', 'page_num']:
-                continue  # 跳过需要单独处理的字段
-            item[field_name] = drug_item.get(field_name, '')
+        # 直接使用API返回的字段名（驼峰命名），跳过需要单独处理的字段
+        item = fill_item(LiaoningDrugItem(), drug_item, exclude=SYSTEM_FIELDS, default='')
         
         # 设置URL字段
         item['url'] = f"https://nhsa.drug/{drug_item.get('goodscode', 'unknown')}"
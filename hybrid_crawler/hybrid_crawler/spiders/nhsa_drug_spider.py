@@ -6,6 +6,10 @@ import scrapy
 import time
 import uuid
 from .mixins import SpiderStatusMixin
+from ..utils.projection import fill_item
+
+# 需要单独处理、不从 API 数据复制的字段
+SYSTEM_FIELDS = ('id', 'collect_time', 'url', 'url_hash', 'page_num')
 
 class NhsaDrugSpider(SpiderStatusMixin, BaseRequestSpider):
     """
@@ -215,13 +219,8 @@ class NhsaDrugSpider(SpiderStatusMixin, BaseRequestSpider):
         :param drug_item: 请求获取的药品信息 (Dict)
         :param page_num: 采集页码
         """
-        item = NhsaDrugItem()
-        
-        # 直接使用API返回的字段名（驼峰命名）
-        for field_name in item.fields:
-            if field_name in ['id', 'collect_time', 'url', 'url_hash', 'page_num']:
-                continue  # 跳过需要单独处理的字段
-            item[field_name] = drug_item.get(field_name, '')
+        # 直接使用API返回的字段名（驼峰命名），跳过需要单独处理的字段
+        item = fill_item(NhsaDrugItem(), drug_item, exclude=SYSTEM_FIELDS, default='')
         
         # 设置URL字段
         item['url'] = f"https://nhsa.drug/{drug_item.get('goodscode', 'unknown')}"
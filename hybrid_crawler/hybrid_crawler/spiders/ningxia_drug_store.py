@@ -7,6 +7,7 @@ import time
 import uuid
 import requests
 from .mixins import SpiderStatusMixin
+from ..utils.projection import fill_item
 
 class NingxiaDrugSpider(SpiderStatusMixin, BaseRequestSpider):
     """
@@ -378,12 +379,8 @@ class NingxiaDrugSpider(SpiderStatusMixin, BaseRequestSpider):
 
     def _create_item(self, drug_info, hosp_item, response=None):
         """合并药品信息和医院信息"""
-        item = NingxiaDrugItem()
-        
         # 1. 填充药品基础信息
-        for key, value in drug_info.items():
-            if key in item.fields:
-                item[key] = value
+        item = fill_item(NingxiaDrugItem(), drug_info)
                 
         # 2. 填充/覆盖医院特有信息
         if 'hospitalName' in hosp_item:
@@ -3,6 +3,7 @@ from .base_spiders import BaseRequestSpider
 from ..models.ningxia_drug import NingxiaDrugItem
 from urllib.parse import urlencode
 from ..utils.logger_utils import get_spider_logger
+from ..utils.projection import fill_item
 import json
 import scrapy
 import time
@@ -235,14 +236,8 @@ class NingxiaDrugSpider(BaseRequestSpider):
         :param order_item: 从API获取的订单信息 (Dict)
         :param page_num: 采集页码
         """
-        item = NingxiaDrugItem()
-        
-        # 1. 设置订单信息字段
-        for field_name in item.fields:
-            if field_name in ['md5_id', 'collect_time', 'url', 'url_hash', 'page_num']:
-                continue  # 跳过需要单独处理的字段
-            if field_name in order_item:
-                item[field_name] = order_item[field_name]
+        # 1. 设置订单信息字段 (跳过需要单独处理的字段)
+        item = fill_item(NingxiaDrugItem(), order_item, exclude=('md5_id', 'collect_time', 'url', 'url_hash', 'page_num'))
         
         # 2. 设置URL字段
         item['url'] = f"{self.list_api_url}?page={page_num}"
@@ -3,6 +3,7 @@ from .base_spiders import BaseRequestSpider
 from ..models.ningxia_drug import NingxiaDrugItem
 from urllib.parse import urlencode
 from ..utils.logger_utils import get_spider_logger
+from ..utils.projection import fill_item
 import json
 import scrapy
 import time
@@ -387,17 +388,14 @@ class NingxiaDrugSpider(BaseRequestSpider):
         """
         构建 NingxiaDrugItem
         """
-        item = NingxiaDrugItem()
-        
         prodentp_code = drug_info.get("prodentpCode")
         prod_code = drug_info.get("prodCode")
         
-        # 1. 设置药品基础信息
-        for field_name in item.fields:
-            if field_name in ['md5_id', 'collect_time', 'url', 'url_hash', 'hospital_purchases', 'page_num']:
-                continue  # 跳过需要单独处理的字段
-            if field_name in drug_info:
-                item[field_name] = drug_info[field_name]
+        # 1. 设置药品基础信息 (跳过需要单独处理的字段)
+        item = fill_item(
+            NingxiaDrugItem(), drug_info,
+            exclude=('md5_id', 'collect_time', 'url', 'url_hash', 'hospital_purchases', 'page_num')
+        )
         
         # 2. 设置医院采购信息
         item['hospital_purchases'] = hospital_list
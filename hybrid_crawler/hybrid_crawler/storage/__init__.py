@@ -1,5 +1,8 @@
 from .base import StorageBackend
 from .mysql import MySQLStorage
+from .sqlite import SQLiteStorage
 from .elasticsearch import ElasticsearchStorage
+from .parquet import ParquetStorage
+from .composite import CompositeStorage, StorageSink
 
-__all__ = ['StorageBackend', 'MySQLStorage', 'ElasticsearchStorage']
+__all__ = ['StorageBackend', 'MySQLStorage', 'SQLiteStorage', 'ElasticsearchStorage', 'ParquetStorage', 'CompositeStorage', 'StorageSink']
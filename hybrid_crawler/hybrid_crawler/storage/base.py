@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Set, Any
+from typing import List, Set, Any, Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,7 +26,31 @@ class StorageBackend(ABC):
         :return: 成功写入的数量
         """
         pass
+
+    def save_batch_stats(self, items: List[Any], known_new: Optional[Set[str]] = None) -> Dict[str, int]:
+        """
+        批量保存数据并返回细分统计
+        默认委托 save_batch，未写入的部分统一计为 ignored
+        :param items: Item对象列表
+        :param known_new: 已确认库中不存在的 md5_id (可跳过查重，后端可忽略)
+        :return: {'inserted': n, 'updated': n, 'ignored': n}
+        """
+        inserted = self.save_batch(items)
+        return {'inserted': inserted, 'updated': 0, 'ignored': max(len(items) - inserted, 0)}
         
+    def is_durable(self) -> bool:
+        """
+        已返回的写入是否都已持久化 (可选)
+        先缓冲、稍后落盘的后端返回 False 时，管道暂缓确认 WAL，直到再次返回 True
+        """
+        return True
+
+    def open(self, spider_name: str):
+        """
+        绑定当前爬虫 (可选，按爬虫分区的后端使用)
+        """
+        pass
+
     def close(self):
         """
         关闭连接 (可选)
@@ -0,0 +1,300 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Set, Any, Dict, Optional
+
+from .base import StorageBackend
+from .spool import WriteAheadSpool
+
+logger = logging.getLogger(__name__)
+
+class StorageSink:
+    """
+    组合存储中的单个写入目标
+    - 每个 Sink 有独立的批次大小、重试策略和单线程执行器
+    - 主 Sink 在调用线程中同步写入 (写入结果决定 WAL 是否确认)
+    - 从 Sink 异步写入：批次先进入自身缓冲，凑满 batch_size 或等待超过 linger_sec 后提交给执行器，
+      积压超过 max_pending 时不再入队，保证慢速目标不会拖住主 Sink
+    - 从 Sink 放弃的批次 (积压超限、重试耗尽) 写入自身的死信 WAL，由下次启动或 scripts/replay_spool.py 重放到该后端
+    """
+
+    def __init__(self, name: str, backend: StorageBackend, batch_size: int = 500,
+                 max_retries: int = 3, retry_backoff: float = 1.0,
+                 max_pending: int = 50000, linger_sec: float = 5.0):
+        self.name = name
+        self.backend = backend
+        self.batch_size = max(int(batch_size), 1)
+        self.max_retries = max(int(max_retries), 0)
+        self.retry_backoff = retry_backoff
+        self.max_pending = max_pending
+        self.linger_sec = linger_sec
+
+        self.lock = threading.Lock()
+        self.executor = None
+        self.buffer = []
+        self.buffer_since = None
+        # 已接收但尚未写完的 Item 数 (缓冲 + 执行器队列)
+        self.pending = 0
+        # 最早一批未写完数据的接收时间，用于计算滞后秒数
+        self.pending_since = []
+        # 死信 WAL (open_dead_letter 时创建)：只追加不确认，段文件保留到重放成功
+        self.dead_letter: Optional[WriteAheadSpool] = None
+
+        self.stats = {
+            'batches': 0,
+            'items_inserted': 0,
+            'items_updated': 0,
+            'items_ignored': 0,
+            'items_failed': 0,
+            'items_dropped': 0,
+            'items_dead_lettered': 0,
+            'retries': 0,
+            'busy_seconds': 0.0,
+            'latency_last': 0.0,
+        }
+
+    # ==========================================
+    # 写入
+    # ==========================================
+
+    def write(self, items: List[Any], known_new: Optional[Set[str]] = None) -> Dict[str, int]:
+        """同步写入 (主 Sink)，按 batch_size 分块，重试耗尽后抛出异常"""
+        totals = {'inserted': 0, 'updated': 0, 'ignored': 0}
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start:start + self.batch_size]
+            result = self._write_with_retry(chunk, known_new)
+            for key in totals:
+                totals[key] += result.get(key, 0)
+        return totals
+
+    def _write_with_retry(self, chunk: List[Any], known_new: Optional[Set[str]] = None) -> Dict[str, int]:
+        attempt = 0
+        while True:
+            start = time.time()
+            try:
+                result = self.backend.save_batch_stats(chunk, known_new=known_new)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    with self.lock:
+                        self.stats['items_failed'] += len(chunk)
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                with self.lock:
+                    self.stats['retries'] += 1
+                logger.warning(f"⚠️ [{self.name}] 写入失败，{delay:.1f}s 后第 {attempt} 次重试: {e}")
+                time.sleep(delay)
+                continue
+
+            latency = time.time() - start
+            with self.lock:
+                self.stats['batches'] += 1
+                self.stats['busy_seconds'] += latency
+                self.stats['latency_last'] = round(latency, 3)
+                for key in ('inserted', 'updated', 'ignored'):
+                    self.stats[f'items_{key}'] += result.get(key, 0)
+            return result
+
+    def enqueue(self, items: List[Any]) -> None:
+        """异步写入 (从 Sink)：放入缓冲，凑满批次或超过 linger_sec 后提交"""
+        now = time.time()
+        with self.lock:
+            pending = self.pending
+            overflow = self.max_pending and pending + len(items) > self.max_pending
+            chunks = []
+            if overflow:
+                self.stats['items_dropped'] += len(items)
+            else:
+                if not self.buffer:
+                    self.buffer_since = now
+                self.buffer.extend(items)
+                self.pending += len(items)
+                while len(self.buffer) >= self.batch_size:
+                    chunks.append(self.buffer[:self.batch_size])
+                    self.buffer = self.buffer[self.batch_size:]
+                if self.buffer and now - self.buffer_since >= self.linger_sec:
+                    chunks.append(self.buffer)
+                    self.buffer = []
+                if chunks and self.buffer:
+                    self.buffer_since = now
+        if overflow:
+            # 死信写盘在锁外进行，不阻塞执行器线程更新积压
+            logger.error(f"❌ [{self.name}] 积压 {pending} 条超过上限 {self.max_pending}，{len(items)} 条转入死信")
+            self._save_dead_letter(items)
+            return
+        for chunk in chunks:
+            self._submit(chunk, now)
+
+    def _submit(self, chunk: List[Any], received_at: float) -> None:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sink-{self.name}")
+            self.pending_since.append(received_at)
+            executor = self.executor
+        executor.submit(self._run_async, chunk, received_at)
+
+    def _run_async(self, chunk: List[Any], received_at: float) -> None:
+        try:
+            self._write_with_retry(chunk)
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] 重试耗尽，{len(chunk)} 条转入死信: {e}")
+            self._save_dead_letter(chunk)
+        finally:
+            with self.lock:
+                self.pending -= len(chunk)
+                self.pending_since.remove(received_at)
+
+    # ==========================================
+    # 死信
+    # ==========================================
+
+    def open_dead_letter(self, directory: str) -> None:
+        self.close_dead_letter()
+        self.dead_letter = WriteAheadSpool(directory)
+
+    def _save_dead_letter(self, items: List[Any]) -> None:
+        """放弃的批次追加到死信 WAL (不确认，重放前一直保留)"""
+        if self.dead_letter is None:
+            logger.error(f"❌ [{self.name}] 未启用死信 WAL，{len(items)} 条丢失")
+            return
+        try:
+            self.dead_letter.append(items)
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] 写入死信 WAL 失败，{len(items)} 条丢失: {e}")
+            return
+        with self.lock:
+            self.stats['items_dead_lettered'] += len(items)
+
+    def replay_dead_letter(self, chunk_size: int = 5000) -> Optional[int]:
+        """将上次残留的死信段重放到本 Sink 的后端 (后端按 md5_id 幂等)"""
+        if self.dead_letter is None or not self.dead_letter.leftover_segments:
+            return 0
+        logger.info(f"♻️ [{self.name}] 重放 {len(self.dead_letter.leftover_segments)} 个死信段...")
+        return self.dead_letter.replay(self.backend, chunk_size=chunk_size)
+
+    def close_dead_letter(self) -> None:
+        if self.dead_letter is not None:
+            if self.dead_letter.pending_batches:
+                logger.warning(
+                    f"⚠️ [{self.name}] {self.dead_letter.pending_batches} 个批次保留在死信 WAL ({self.dead_letter.directory})"
+                )
+            self.dead_letter.close()
+            self.dead_letter = None
+
+    def flush_idle(self) -> None:
+        """缓冲停留超过 linger_sec 时提交 (由管道定时器调用，避免采集空闲时数据滞留)"""
+        with self.lock:
+            if not self.buffer or time.time() - self.buffer_since < self.linger_sec:
+                return
+            chunk, self.buffer = self.buffer, []
+            received_at = self.buffer_since
+        self._submit(chunk, received_at)
+
+    def drain(self) -> None:
+        """提交剩余缓冲并等待执行器写完 (关闭时调用)"""
+        with self.lock:
+            chunk, self.buffer = self.buffer, []
+            received_at = self.buffer_since or time.time()
+        if chunk:
+            self._submit(chunk, received_at)
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+    # ==========================================
+    # 统计
+    # ==========================================
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前统计：累计写入量、积压条数、滞后秒数、吞吐 (条/秒，按实际写入耗时计)"""
+        with self.lock:
+            data = dict(self.stats)
+            data['pending'] = self.pending
+            oldest = min(self.pending_since) if self.pending_since else (self.buffer_since if self.buffer else None)
+        data['lag_seconds'] = round(time.time() - oldest, 3) if oldest else 0.0
+        written = data['items_inserted'] + data['items_updated'] + data['items_ignored']
+        data['throughput'] = round(written / data['busy_seconds'], 1) if data['busy_seconds'] else 0.0
+        data['busy_seconds'] = round(data['busy_seconds'], 3)
+        return data
+
+
+class CompositeStorage(StorageBackend):
+    """
+    扇出组合存储：同一批数据写入多个存储后端
+    第一个 Sink 为主 Sink (同步写入，决定写入统计与 WAL 确认；查重、成员索引等能力也委托给它)，
+    其余 Sink 在各自线程中异步写入，互不阻塞；指定 dead_letter_dir 时从 Sink 放弃的批次
+    写入 <dead_letter_dir>/<爬虫>/sink-<名称>/ 下的死信 WAL
+    """
+
+    def __init__(self, sinks: List[StorageSink], dead_letter_dir: Optional[str] = None):
+        if not sinks:
+            raise ValueError("CompositeStorage 至少需要一个 Sink")
+        self.sinks = sinks
+        self.primary = sinks[0]
+        self.secondaries = sinks[1:]
+        self.dead_letter_dir = dead_letter_dir
+        logger.info(
+            f"Composite Storage initialized. Primary: {self.primary.name}, "
+            f"Secondaries: {[s.name for s in self.secondaries]}"
+        )
+
+    def __getattr__(self, name):
+        # 主 Sink 特有的能力 (如 build_membership_index) 直接透传
+        if name in ('sinks', 'primary', 'secondaries', 'dead_letter_dir'):
+            raise AttributeError(name)
+        return getattr(self.primary.backend, name)
+
+    def check_existence(self, ids: List[str]) -> Set[str]:
+        return self.primary.backend.check_existence(ids)
+
+    def save_batch(self, items: List[Any]) -> int:
+        return self.save_batch_stats(items)['inserted']
+
+    def is_durable(self) -> bool:
+        # WAL 确认跟随主 Sink
+        return self.primary.backend.is_durable()
+
+    def save_batch_stats(self, items: List[Any], known_new: Optional[Set[str]] = None) -> Dict[str, int]:
+        if not items:
+            return {'inserted': 0, 'updated': 0, 'ignored': 0}
+        # 先交给从 Sink (仅入队，不阻塞)，再同步写主 Sink
+        for sink in self.secondaries:
+            sink.enqueue(items)
+        return self.primary.write(items, known_new=known_new)
+
+    def flush_idle(self) -> None:
+        for sink in self.secondaries:
+            sink.flush_idle()
+
+    def get_sink_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {sink.name: sink.snapshot() for sink in self.sinks}
+
+    def open(self, spider_name: str):
+        for sink in self.sinks:
+            sink.backend.open(spider_name)
+        if self.dead_letter_dir:
+            for sink in self.secondaries:
+                sink.open_dead_letter(os.path.join(self.dead_letter_dir, spider_name, f"sink-{sink.name}"))
+
+    @property
+    def dead_letter_segments(self) -> int:
+        """各从 Sink 上次残留的死信段数"""
+        return sum(len(s.dead_letter.leftover_segments) for s in self.secondaries if s.dead_letter)
+
+    def replay_dead_letters(self, chunk_size: int = 5000) -> Dict[str, Optional[int]]:
+        """重放各从 Sink 的死信，返回 {Sink名称: 重放条数 (中断为 None)}"""
+        return {sink.name: sink.replay_dead_letter(chunk_size) for sink in self.secondaries}
+
+    def close(self):
+        for sink in self.secondaries:
+            logger.info(f"⏳ 等待 {sink.name} 写完积压的 {sink.pending} 条...")
+            sink.drain()
+            sink.close_dead_letter()
+        for sink in self.sinks:
+            try:
+                sink.backend.close()
+            except Exception as e:
+                logger.error(f"关闭 {sink.name} 失败: {e}")
@@ -1,6 +1,8 @@
-from typing import List, Set, Any
+from typing import List, Set, Any, Dict, Iterator, Optional
 import logging
+import time
 import os
+import threading
 
 try:
     from elasticsearch import Elasticsearch, helpers
@@ -12,22 +14,47 @@ from .base import StorageBackend
 
 logger = logging.getLogger(__name__)
 
+# bulk: 单次 helpers.bulk (默认) | streaming: streaming_bulk 逐块发送，内置 429 退避重试
+# parallel: parallel_bulk 多线程发送，429 拒绝的文档退避后重发
+BULK_MODES = ('bulk', 'streaming', 'parallel')
+
 class ElasticsearchStorage(StorageBackend):
-    def __init__(self, hosts, user=None, password=None, index_prefix='drug_store'):
+    def __init__(self, hosts, user=None, password=None, index_prefix='drug_store',
+                 bulk_mode='bulk', chunk_size=500, max_chunk_bytes=10 * 1024 * 1024, thread_count=4,
+                 max_retries=3, initial_backoff=2, max_backoff=60, tune_for_bulk=False):
         if not Elasticsearch:
             raise ImportError("elasticsearch library is not installed. Please run 'pip install elasticsearch'")
-        
+
         # 处理认证
         http_auth = (user, password) if user and password else None
-        
+
         # 初始化客户端
         self.client = Elasticsearch(
-            hosts=hosts, 
+            hosts=hosts,
             http_auth=http_auth,
             timeout=30
         )
         self.index_prefix = index_prefix
-        logger.info(f"Elasticsearch Storage initialized. Hosts: {hosts}, Prefix: {index_prefix}")
+
+        if bulk_mode not in BULK_MODES:
+            logger.warning(f"未知的 ES 写入模式 {bulk_mode}，使用 bulk")
+            bulk_mode = 'bulk'
+        self.bulk_mode = bulk_mode
+        self.chunk_size = chunk_size
+        # 单个 bulk 请求的字节上限，hospital_purchases 等大文档按体积而非条数切块
+        self.max_chunk_bytes = max_chunk_bytes
+        self.thread_count = thread_count
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        # 采集期间关闭刷新与副本，close() 时恢复: {索引名: 原始设置}
+        self.tune_for_bulk = tune_for_bulk
+        self.tuned_indices: Dict[str, Dict[str, Any]] = {}
+        self.tune_lock = threading.Lock()
+        logger.info(
+            f"Elasticsearch Storage initialized. Hosts: {hosts}, Prefix: {index_prefix}, Mode: {bulk_mode}"
+        )
 
     def _get_index_name(self, item: Any) -> str:
         """
@@ -44,58 +71,195 @@ class ElasticsearchStorage(StorageBackend):
         # 无需额外的 check_existence 查询。
         return set()
 
-    def save_batch(self, items: List[Any]) -> int:
-        if not items: return 0
-        
-        actions = []
+    def _iter_actions(self, items: List[Any]) -> Iterator[Dict[str, Any]]:
+        """逐条生成 Bulk Action (不预先构建完整列表)"""
         for item in items:
-            adapter = ItemAdapter(item)
             # 转为字典
-            doc = adapter.asdict()
-            
-            # 移除非序列化对象 (如果有)
-            # ...
-            
+            doc = ItemAdapter(item).asdict()
+
             # 使用 md5_id 作为文档 _id
             doc_id = doc.get('md5_id')
             if not doc_id:
-                # 如果没有 md5_id，尝试生成? 或者跳过?
                 # 假设 Phase 3 保证了 md5_id 存在
                 logger.debug("Item missing md5_id, skipping ES indexing")
                 continue
-                
+
             index_name = self._get_index_name(item)
-            
+            if self.tune_for_bulk and index_name not in self.tuned_indices:
+                with self.tune_lock:
+                    if index_name not in self.tuned_indices:
+                        self._tune_index(index_name)
+
             # 构建 Bulk Action
-            action = {
+            yield {
                 "_index": index_name,
                 "_id": doc_id,
                 "_source": doc,
                 "_op_type": "create"  # 关键: 仅在 ID 不存在时创建
             }
-            actions.append(action)
-            
-        if not actions:
-            return 0
-            
-        success_count = 0
+
+    def save_batch(self, items: List[Any]) -> int:
+        return self.save_batch_stats(items)['inserted']
+
+    def save_batch_stats(self, items: List[Any], known_new: Optional[Set[str]] = None) -> Dict[str, int]:
+        """
+        返回 {'inserted', 'updated', 'ignored'}，ignored 仅为已存在 (409) 的文档
+        连接 / 传输异常、重试后仍失败的文档会抛出异常，由调用方重试 (StorageSink) 或保留 WAL 待重放
+        """
+        stats = {'inserted': 0, 'updated': 0, 'ignored': 0, 'failed': 0}
+        if not items:
+            return {'inserted': 0, 'updated': 0, 'ignored': 0}
+
+        if self.bulk_mode == 'streaming':
+            self._bulk_streaming(self._iter_actions(items), stats)
+        elif self.bulk_mode == 'parallel':
+            self._bulk_parallel(self._iter_actions(items), stats)
+        else:
+            try:
+                # raise_on_error=False: 文档级失败 (如已存在) 通过 errors 返回，传输异常仍会抛出
+                success, errors = helpers.bulk(
+                    self.client,
+                    self._iter_actions(items),
+                    raise_on_error=False,
+                    refresh=False # 提高写入性能
+                )
+            except Exception as e:
+                logger.error(f"ES Bulk Index error: {e}")
+                raise
+            stats['inserted'] = success
+            for info in errors:
+                self._tally(False, info, stats)
+
+        failed = stats.pop('failed')
+        if failed:
+            # create 写入幂等：整批重试时已写入的文档返回 409，计为 ignored
+            raise RuntimeError(f"ES 写入失败 {failed} 条 (已写入 {stats['inserted']} 条)")
+        return stats
+
+    # ==========================================
+    # 分块写入
+    # ==========================================
+
+    @staticmethod
+    def _result_status(info: Dict[str, Any]) -> int:
+        # info 形如 {'create': {'_index': ..., '_id': ..., 'status': 409, 'error': {...}}}
+        result = next(iter(info.values()), {}) if info else {}
+        return result.get('status', 0)
+
+    def _tally(self, ok: bool, info: Dict[str, Any], stats: Dict[str, int], retry_429: bool = False) -> int:
+        status = self._result_status(info)
+        if ok:
+            stats['inserted'] += 1
+        elif status == 409:
+            # 文档已存在 (create 冲突)
+            stats['ignored'] += 1
+        elif not (status == 429 and retry_429):
+            stats['failed'] += 1
+            logger.error(f"ES 文档写入失败: {info}")
+        return status
+
+    def _bulk_streaming(self, actions: Iterator[Dict[str, Any]], stats: Dict[str, int]) -> None:
+        """streaming_bulk: 按条数与字节双重上限切块，429 由 helpers 按指数退避重试"""
         try:
-            # 执行 Bulk 操作
-            # raise_on_error=False: 忽略部分失败 (如已存在)
-            # stats_only=True: 仅返回成功数量 (旧版) / 
-            # bulk 返回 (success_count, errors_list)
-            success, errors = helpers.bulk(
-                self.client, 
-                actions, 
+            for ok, info in helpers.streaming_bulk(
+                self.client,
+                actions,
+                chunk_size=self.chunk_size,
+                max_chunk_bytes=self.max_chunk_bytes,
+                max_retries=self.max_retries,
+                initial_backoff=self.initial_backoff,
+                max_backoff=self.max_backoff,
                 raise_on_error=False,
-                refresh=False # 提高写入性能
-            )
-            success_count = success
-            
-            # 如果需要统计有多少是"已存在"导致的失败，可以分析 errors
-            # 但这里我们只关心成功写入的新增数量
-            
+                raise_on_exception=False,
+                yield_ok=True,
+            ):
+                self._tally(ok, info, stats)
+        except Exception as e:
+            logger.error(f"ES Streaming Bulk error: {e}")
+            raise
+
+    def _bulk_parallel(self, actions: Iterator[Dict[str, Any]], stats: Dict[str, int]) -> None:
+        """
+        parallel_bulk: thread_count 个线程并发发送分块
+        parallel_bulk 不处理 429，被拒绝的文档收集后按指数退避重发，最多 max_retries 轮
+        """
+        pending = actions
+        for attempt in range(self.max_retries + 1):
+            sent = {}
+            rejected = []
+
+            def track(stream):
+                # 记录已发送的 Action，用于按 (_index, _id) 找回被拒绝的文档
+                for action in stream:
+                    sent[(action['_index'], action['_id'])] = action
+                    yield action
+
+            try:
+                for ok, info in helpers.parallel_bulk(
+                    self.client,
+                    track(pending),
+                    thread_count=self.thread_count,
+                    chunk_size=self.chunk_size,
+                    max_chunk_bytes=self.max_chunk_bytes,
+                    raise_on_error=False,
+                    raise_on_exception=False,
+                ):
+                    if self._tally(ok, info, stats, retry_429=attempt < self.max_retries) == 429:
+                        result = next(iter(info.values()))
+                        action = sent.get((result.get('_index'), result.get('_id')))
+                        if action:
+                            rejected.append(action)
+            except Exception as e:
+                logger.error(f"ES Parallel Bulk error: {e}")
+                raise
+
+            if not rejected or attempt >= self.max_retries:
+                return
+            delay = min(self.max_backoff, self.initial_backoff * (2 ** attempt))
+            logger.warning(f"⚠️ ES 拒绝 {len(rejected)} 条 (429)，{delay}s 后重试")
+            time.sleep(delay)
+            pending = iter(rejected)
+
+    # ==========================================
+    # 索引调优
+    # ==========================================
+
+    def _tune_index(self, index_name: str) -> None:
+        """写入前关闭刷新、副本数置 0，记录原始设置供 close() 恢复"""
+        self.tuned_indices[index_name] = {}
+        try:
+            if self.client.indices.exists(index=index_name):
+                current = self.client.indices.get_settings(index=index_name)
+                index_settings = current.get(index_name, {}).get('settings', {}).get('index', {})
+                # 未显式设置的项恢复为 None (即集群默认值)
+                self.tuned_indices[index_name] = {
+                    'refresh_interval': index_settings.get('refresh_interval'),
+                    'number_of_replicas': index_settings.get('number_of_replicas'),
+                }
+                self.client.indices.put_settings(
+                    index=index_name,
+                    body={'index': {'refresh_interval': '-1', 'number_of_replicas': 0}}
+                )
+            else:
+                self.tuned_indices[index_name] = {'refresh_interval': None, 'number_of_replicas': None}
+                self.client.indices.create(
+                    index=index_name,
+                    body={'settings': {'index': {'refresh_interval': '-1', 'number_of_replicas': 0}}}
+                )
+            logger.info(f"ES 索引 {index_name} 已切换为批量写入设置 (refresh_interval=-1, replicas=0)")
         except Exception as e:
-            logger.error(f"ES Bulk Index error: {e}")
-            
-        return success_count
+            logger.warning(f"ES 索引 {index_name} 调优失败，按原设置写入: {e}")
+
+    def close(self):
+        """恢复采集期间调整过的索引设置并刷新"""
+        for index_name, original in self.tuned_indices.items():
+            if not original:
+                continue
+            try:
+                self.client.indices.put_settings(index=index_name, body={'index': original})
+                self.client.indices.refresh(index=index_name)
+                logger.info(f"ES 索引 {index_name} 设置已恢复: {original}")
+            except Exception as e:
+                logger.error(f"ES 索引 {index_name} 设置恢复失败: {e}")
+        self.tuned_indices.clear()
+        self.client.close()
@@ -0,0 +1,107 @@
+import math
+import hashlib
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """
+    定长 Bloom 过滤器 (bytearray 位图)
+    内存 = -n·ln(p) / (ln2)² 位，只会误报 (possible hit)，不会漏报
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01):
+        capacity = max(int(capacity), 1)
+        fp_rate = min(max(float(fp_rate), 1e-6), 0.5)
+        self.num_bits = max(int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.count = 0
+
+    def _positions(self, digest: bytes):
+        # 双重哈希: md5 摘要本身已均匀分布，直接切成两个 64 位整数
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, digest: bytes) -> None:
+        bits = self.bits
+        for pos in self._positions(digest):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self.bits
+        for pos in self._positions(digest):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.bits)
+
+
+class Md5MembershipIndex:
+    """
+    单表 md5_id 成员索引
+    open_spider 时一次流式扫描目标表构建；写入前用于判断:
+    - 不在索引中 -> 一定是新数据，可跳过数据库查重
+    - 在索引中   -> 可能重复 (含误报)，仍需数据库确认
+    """
+
+    def __init__(self, table_name: str, capacity: int, fp_rate: float = 0.01):
+        self.table_name = table_name
+        self.bloom = BloomFilter(capacity, fp_rate)
+
+    @staticmethod
+    def _digest(md5_id: str) -> bytes:
+        # md5_id 是 32 位十六进制串，直接还原为 16 字节摘要；非标准值再做一次 md5
+        try:
+            digest = bytes.fromhex(md5_id)
+            if len(digest) == 16:
+                return digest
+        except (TypeError, ValueError):
+            pass
+        return hashlib.md5(str(md5_id).encode('utf-8')).digest()
+
+    def add(self, md5_id: str) -> None:
+        self.bloom.add(self._digest(md5_id))
+
+    def might_contain(self, md5_id: str) -> bool:
+        return self._digest(md5_id) in self.bloom
+
+    @classmethod
+    def build(cls, engine, model_cls, fp_rate: float = 0.01, headroom: float = 0.2,
+              fetch_size: int = 10000) -> Optional['Md5MembershipIndex']:
+        """
+        流式扫描 model_cls 对应表的 md5_id 构建索引
+        :param headroom: 为本次采集新增数据预留的容量比例，超出后误报率逐渐升高
+        """
+        from sqlalchemy import select, func
+
+        column = getattr(model_cls, 'md5_id', None)
+        if column is None:
+            return None
+        table_name = model_cls.__tablename__
+
+        with engine.connect() as conn:
+            row_count = conn.execute(select(func.count(column))).scalar() or 0
+            index = cls(table_name, int(row_count * (1 + headroom)) + 1000, fp_rate)
+            # stream_results: 服务端游标逐批读取，避免一次性加载百万行
+            result = conn.execution_options(stream_results=True, yield_per=fetch_size).execute(
+                select(column).where(column.isnot(None))
+            )
+            for partition in result.partitions(fetch_size):
+                for (md5_id,) in partition:
+                    index.add(md5_id)
+
+        logger.info(
+            f"md5_id 成员索引构建完成: {table_name} | {index.bloom.count} 条 | "
+            f"{index.bloom.size_bytes / 1024 / 1024:.1f} MB | 误报率 {fp_rate}"
+        )
+        return index
@@ -1,17 +1,61 @@
-from typing import List, Set, Any, Type, Dict
+from typing import List, Set, Any, Type, Dict, Optional, Callable
+import json
 import logging
-from sqlalchemy.exc import IntegrityError
-from itemadapter import ItemAdapter
+from sqlalchemy.exc import IntegrityError, DataError
+from sqlalchemy.dialects.mysql import insert
 
 from .base import StorageBackend
-from ..models import SessionLocal
+from .membership import Md5MembershipIndex
+from ..models import SessionLocal, engine
 from ..models.crawl_data import CrawlData
+from ..models.write_dead_letter import WriteDeadLetter
+from ..utils.projection import get_projector
 
 logger = logging.getLogger(__name__)
 
+# 写入模式:
+#   orm    - 查重 + ORM add_all (默认，兼容无唯一索引的表)
+#   upsert - INSERT ... ON DUPLICATE KEY UPDATE (Core 多行语句，依赖 md5_id 唯一索引)
+#   ignore - INSERT IGNORE (Core 多行语句，依赖 md5_id 唯一索引)
+WRITE_MODES = ('orm', 'upsert', 'ignore')
+BULK_WRITE_MODES = ('upsert', 'ignore')
+
+# upsert 时不覆盖的列
+UPSERT_EXCLUDE_COLUMNS = {'id', 'md5_id', 'created_at'}
+
+# 批量写入失败隔离策略:
+#   bisect - 二分拆批重试，定位坏行写入死信表，其余行仍按大批写入 (默认)
+#   row    - 降级为逐条写入、逐条提交
+FAILURE_ISOLATION_MODES = ('bisect', 'row')
+
+# MySQL 唯一键冲突错误码
+ER_DUP_ENTRY = 1062
+
 class MySQLStorage(StorageBackend):
-    def __init__(self):
+    def __init__(self, write_mode: str = 'orm', write_mode_overrides: Optional[Dict[str, str]] = None,
+                 bulk_chunk_size: int = 500, failure_isolation: str = 'bisect'):
         self.session_maker = SessionLocal
+        self.write_mode = self._normalize_mode(write_mode)
+        # {模型类名或表名: 写入模式}
+        self.write_mode_overrides = {
+            k: self._normalize_mode(v) for k, v in (write_mode_overrides or {}).items()
+        }
+        self.bulk_chunk_size = max(int(bulk_chunk_size), 1)
+        # 已降级为 orm 的模型 (缺少 md5_id 唯一索引)，避免重复告警
+        self._bulk_unsupported = set()
+        self.failure_isolation = (failure_isolation or 'bisect').lower()
+        if self.failure_isolation not in FAILURE_ISOLATION_MODES:
+            logger.warning(f"未知的失败隔离策略 '{failure_isolation}'，使用 bisect")
+            self.failure_isolation = 'bisect'
+        self._dead_letter_ready = False
+
+    @staticmethod
+    def _normalize_mode(mode: str) -> str:
+        mode = (mode or 'orm').lower()
+        if mode not in WRITE_MODES:
+            logger.warning(f"未知的 MySQL 写入模式 '{mode}'，使用 orm")
+            return 'orm'
+        return mode
 
     def _get_model_class(self, item: Any) -> Type:
         """
@@ -26,24 +70,76 @@ class MySQLStorage(StorageBackend):
             
         return CrawlData
 
-    def _create_orm_object(self, item: Any, model_class: Type) -> Any:
-        if not item: return None
-        # 自动映射 Item 字段到 Model 字段
-        model_fields = [c.key for c in model_class.__table__.columns]
-        
-        # ItemAdapter 统一处理 Item 对象和字典
-        adapter = ItemAdapter(item)
-        item_data = {k: v for k, v in adapter.items() if k in model_fields}
-        
-        return model_class(**item_data)
+    def _get_write_mode(self, model_cls: Type) -> str:
+        """按模型类名 / 表名查找覆盖配置，否则使用全局模式"""
+        mode = self.write_mode_overrides.get(model_cls.__name__) \
+            or self.write_mode_overrides.get(model_cls.__tablename__) \
+            or self.write_mode
+        if mode in BULK_WRITE_MODES and not self._has_unique_md5(model_cls):
+            if model_cls not in self._bulk_unsupported:
+                self._bulk_unsupported.add(model_cls)
+                logger.warning(f"{model_cls.__tablename__} 的 md5_id 没有唯一索引，{mode} 模式降级为 orm")
+            return 'orm'
+        return mode
+
+    @staticmethod
+    def _has_unique_md5(model_cls: Type) -> bool:
+        """md5_id 是否存在唯一约束 (ON DUPLICATE KEY / IGNORE 的判重依据)"""
+        table = model_cls.__table__
+        column = table.columns.get('md5_id')
+        if column is None:
+            return False
+        if column.unique:
+            return True
+        for index in table.indexes:
+            if index.unique and [c.name for c in index.columns] == ['md5_id']:
+                return True
+        return False
+
+    def _create_row(self, item: Any, model_class: Type) -> Dict[str, Any]:
+        """Item -> 列字典 (按 (Item类, Model类) 缓存的投影，不构建 ORM 对象)"""
+        if not item: return {}
+        return get_projector(type(item), model_class).to_row(item)
+
+    @staticmethod
+    def _align_rows(rows: List[Dict[str, Any]], model_class: Type) -> List[Dict[str, Any]]:
+        """
+        多行 VALUES 要求每行列集合一致 (SQLAlchemy 以首行为准，会静默丢弃其它列)，
+        缺失的列用模型默认值或 None 补齐
+        """
+        keys = set()
+        for row in rows:
+            keys.update(row.keys())
+        columns = model_class.__table__.columns
+        for row in rows:
+            for key in keys:
+                if key in row:
+                    continue
+                default = columns[key].default
+                if default is not None and default.is_scalar:
+                    row[key] = default.arg
+                elif default is not None and default.is_callable:
+                    row[key] = default.arg(None)
+                else:
+                    row[key] = None
+        return rows
 
     def check_existence(self, ids: List[str]) -> Set[str]:
         # 由于 MySQL 需要 Model Class 才能查询表，此接口在 MySQL 实现中难以独立使用
         # 逻辑已集成在 save_batch 中
         return set()
 
+    def build_membership_index(self, model_cls: Type, fp_rate: float = 0.01,
+                               headroom: float = 0.2) -> Optional[Md5MembershipIndex]:
+        """流式扫描目标表，构建 md5_id 成员索引 (供 Pipeline 预判新数据)"""
+        return Md5MembershipIndex.build(engine, model_cls, fp_rate=fp_rate, headroom=headroom)
+
     def save_batch(self, items: List[Any]) -> int:
+        return self.save_batch_stats(items)['inserted']
+
+    def save_batch_stats(self, items: List[Any], known_new: Optional[Set[str]] = None) -> Dict[str, int]:
         session = self.session_maker()
+        stats = {'inserted': 0, 'updated': 0, 'ignored': 0}
         try:
             # 1. 按模型类分组 (Group items by Model Class)
             items_by_model: Dict[Type, List[Any]] = {}
@@ -53,82 +149,215 @@ class MySQLStorage(StorageBackend):
                     items_by_model[model_cls] = []
                 items_by_model[model_cls].append(item)
             
-            total_saved = 0
-            
             for model_cls, model_items in items_by_model.items():
-                # 转换为 ORM 对象
-                orm_objects = []
-                ids_map = {} # md5_id -> obj
-                
-                for item in model_items:
-                    obj = self._create_orm_object(item, model_cls)
-                    if not obj: continue
-                    
-                    # 假设所有 Model 都有 md5_id 字段
-                    if hasattr(obj, 'md5_id') and obj.md5_id:
-                        orm_objects.append(obj)
-                        ids_map[obj.md5_id] = obj
-                    else:
-                        # 无指纹对象，直接当作新对象
-                        orm_objects.append(obj)
-
-                if not orm_objects:
-                    continue
+                mode = self._get_write_mode(model_cls)
+                if mode in BULK_WRITE_MODES:
+                    result = self._save_bulk(session, model_cls, model_items, mode)
+                else:
+                    result = self._save_orm(session, model_cls, model_items, known_new)
+                for key, value in result.items():
+                    stats[key] += value
+            
+            return stats
 
-                # 2. 批量查重 (Check Existence)
-                existing_ids = set()
-                if hasattr(model_cls, 'md5_id') and ids_map:
-                    id_list = list(ids_map.keys())
-                    # 分块查询，防止 SQL 过长
-                    chunk_size = 1000
-                    for i in range(0, len(id_list), chunk_size):
-                        chunk = id_list[i:i+chunk_size]
-                        try:
-                            # SELECT md5_id FROM table WHERE md5_id IN (...)
-                            existing = session.query(model_cls.md5_id).filter(model_cls.md5_id.in_(chunk)).all()
-                            existing_ids.update(row[0] for row in existing)
-                        except Exception as e:
-                            logger.error(f"查重查询失败: {e}")
-
-                # 3. 内存过滤 (Memory Filter)
-                new_objects = []
-                for obj in orm_objects:
-                    if hasattr(obj, 'md5_id') and obj.md5_id in existing_ids:
-                        continue
-                    new_objects.append(obj)
-                
-                if not new_objects:
-                    continue
+        finally:
+            session.close()
+
+    def _save_bulk(self, session, model_cls: Type, model_items: List[Any], mode: str) -> Dict[str, int]:
+        """
+        Core 多行写入：无查重查询、无 ORM 对象
+        统计依据 MySQL affected-rows：新插入计 1，更新计 2 (IGNORE 跳过计 0)
+        """
+        stats = {'inserted': 0, 'updated': 0, 'ignored': 0}
+        rows = [row for row in (self._create_row(item, model_cls) for item in model_items) if row]
+        if not rows:
+            return stats
+
+        for i in range(0, len(rows), self.bulk_chunk_size):
+            chunk = rows[i:i + self.bulk_chunk_size]
+            self._write_isolated(
+                session, model_cls, chunk,
+                lambda part: self._execute_bulk(session, model_cls, part, mode),
+                stats
+            )
+        return stats
 
-                # 4. 批量插入 (Insert Batch)
+    def _execute_bulk(self, session, model_cls: Type, rows: List[Dict[str, Any]], mode: str) -> Dict[str, int]:
+        """执行一条多行 INSERT IGNORE / ON DUPLICATE KEY UPDATE (不提交)"""
+        table = model_cls.__table__
+        rows = self._align_rows(rows, model_cls)
+        stmt = insert(table).values(rows)
+        if mode == 'ignore':
+            stmt = stmt.prefix_with('IGNORE')
+        else:
+            # upsert 时刷新 updated_at / collect_time 等非键列，保证重复行总是被"修改"，计数可区分
+            update_cols = {
+                c.name: stmt.inserted[c.name] for c in table.columns
+                if c.name not in UPSERT_EXCLUDE_COLUMNS and (c.name in rows[0] or c.onupdate is not None)
+            }
+            stmt = stmt.on_duplicate_key_update(**update_cols)
+        result = session.execute(stmt)
+
+        affected = max(result.rowcount or 0, 0)
+        if mode == 'ignore':
+            return {'inserted': affected, 'updated': 0, 'ignored': len(rows) - affected}
+        updated = min(max(affected - len(rows), 0), len(rows))
+        return {'inserted': len(rows) - updated, 'updated': updated, 'ignored': 0}
+
+    def _save_orm(self, session, model_cls: Type, model_items: List[Any],
+                  known_new: Optional[Set[str]] = None) -> Dict[str, int]:
+        """
+        ORM 写入：批量查重 + add_all，冲突时按 failure_isolation 隔离坏行
+        known_new 中的 md5_id 已由成员索引确认为新数据，不参与查重查询
+        """
+        stats = {'inserted': 0, 'updated': 0, 'ignored': 0}
+        rows = [row for row in (self._create_row(item, model_cls) for item in model_items) if row]
+        if not rows:
+            return stats
+
+        # 2. 批量查重 (Check Existence)
+        # 假设所有 Model 都有 md5_id 字段；无指纹的行直接当作新数据
+        existing_ids = set()
+        known_new = known_new or set()
+        id_list = list({row['md5_id'] for row in rows if row.get('md5_id') and row['md5_id'] not in known_new})
+        if hasattr(model_cls, 'md5_id') and id_list:
+            # 分块查询，防止 SQL 过长
+            chunk_size = 1000
+            for i in range(0, len(id_list), chunk_size):
+                chunk = id_list[i:i+chunk_size]
                 try:
-                    session.add_all(new_objects)
-                    session.commit()
-                    total_saved += len(new_objects)
-                except IntegrityError:
-                    session.rollback()
-                    logger.warning(f"批量写入 {model_cls.__tablename__} 遇到冲突，降级为逐条写入...")
-                    
-                    # 降级：逐条写入 (Insert Only)
-                    count = 0
-                    for obj in new_objects:
-                        try:
-                            session.add(obj)
-                            session.commit()
-                            count += 1
-                        except IntegrityError:
-                            session.rollback()
-                            # 忽略重复
-                        except Exception as e:
-                            session.rollback()
-                            logger.error(f"单条写入失败: {e}")
-                    total_saved += count
-                    
+                    # SELECT md5_id FROM table WHERE md5_id IN (...)
+                    existing = session.query(model_cls.md5_id).filter(model_cls.md5_id.in_(chunk)).all()
+                    existing_ids.update(row[0] for row in existing)
                 except Exception as e:
-                    session.rollback()
-                    logger.error(f"批量写入未知错误: {e}")
-            
-            return total_saved
+                    logger.error(f"查重查询失败: {e}")
 
-        finally:
-            session.close()
+        # 3. 内存过滤 (Memory Filter)
+        new_rows = [row for row in rows if not row.get('md5_id') or row['md5_id'] not in existing_ids]
+        stats['ignored'] += len(rows) - len(new_rows)
+        
+        if not new_rows:
+            return stats
+
+        # 4. 批量插入 (Insert Batch)
+        self._write_isolated(
+            session, model_cls, new_rows,
+            lambda part: self._insert_orm(session, model_cls, part),
+            stats
+        )
+        return stats
+
+    @staticmethod
+    def _insert_orm(session, model_cls: Type, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """ORM add_all + flush (不提交)"""
+        session.add_all([model_cls(**row) for row in rows])
+        session.flush()
+        return {'inserted': len(rows), 'updated': 0, 'ignored': 0}
+
+    # ==========================================
+    # 失败隔离 (Failure Isolation)
+    # ==========================================
+
+    def _write_isolated(self, session, model_cls: Type, rows: List[Dict[str, Any]],
+                        write_fn: Callable, stats: Dict[str, int]) -> None:
+        """
+        整批写入，遇到数据类错误 (IntegrityError / DataError) 时隔离坏行:
+        bisect 模式二分拆批重试，row 模式降级为逐条写入
+        """
+        table_name = model_cls.__tablename__
+        try:
+            try:
+                self._merge_stats(stats, write_fn(rows))
+                session.commit()
+                return
+            except (IntegrityError, DataError) as e:
+                session.rollback()
+                if self.failure_isolation == 'row':
+                    logger.warning(f"批量写入 {table_name} 遇到冲突，降级为逐条写入...")
+                    self._write_row_by_row(session, rows, write_fn, stats)
+                    return
+                logger.warning(f"批量写入 {table_name} 遇到数据错误，二分隔离坏行 ({len(rows)} 条): {e.orig}")
+                dead_letters = []
+                self._bisect_write(session, rows, write_fn, e, stats, dead_letters)
+                if dead_letters:
+                    self._save_dead_letters(session, model_cls, dead_letters)
+        except Exception as e:
+            # 连接中断等非数据类错误无法通过拆批隔离，向上抛出，由调用方保留批次 (WAL) 待重放
+            session.rollback()
+            logger.error(f"批量写入 {table_name} 未知错误: {e}")
+            raise
+
+    def _bisect_write(self, session, rows: List[Dict[str, Any]], write_fn: Callable, error: Exception,
+                      stats: Dict[str, int], dead_letters: List) -> None:
+        """
+        rows 整体写入已因 error 失败：单行即为坏行 (重复键计为 ignored，其余进入死信)，
+        否则对半拆分，两半分别整批重试
+        """
+        if len(rows) == 1:
+            if self._is_duplicate_error(error):
+                stats['ignored'] += 1
+            else:
+                dead_letters.append((rows[0], error))
+            return
+
+        mid = len(rows) // 2
+        for part in (rows[:mid], rows[mid:]):
+            try:
+                self._merge_stats(stats, write_fn(part))
+                session.commit()
+            except (IntegrityError, DataError) as e:
+                session.rollback()
+                self._bisect_write(session, part, write_fn, e, stats, dead_letters)
+
+    @staticmethod
+    def _write_row_by_row(session, rows: List[Dict[str, Any]], write_fn: Callable, stats: Dict[str, int]) -> None:
+        """降级：逐条写入 (Insert Only)，冲突行忽略"""
+        for row in rows:
+            try:
+                MySQLStorage._merge_stats(stats, write_fn([row]))
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                # 忽略重复
+                stats['ignored'] += 1
+            except Exception as e:
+                session.rollback()
+                stats['ignored'] += 1
+                logger.error(f"单条写入失败: {e}")
+
+    def _save_dead_letters(self, session, model_cls: Type, dead_letters: List) -> None:
+        """将隔离出的坏行写入死信表"""
+        table_name = model_cls.__tablename__
+        logger.error(f"{table_name} 隔离出 {len(dead_letters)} 条坏数据，写入死信表 {WriteDeadLetter.__tablename__}")
+        try:
+            if not self._dead_letter_ready:
+                WriteDeadLetter.__table__.create(bind=session.get_bind(), checkfirst=True)
+                self._dead_letter_ready = True
+            session.add_all([
+                WriteDeadLetter(
+                    table_name=table_name,
+                    md5_id=row.get('md5_id'),
+                    payload=json.dumps(row, ensure_ascii=False, default=str),
+                    error_message=str(getattr(error, 'orig', error))
+                )
+                for row, error in dead_letters
+            ])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"写入死信表失败: {e} | md5_id: {[row.get('md5_id') for row, _ in dead_letters]}")
+
+    @staticmethod
+    def _is_duplicate_error(error: Exception) -> bool:
+        """是否为唯一键冲突 (MySQL 1062)，重复数据按"仅新增"语义忽略，不进入死信"""
+        orig = getattr(error, 'orig', None)
+        args = getattr(orig, 'args', None)
+        if args and args[0] == ER_DUP_ENTRY:
+            return True
+        message = str(error)
+        return 'Duplicate entry' in message or 'UNIQUE constraint failed' in message
+
+    @staticmethod
+    def _merge_stats(stats: Dict[str, int], result: Dict[str, int]) -> None:
+        for key, value in result.items():
+            stats[key] += value
@@ -0,0 +1,278 @@
+from typing import List, Set, Any, Dict, Optional, Tuple, Type
+from datetime import datetime, date
+import json
+import logging
+import os
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from sqlalchemy import Integer, Float, Numeric, Boolean, DateTime, Date, JSON
+
+from .base import StorageBackend
+from ..models.crawl_data import CrawlData
+from ..utils.projection import get_projector
+
+logger = logging.getLogger(__name__)
+
+# 表名中不代表省份的片段，如 drug_hospital_hebei_test -> hebei
+TABLE_NAME_NOISE = {'drug', 'hospital', 'shop', 'test'}
+SUCCESS_MARKER = '_SUCCESS'
+
+
+def week_partition(run_dt: datetime) -> str:
+    """ISO 周分区值，与周任务的表后缀 _wYYYYWW 一致"""
+    iso_year, iso_week, _ = run_dt.isocalendar()
+    return f"{iso_year}{iso_week:02d}"
+
+
+def mark_week_complete(root_dir: str, week: str) -> List[str]:
+    """
+    为指定周的所有分区写入 _SUCCESS 标记 (周任务采集结束后调用)
+    下游分析以该标记判断分区已完整，可直接读取，无需再从 MySQL 导出
+    :return: 已标记的分区目录
+    """
+    marked = []
+    if not os.path.isdir(root_dir):
+        return marked
+    suffix = f"week={week}"
+    for dirpath, _, filenames in os.walk(root_dir):
+        if os.path.basename(dirpath) == suffix and any(f.endswith('.parquet') for f in filenames):
+            with open(os.path.join(dirpath, SUCCESS_MARKER), 'w') as f:
+                f.write(datetime.now().isoformat())
+            marked.append(dirpath)
+    return marked
+
+
+class ParquetStorage(StorageBackend):
+    """
+    列式 Parquet 本地存储
+    - 目录分区: {root}/province=<省份>/spider_name=<爬虫>/week=<YYYYWW>/<表名>-<运行ID>-<序号>.parquet
+    - 每个写入批次经 Arrow RecordBatch 写为一个 row group，Schema 由 Model 表定义推导
+    - 本次运行内按 md5_id 去重
+    - 未写文件尾的 Parquet 不可读：写入中的文件以隐藏的 .inprogress 名称存在，
+      累计 row_groups_per_file 个 row group 或 close() 时关闭写入器并改名为正式文件；
+      期间 is_durable() 为 False，管道暂缓确认 WAL，进程中断后由 WAL 重放补回
+    """
+
+    def __init__(self, root_dir: str, compression: str = 'zstd', row_groups_per_file: int = 20):
+        if not pa:
+            raise ImportError("pyarrow library is not installed. Please run 'pip install pyarrow'")
+        self.root_dir = root_dir
+        self.compression = compression
+        self.row_groups_per_file = max(int(row_groups_per_file), 1)
+        self.spider_name = 'default'
+        self.run_id = datetime.now().strftime('%Y%m%d%H%M%S')
+        self.week = week_partition(datetime.now())
+        self.lock = threading.Lock()
+        # (分区目录, 表名) -> (ParquetWriter, 写入中路径, 正式路径)
+        self.writers: Dict[Tuple[str, str], Tuple[Any, str, str]] = {}
+        # 文件序号 (每次封存后递增) 与未封存的 row group 数
+        self.part_no = 1
+        self.unsealed_row_groups = 0
+        # 表名 -> 本次运行已写入的 md5_id
+        self.seen: Dict[str, Set[str]] = {}
+        # Model类 -> (Arrow Schema, {列名: 转换函数})
+        self._schemas: Dict[Type, Tuple[Any, Dict[str, Any]]] = {}
+        logger.info(f"Parquet Storage initialized. Root: {root_dir}, Week: {self.week}")
+
+    def open(self, spider_name: str):
+        self.spider_name = spider_name
+
+    # ==========================================
+    # Schema 推导
+    # ==========================================
+
+    @staticmethod
+    def _to_int(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _to_bool(value):
+        if isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 'yes', '是')
+        return bool(value)
+
+    @staticmethod
+    def _to_datetime(value):
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _to_date(value):
+        if isinstance(value, date):
+            return value
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _to_json(value):
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def _to_str(value):
+        return value if isinstance(value, str) else str(value)
+
+    def _get_schema(self, model_cls: Type) -> Tuple[Any, Dict[str, Any]]:
+        cached = self._schemas.get(model_cls)
+        if cached:
+            return cached
+        fields = []
+        converters = {}
+        for column in model_cls.__table__.columns:
+            col_type = column.type
+            if isinstance(col_type, Boolean):
+                arrow_type, converter = pa.bool_(), self._to_bool
+            elif isinstance(col_type, DateTime):
+                arrow_type, converter = pa.timestamp('us'), self._to_datetime
+            elif isinstance(col_type, Date):
+                arrow_type, converter = pa.date32(), self._to_date
+            elif isinstance(col_type, Integer):
+                arrow_type, converter = pa.int64(), self._to_int
+            elif isinstance(col_type, (Float, Numeric)):
+                arrow_type, converter = pa.float64(), self._to_float
+            elif isinstance(col_type, JSON):
+                # JSON 列序列化为字符串，避免嵌套结构在批次间 Schema 不一致
+                arrow_type, converter = pa.string(), self._to_json
+            else:
+                arrow_type, converter = pa.string(), self._to_str
+            fields.append(pa.field(column.name, arrow_type))
+            converters[column.name] = converter
+        cached = self._schemas[model_cls] = (pa.schema(fields), converters)
+        return cached
+
+    @staticmethod
+    def _province_of(model_cls: Type) -> str:
+        province = getattr(model_cls, '__province__', None)
+        if province:
+            return province
+        tokens = [t for t in model_cls.__tablename__.split('_') if t not in TABLE_NAME_NOISE]
+        return tokens[0] if tokens else 'unknown'
+
+    # ==========================================
+    # 写入
+    # ==========================================
+
+    def _get_model_class(self, item: Any) -> Type:
+        if hasattr(item, 'get_model_class'):
+            return item.get_model_class()
+        if isinstance(item, dict) and 'model_class' in item:
+            return item['model_class']
+        return CrawlData
+
+    def check_existence(self, ids: List[str]) -> Set[str]:
+        with self.lock:
+            return {i for i in ids if any(i in seen for seen in self.seen.values())}
+
+    def save_batch(self, items: List[Any]) -> int:
+        return self.save_batch_stats(items)['inserted']
+
+    def save_batch_stats(self, items: List[Any], known_new: Optional[Set[str]] = None) -> Dict[str, int]:
+        stats = {'inserted': 0, 'updated': 0, 'ignored': 0}
+        items_by_model: Dict[Type, List[Any]] = {}
+        for item in items:
+            items_by_model.setdefault(self._get_model_class(item), []).append(item)
+
+        with self.lock:
+            for model_cls, model_items in items_by_model.items():
+                inserted = self._write_model_batch(model_cls, model_items)
+                stats['inserted'] += inserted
+                stats['ignored'] += len(model_items) - inserted
+            if self.unsealed_row_groups >= self.row_groups_per_file:
+                self._seal()
+        return stats
+
+    def is_durable(self) -> bool:
+        with self.lock:
+            return not self.writers
+
+    def _write_model_batch(self, model_cls: Type, items: List[Any]) -> int:
+        table_name = model_cls.__tablename__
+        seen = self.seen.setdefault(table_name, set())
+        schema, converters = self._get_schema(model_cls)
+
+        # 按列收集 (RecordBatch 为列式结构)
+        columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+        # 本批次的 md5_id，写出成功后才并入 seen：写出失败时重试 / WAL 重放不会把这些行当作重复跳过
+        batch_ids = set()
+        count = 0
+        for item in items:
+            projector = get_projector(type(item), model_cls)
+            row = projector.to_row(item)
+            md5_id = row.get('md5_id')
+            if md5_id:
+                if md5_id in seen or md5_id in batch_ids:
+                    continue
+                batch_ids.add(md5_id)
+            for name, values in columns.items():
+                value = row.get(name)
+                values.append(None if value is None else converters[name](value))
+            count += 1
+        if not count:
+            return 0
+
+        batch = pa.RecordBatch.from_pydict(columns, schema=schema)
+        self._get_writer(model_cls, schema).write_batch(batch)
+        self.unsealed_row_groups += 1
+        seen.update(batch_ids)
+        return count
+
+    def _get_writer(self, model_cls: Type, schema: Any):
+        partition_dir = os.path.join(
+            self.root_dir,
+            f"province={self._province_of(model_cls)}",
+            f"spider_name={self.spider_name}",
+            f"week={self.week}",
+        )
+        key = (partition_dir, model_cls.__tablename__)
+        entry = self.writers.get(key)
+        if entry is None:
+            os.makedirs(partition_dir, exist_ok=True)
+            file_name = f"{model_cls.__tablename__}-{self.run_id}-{self.part_no:04d}.parquet"
+            # 以 . 开头的文件会被 pyarrow / Spark 等读取方忽略
+            tmp_path = os.path.join(partition_dir, f".{file_name}.inprogress")
+            writer = pq.ParquetWriter(tmp_path, schema, compression=self.compression)
+            entry = self.writers[key] = (writer, tmp_path, os.path.join(partition_dir, file_name))
+        return entry[0]
+
+    def _seal(self, raise_errors: bool = True):
+        """关闭所有写入器 (写出文件尾) 并改名为正式文件；失败的写入器保留，is_durable() 保持 False"""
+        for key, (writer, tmp_path, path) in list(self.writers.items()):
+            try:
+                writer.close()
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.error(f"关闭 Parquet 文件失败 ({tmp_path}): {e}")
+                if raise_errors:
+                    raise
+                continue
+            del self.writers[key]
+            logger.info(f"📦 Parquet 文件已写出: {path}")
+        self.unsealed_row_groups = 0
+        self.part_no += 1
+
+    def close(self):
+        """封存所有写入中的文件"""
+        with self.lock:
+            self._seal(raise_errors=False)
+        logger.info(f"Parquet Storage closed. 写入 {sum(len(s) for s in self.seen.values())} 条")
@@ -0,0 +1,215 @@
+import os
+import glob
+import json
+import zlib
+import struct
+import logging
+import importlib
+import threading
+from typing import List, Any, Dict, Iterator, Optional
+
+from itemadapter import ItemAdapter
+
+logger = logging.getLogger(__name__)
+
+# 记录头: 负载长度 + CRC32 (负载为 zlib 压缩后的 JSON)
+RECORD_HEADER = struct.Struct('<II')
+SEGMENT_PATTERN = 'seg-*.wal'
+
+class WriteAheadSpool:
+    """
+    批量写入的本地预写日志 (WAL)
+    - 每个批次在写库前以压缩记录追加到当前段文件，段文件超过 segment_bytes 后滚动
+    - 存储后端确认写入后追加 ack 记录；段内批次全部确认后，活动段截断、历史段删除
+    - 进程或数据库异常后残留的段文件，由下次启动时 replay() 以大批次重放
+    记录格式: [长度 4B][CRC32 4B][zlib(JSON)]，追加写，尾部残缺记录在读取时丢弃
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 fsync: bool = False, compress_level: int = 1):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.compress_level = compress_level
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # 启动时已存在的段文件 = 上次运行残留，仅供 replay 使用
+        self.leftover_segments = sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN)))
+        self._next_segment_no = self._parse_segment_no(self.leftover_segments[-1]) + 1 if self.leftover_segments else 1
+        self._next_batch_id = 1
+        self._active_path = None
+        self._active_file = None
+        # 段文件 -> 未确认的批次ID
+        self._pending: Dict[str, set] = {}
+        # 批次ID -> 段文件
+        self._batch_segment: Dict[int, str] = {}
+
+    @staticmethod
+    def _parse_segment_no(path: str) -> int:
+        name = os.path.basename(path)
+        try:
+            return int(name[len('seg-'):-len('.wal')])
+        except ValueError:
+            return 0
+
+    # ==========================================
+    # 编解码
+    # ==========================================
+
+    @staticmethod
+    def _encode_item(item: Any) -> Dict[str, Any]:
+        cls = item.__class__
+        return {
+            'cls': f"{cls.__module__}.{cls.__qualname__}",
+            'data': ItemAdapter(item).asdict(),
+        }
+
+    @staticmethod
+    def _decode_item(record: Dict[str, Any]) -> Any:
+        module_name, _, cls_name = record['cls'].rpartition('.')
+        cls = getattr(importlib.import_module(module_name), cls_name)
+        return cls(record['data'])
+
+    def _write_record(self, f, record: Dict[str, Any]) -> None:
+        payload = zlib.compress(
+            json.dumps(record, ensure_ascii=False, default=str).encode('utf-8'),
+            self.compress_level
+        )
+        f.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _read_records(path: str) -> Iterator[Dict[str, Any]]:
+        """顺序读取段文件；遇到残缺或校验失败的记录即停止 (崩溃时的半写尾部)"""
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                length, crc = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    logger.warning(f"WAL 段 {os.path.basename(path)} 尾部记录损坏，已忽略")
+                    return
+                yield json.loads(zlib.decompress(payload).decode('utf-8'))
+
+    # ==========================================
+    # 写入 / 确认
+    # ==========================================
+
+    def _ensure_active(self):
+        if self._active_file and self._active_file.tell() >= self.segment_bytes:
+            # 滚动：当前段已写满，关闭后开启新段
+            self._active_file.close()
+            sealed = self._active_path
+            self._active_file = None
+            if not self._pending.get(sealed):
+                self._remove_segment(sealed)
+        if not self._active_file:
+            self._active_path = os.path.join(self.directory, f"seg-{self._next_segment_no:08d}.wal")
+            self._next_segment_no += 1
+            self._active_file = open(self._active_path, 'ab')
+            self._pending[self._active_path] = set()
+        return self._active_file
+
+    def append(self, items: List[Any]) -> int:
+        """将批次追加到 WAL，返回批次ID (用于写库成功后 ack)"""
+        with self.lock:
+            batch_id = self._next_batch_id
+            self._next_batch_id += 1
+            record = {'type': 'batch', 'id': batch_id, 'items': [self._encode_item(i) for i in items]}
+            f = self._ensure_active()
+            self._write_record(f, record)
+            self._pending[self._active_path].add(batch_id)
+            self._batch_segment[batch_id] = self._active_path
+            return batch_id
+
+    def ack(self, batch_id: int) -> None:
+        """存储后端已确认写入：段内批次全部确认后截断 / 删除段文件"""
+        with self.lock:
+            path = self._batch_segment.pop(batch_id, None)
+            if path is None:
+                return
+            pending = self._pending.get(path, set())
+            pending.discard(batch_id)
+            if path == self._active_path:
+                if pending:
+                    self._write_record(self._active_file, {'type': 'ack', 'id': batch_id})
+                else:
+                    self._active_file.seek(0)
+                    self._active_file.truncate()
+                return
+            if pending:
+                with open(path, 'ab') as f:
+                    self._write_record(f, {'type': 'ack', 'id': batch_id})
+            else:
+                self._remove_segment(path)
+
+    def _remove_segment(self, path: str) -> None:
+        self._pending.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def pending_batches(self) -> int:
+        return len(self._batch_segment)
+
+    def close(self) -> None:
+        """关闭活动段；没有未确认批次时删除空段"""
+        with self.lock:
+            if self._active_file:
+                self._active_file.close()
+                self._active_file = None
+                if not self._pending.get(self._active_path):
+                    self._remove_segment(self._active_path)
+
+    # ==========================================
+    # 重放
+    # ==========================================
+
+    def iter_leftover_items(self, path: str) -> Iterator[Any]:
+        """读取残留段中未确认批次的 Item"""
+        batches = {}
+        for record in self._read_records(path):
+            if record.get('type') == 'batch':
+                batches[record['id']] = record['items']
+            elif record.get('type') == 'ack':
+                batches.pop(record['id'], None)
+        for encoded_items in batches.values():
+            for encoded in encoded_items:
+                try:
+                    yield self._decode_item(encoded)
+                except Exception as e:
+                    logger.error(f"WAL 记录还原失败 ({encoded.get('cls')}): {e}")
+
+    def replay(self, storage, chunk_size: int = 5000) -> Optional[int]:
+        """
+        将上次残留的段文件按大批次重放到存储后端，全部成功后删除
+        存储后端需幂等 (按 md5_id 去重)，已部分写入的批次重放时会被忽略
+        :return: 重放的 Item 数；重放中断返回 None (段文件保留)
+        """
+        total = 0
+        for path in list(self.leftover_segments):
+            chunk = []
+            try:
+                for item in self.iter_leftover_items(path):
+                    chunk.append(item)
+                    if len(chunk) >= chunk_size:
+                        storage.save_batch_stats(chunk)
+                        total += len(chunk)
+                        chunk = []
+                if chunk:
+                    storage.save_batch_stats(chunk)
+                    total += len(chunk)
+            except Exception as e:
+                logger.error(f"WAL 重放中断 ({os.path.basename(path)})，段文件保留待下次重放: {e}")
+                return None
+            os.remove(path)
+            self.leftover_segments.remove(path)
+            logger.info(f"WAL 段 {os.path.basename(path)} 重放完成")
+        return total
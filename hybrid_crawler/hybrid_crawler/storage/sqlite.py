@@ -0,0 +1,93 @@
+from typing import List, Any, Type, Dict, Tuple
+from datetime import datetime, date
+import logging
+
+from sqlalchemy import DateTime, Date
+
+from .mysql import MySQLStorage, UPSERT_EXCLUDE_COLUMNS
+from ..models import engine, init_db
+from ..utils.sql_dialect import insert_ignore_statement, upsert_statement
+
+logger = logging.getLogger(__name__)
+
+class SQLiteStorage(MySQLStorage):
+    """
+    嵌入式 SQLite 存储 (本地运行、单机基准测试、无数据库服务器的边缘机器)
+    - STORAGE_BACKEND=sqlite 时 settings 将 DATABASE_URL 指向 SQLITE_PATH，
+      数据表、crawl_status、spider_progress 均写入同一个 SQLite 文件 (WAL 模式)
+    - 查重、失败隔离、死信等逻辑沿用 MySQLStorage；
+      ignore / upsert 模式改用 INSERT OR IGNORE / ON CONFLICT DO UPDATE
+    - SQLite 的 DateTime / Date 类型只接受 Python 对象，Item 中的时间字符串 (如 collect_time) 构建行时转换
+    """
+
+    def __init__(self, *args, **kwargs):
+        if engine.dialect.name != 'sqlite':
+            raise ValueError(f"SQLiteStorage 需要 sqlite 的 DATABASE_URL，当前为 {engine.dialect.name}")
+        super().__init__(*args, **kwargs)
+        # Model类 -> ((DateTime 列), (Date 列))
+        self._temporal_columns: Dict[Type, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+        # 本地文件库：首次运行自动建表
+        init_db()
+        logger.info(f"SQLite Storage initialized. Database: {engine.url.database}")
+
+    def _get_temporal_columns(self, model_cls: Type) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        cached = self._temporal_columns.get(model_cls)
+        if cached is None:
+            columns = model_cls.__table__.columns
+            cached = self._temporal_columns[model_cls] = (
+                tuple(c.name for c in columns if isinstance(c.type, DateTime)),
+                tuple(c.name for c in columns if isinstance(c.type, Date)),
+            )
+        return cached
+
+    @staticmethod
+    def _parse_datetime(value: str):
+        try:
+            return datetime.fromisoformat(value.strip())
+        except ValueError:
+            logger.warning(f"无法解析的时间值 {value!r}，按空值写入")
+            return None
+
+    @staticmethod
+    def _parse_date(value: str):
+        try:
+            return date.fromisoformat(value.strip()[:10])
+        except ValueError:
+            logger.warning(f"无法解析的日期值 {value!r}，按空值写入")
+            return None
+
+    def _create_row(self, item: Any, model_class: Type) -> Dict[str, Any]:
+        """Item -> 列字典，时间列的字符串值转换为 datetime / date (ORM 与多行写入路径共用)"""
+        row = super()._create_row(item, model_class)
+        datetime_columns, date_columns = self._get_temporal_columns(model_class)
+        for name in datetime_columns:
+            value = row.get(name)
+            if isinstance(value, str):
+                row[name] = self._parse_datetime(value) if value.strip() else None
+        for name in date_columns:
+            value = row.get(name)
+            if isinstance(value, str):
+                row[name] = self._parse_date(value) if value.strip() else None
+        return row
+
+    def _execute_bulk(self, session, model_cls: Type, rows: List[Dict[str, Any]], mode: str) -> Dict[str, int]:
+        """执行一条多行 INSERT OR IGNORE / ON CONFLICT(md5_id) DO UPDATE (不提交)"""
+        table = model_cls.__table__
+        rows = self._align_rows(rows, model_cls)
+        if mode == 'ignore':
+            result = session.execute(insert_ignore_statement('sqlite', table, rows))
+            inserted = max(result.rowcount or 0, 0)
+            return {'inserted': inserted, 'updated': 0, 'ignored': len(rows) - inserted}
+
+        # SQLite 的 rowcount 对插入和更新同样计 1，先查出已存在的 md5_id 区分两者 (本地库查询代价很小)
+        md5_ids = [row['md5_id'] for row in rows if row.get('md5_id')]
+        existing = {
+            r[0] for r in session.query(model_cls.md5_id).filter(model_cls.md5_id.in_(md5_ids)).all()
+        } if md5_ids else set()
+        update_columns = [
+            c.name for c in table.columns
+            if c.name not in UPSERT_EXCLUDE_COLUMNS and (c.name in rows[0] or c.onupdate is not None)
+        ]
+        session.execute(upsert_statement('sqlite', table, rows, ['md5_id'], update_columns))
+        updated = sum(1 for row in rows if row.get('md5_id') in existing)
+        return {'inserted': len(rows) - updated, 'updated': updated, 'ignored': 0}
@@ -0,0 +1,83 @@
+"""
+字段投影注册表
+
+Item -> Model 列、源数据字典 -> Item 字段的映射在每对类上只计算一次并缓存，
+供存储后端、Spider 的 _create_item 与补采 Adapter 复用，避免逐条重建列清单和线性 in 查找。
+"""
+from collections.abc import Mapping
+from typing import Any, Dict, Tuple, Type, Iterable
+
+from itemadapter import ItemAdapter
+
+_MISSING = object()
+
+# (Item类, Model类) -> ItemModelProjector
+_PROJECTOR_CACHE: Dict[Tuple[Type, Type], 'ItemModelProjector'] = {}
+# (Item类, 排除字段) -> 可填充字段元组
+_FIELD_CACHE: Dict[Tuple[Type, frozenset], Tuple[str, ...]] = {}
+
+
+class ItemModelProjector:
+    """
+    Item 类到 Model 表列的投影
+    columns 为 Item 与表共有的列 (按表定义顺序)
+    """
+
+    def __init__(self, item_cls: Type, model_cls: Type):
+        table_columns = model_cls.__table__.columns.keys()
+        item_fields = getattr(item_cls, 'fields', None)
+        # scrapy.Item 只投影声明过的字段；dict 等无字段声明的类型投影全部表列
+        if item_fields is not None:
+            table_columns = [c for c in table_columns if c in item_fields]
+        self.item_cls = item_cls
+        self.model_cls = model_cls
+        self.columns: Tuple[str, ...] = tuple(table_columns)
+        self.column_set = frozenset(self.columns)
+
+    @staticmethod
+    def _as_mapping(item: Any) -> Mapping:
+        return item if isinstance(item, Mapping) else ItemAdapter(item)
+
+    def to_row(self, item: Any) -> Dict[str, Any]:
+        """Item -> 列字典 (仅包含 Item 中已赋值的列)"""
+        values = self._as_mapping(item)
+        return {c: values[c] for c in self.columns if c in values}
+
+    def to_model(self, item: Any) -> Any:
+        """Item -> ORM 对象"""
+        return self.model_cls(**self.to_row(item))
+
+
+def get_projector(item_cls: Type, model_cls: Type) -> ItemModelProjector:
+    """获取 (Item类, Model类) 的投影，首次调用时计算并缓存"""
+    key = (item_cls, model_cls)
+    projector = _PROJECTOR_CACHE.get(key)
+    if projector is None:
+        projector = _PROJECTOR_CACHE[key] = ItemModelProjector(item_cls, model_cls)
+    return projector
+
+
+def item_fields(item_cls: Type, exclude: Iterable[str] = ()) -> Tuple[str, ...]:
+    """Item 类中除 exclude 以外的字段 (缓存)"""
+    key = (item_cls, frozenset(exclude))
+    fields = _FIELD_CACHE.get(key)
+    if fields is None:
+        fields = _FIELD_CACHE[key] = tuple(f for f in item_cls.fields if f not in key[1])
+    return fields
+
+
+def fill_item(item: Any, source: Mapping, exclude: Iterable[str] = (), default: Any = _MISSING) -> Any:
+    """
+    用源数据字典填充 Item 的同名字段
+    :param exclude: 需要单独处理、不从 source 复制的字段
+    :param default: 未指定时跳过 source 中缺失的字段；指定时缺失字段填充该默认值
+    """
+    fields = item_fields(type(item), exclude)
+    if default is _MISSING:
+        for field_name in fields:
+            if field_name in source:
+                item[field_name] = source[field_name]
+    else:
+        for field_name in fields:
+            item[field_name] = source.get(field_name, default)
+    return item
@@ -0,0 +1,57 @@
+"""
+方言无关的 INSERT IGNORE / UPSERT 语句构造
+
+MySQL:           INSERT IGNORE / INSERT ... ON DUPLICATE KEY UPDATE
+SQLite/Postgres: INSERT ... ON CONFLICT DO NOTHING / ON CONFLICT (...) DO UPDATE
+"""
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+
+_INSERTS = {
+    'mysql': mysql.insert,
+    'mariadb': mysql.insert,
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+Values = Union[Dict[str, Any], List[Dict[str, Any]]]
+
+
+def dialect_insert(dialect_name: str, table: Table):
+    try:
+        return _INSERTS[dialect_name](table)
+    except KeyError:
+        raise NotImplementedError(f"不支持的数据库方言: {dialect_name}")
+
+
+def insert_ignore_statement(dialect_name: str, table: Table, values: Values):
+    """按唯一键冲突忽略的多行 INSERT"""
+    stmt = dialect_insert(dialect_name, table).values(values)
+    if dialect_name in ('mysql', 'mariadb'):
+        return stmt.prefix_with('IGNORE')
+    return stmt.on_conflict_do_nothing()
+
+
+def upsert_statement(dialect_name: str, table: Table, values: Values, index_elements: Iterable[str],
+                     update_columns: Iterable[str], overrides: Optional[Dict[str, Any]] = None,
+                     increment_columns: Iterable[str] = ()):
+    """
+    冲突时更新的多行 INSERT
+    :param index_elements: 冲突判断的唯一键列 (MySQL 由唯一索引自动判断，仅 ON CONFLICT 方言使用)
+    :param update_columns: 冲突时取新值覆盖的列
+    :param overrides: 冲突时写入固定表达式的列 (如 {'updated_at': func.now()})
+    :param increment_columns: 冲突时在原值上累加新值的列 (计数器)
+    """
+    stmt = dialect_insert(dialect_name, table).values(values)
+    if dialect_name in ('mysql', 'mariadb'):
+        new_values = stmt.inserted
+    else:
+        new_values = stmt.excluded
+    set_ = {name: new_values[name] for name in update_columns}
+    set_.update({name: table.c[name] + new_values[name] for name in increment_columns})
+    set_.update(overrides or {})
+    if dialect_name in ('mysql', 'mariadb'):
+        return stmt.on_duplicate_key_update(**set_)
+    return stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
@@ -0,0 +1,286 @@
+"""
+crawl_status 按月分区、汇总归档与保留策略
+
+- MySQL: crawl_status 按 RANGE (TO_DAYS(created_at)) 每月一个分区 (p<YYYYMM>)，另有 pmax 兜底；
+  过期分区先汇总进 crawl_run、导出为 gzip JSONL 归档，再 DROP PARTITION (O(1)，不产生逐行删除)
+- 其他方言 (SQLite 本地库) 不支持分区，按 created_at 范围汇总、归档后 DELETE
+"""
+from datetime import datetime, date
+from typing import Dict, List, Optional, Tuple
+import gzip
+import json
+import logging
+import os
+import re
+
+from sqlalchemy import func, case, text
+
+from ..models import SessionLocal, engine
+from ..models.crawl_status import CrawlStatus
+from ..models.crawl_run import CrawlRun
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = CrawlStatus.__tablename__
+MAX_PARTITION = 'pmax'
+PARTITION_PATTERN = re.compile(r'^p(\d{4})(\d{2})$')
+
+
+def month_start(value: date) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"p{month.year}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    match = PARTITION_PATTERN.match(name)
+    return datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _partition_clause(month: datetime) -> str:
+    bound = add_months(month, 1).strftime('%Y-%m-%d')
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{bound}'))"
+
+
+def _to_datetime(value):
+    # SQLite 的聚合结果为字符串
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+# ==========================================
+# 汇总 (crawl_status -> crawl_run)
+# ==========================================
+
+def summarize_status(start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """
+    将 crawl_status 中 [start, end) 的记录汇总进 crawl_run
+    历史记录没有运行边界，按 (爬虫, 日期) 归为一次运行，run_id 为 backfill-<爬虫>-<日期>；
+    已由 CrawlStatusPipeline 实时维护的运行 (同爬虫同日期) 不再重复汇总
+    :return: 新增的汇总行数
+    """
+    CrawlRun.__table__.create(bind=engine, checkfirst=True)
+    day = func.date(CrawlStatus.start_time)
+    session = SessionLocal()
+    try:
+        existing = {r[0] for r in session.query(CrawlRun.run_id).filter(CrawlRun.run_id.like("backfill-%"))}
+        live_query = session.query(CrawlRun.spider_name, CrawlRun.start_time)\
+            .filter(~CrawlRun.run_id.like("backfill-%"))
+        query = session.query(
+            CrawlStatus.spider_name,
+            day,
+            func.min(CrawlStatus.start_time),
+            func.max(CrawlStatus.start_time),
+            func.count(CrawlStatus.id),
+            func.sum(case((CrawlStatus.stage.like("%list%"), 1), else_=0)),
+            func.sum(case((CrawlStatus.stage.like("%detail%"), 1), else_=0)),
+            func.sum(CrawlStatus.items_found),
+            func.sum(CrawlStatus.items_stored),
+            func.sum(case((CrawlStatus.success.is_(False), 1), else_=0)),
+        )
+        # 过滤条件落在分区键 created_at 上，MySQL 只扫描对应分区
+        if start is not None:
+            query = query.filter(CrawlStatus.created_at >= start)
+            live_query = live_query.filter(CrawlRun.start_time >= start)
+        if end is not None:
+            query = query.filter(CrawlStatus.created_at < end)
+            live_query = live_query.filter(CrawlRun.start_time < end)
+        live_days = {(name, str(_to_datetime(ts).date())) for name, ts in live_query.all() if ts}
+        rows = query.group_by(CrawlStatus.spider_name, day).all()
+
+        created = 0
+        for spider_name, run_day, first, last, events, lists, details, found, stored, errors in rows:
+            run_id = f"backfill-{spider_name}-{run_day}"
+            if run_id in existing or first is None or (spider_name, str(run_day)) in live_days:
+                continue
+            first, last = _to_datetime(first), _to_datetime(last)
+            duration = max((last - first).total_seconds(), 0.0)
+            session.add(CrawlRun(
+                run_id=run_id[:64],
+                spider_name=spider_name,
+                status="finished",
+                start_time=first,
+                end_time=last,
+                last_event_time=last,
+                status_events=events or 0,
+                list_pages=lists or 0,
+                detail_pages=details or 0,
+                items_found=found or 0,
+                items_stored=stored or 0,
+                error_count=errors or 0,
+                duration_seconds=duration,
+                items_per_second=round((stored or 0) / duration, 3) if duration else 0.0,
+            ))
+            created += 1
+        session.commit()
+        logger.info(f"已汇总 {created} 条运行记录 (共 {len(rows)} 组)")
+        return created
+    except Exception as e:
+        session.rollback()
+        logger.error(f"汇总 crawl_status 失败: {e}")
+        raise
+    finally:
+        session.close()
+
+
+# ==========================================
+# 分区管理 (MySQL)
+# ==========================================
+
+def is_partitioning_supported() -> bool:
+    return engine.dialect.name in ('mysql', 'mariadb')
+
+
+def list_partitions(conn) -> List[str]:
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {'table': TABLE_NAME}).fetchall()
+    return [r[0] for r in rows]
+
+
+def partition_table(months_ahead: int = 2) -> bool:
+    """
+    将现有 crawl_status 改造为按月 RANGE 分区表 (一次性操作，会重建表)
+    MySQL 要求分区键包含在每个唯一键中，主键改为 (id, created_at)
+    :return: 是否执行了改造 (已分区时返回 False)
+    """
+    if not is_partitioning_supported():
+        logger.warning(f"{engine.dialect.name} 不支持表分区，跳过")
+        return False
+    with engine.begin() as conn:
+        if list_partitions(conn):
+            logger.info(f"{TABLE_NAME} 已是分区表，跳过")
+            return False
+        earliest = conn.execute(text(f"SELECT MIN(created_at) FROM `{TABLE_NAME}`")).scalar() or datetime.now()
+        first = month_start(earliest)
+        last = add_months(month_start(datetime.now()), months_ahead)
+        clauses = []
+        month = first
+        while month <= last:
+            clauses.append(_partition_clause(month))
+            month = add_months(month, 1)
+        clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE")
+
+        logger.info(f"🔧 {TABLE_NAME} 改造为分区表: {partition_name(first)} ~ {partition_name(last)}")
+        conn.execute(text(f"ALTER TABLE `{TABLE_NAME}` DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)"))
+        conn.execute(text(
+            f"ALTER TABLE `{TABLE_NAME}` PARTITION BY RANGE (TO_DAYS(created_at)) ({', '.join(clauses)})"
+        ))
+    return True
+
+
+def ensure_partitions(months_ahead: int = 2) -> List[str]:
+    """从 pmax 中拆出未来 months_ahead 个月的分区 (pmax 通常为空，拆分代价很小)"""
+    if not is_partitioning_supported():
+        return []
+    with engine.begin() as conn:
+        months = [m for m in (partition_month(p) for p in list_partitions(conn)) if m]
+        if not months:
+            return []
+        target = add_months(month_start(datetime.now()), months_ahead)
+        month = add_months(max(months), 1)
+        created = []
+        while month <= target:
+            created.append(month)
+            month = add_months(month, 1)
+        if not created:
+            return []
+        clauses = [_partition_clause(m) for m in created]
+        clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE")
+        conn.execute(text(
+            f"ALTER TABLE `{TABLE_NAME}` REORGANIZE PARTITION {MAX_PARTITION} INTO ({', '.join(clauses)})"
+        ))
+    names = [partition_name(m) for m in created]
+    logger.info(f"🆕 已新增分区: {', '.join(names)}")
+    return names
+
+
+# ==========================================
+# 归档与过期
+# ==========================================
+
+def export_range(archive_dir: str, label: str, start: datetime, end: datetime,
+                 partition: Optional[str] = None) -> Tuple[str, int]:
+    """
+    将 [start, end) 的 crawl_status 流式导出为 gzip JSONL
+    先写临时文件再改名，归档文件存在即代表导出完整；无数据时不生成文件
+    :return: (归档路径 或 None, 行数)
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{TABLE_NAME}-{label}.jsonl.gz")
+    tmp_path = f"{path}.tmp"
+    if partition:
+        sql = text(f"SELECT * FROM `{TABLE_NAME}` PARTITION ({partition})")
+        params: Dict[str, datetime] = {}
+    else:
+        sql = text(f"SELECT * FROM {TABLE_NAME} WHERE created_at >= :start AND created_at < :end ORDER BY id")
+        params = {'start': start, 'end': end}
+
+    count = 0
+    with engine.connect() as conn, gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        result = conn.execution_options(stream_results=True).execute(sql, params)
+        for row in result.mappings():
+            f.write(json.dumps(dict(row), ensure_ascii=False, default=str))
+            f.write('\n')
+            count += 1
+    if not count:
+        os.remove(tmp_path)
+        return None, 0
+    os.replace(tmp_path, path)
+    return path, count
+
+
+def expire_partitions(retention_months: int, archive_dir: str, dry_run: bool = False) -> List[str]:
+    """
+    处理早于保留期的数据：汇总进 crawl_run -> 导出归档 -> 删除
+    MySQL 分区表按分区 DROP，其他方言按月 DELETE
+    :return: 已处理的月份标签 (pYYYYMM)
+    """
+    cutoff = add_months(month_start(datetime.now()), -retention_months)
+    if is_partitioning_supported():
+        with engine.connect() as conn:
+            partitions = list_partitions(conn)
+        if not partitions:
+            logger.warning(f"{TABLE_NAME} 尚未分区，请先执行 partition_table()")
+            return []
+        expired = [(p, partition_month(p)) for p in partitions]
+        expired = [(p, m) for p, m in expired if m and m < cutoff]
+    else:
+        with engine.connect() as conn:
+            earliest = conn.execute(text(f"SELECT MIN(created_at) FROM {TABLE_NAME}")).scalar()
+        expired = []
+        month = month_start(_to_datetime(earliest)) if earliest else cutoff
+        while month < cutoff:
+            expired.append((partition_name(month), month))
+            month = add_months(month, 1)
+
+    done = []
+    for name, month in expired:
+        end = add_months(month, 1)
+        if dry_run:
+            logger.info(f"[dry-run] 将归档并删除 {TABLE_NAME} {name}")
+            continue
+        summarize_status(month, end)
+        path, count = export_range(
+            archive_dir, name, month, end,
+            partition=name if is_partitioning_supported() else None
+        )
+        with engine.begin() as conn:
+            if is_partitioning_supported():
+                conn.execute(text(f"ALTER TABLE `{TABLE_NAME}` DROP PARTITION {name}"))
+            else:
+                conn.execute(
+                    text(f"DELETE FROM {TABLE_NAME} WHERE created_at >= :start AND created_at < :end"),
+                    {'start': month, 'end': end}
+                )
+        logger.info(f"🗄️ {TABLE_NAME} {name} 已归档 {count} 行 -> {path or '-'}，并已删除")
+        done.append(name)
+    return done
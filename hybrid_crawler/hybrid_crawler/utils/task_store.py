@@ -0,0 +1,186 @@
+"""
+Dashboard 后台任务的状态存储
+
+- TaskStore: 任务状态 (task_id -> 状态字典)，容量上限 + 过期淘汰，落盘为 JSON，重启后可查询历史任务
+- MissingIdStore: 检查得到的缺失数据 (可达数十万条完整记录) 不常驻内存，
+  写为 <爬虫>.ids (每行一个 ID，用于分页预览) 与 <爬虫>.jsonl.gz (完整记录，补采时读取)
+"""
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, List, Optional
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'error', 'interrupted')
+
+
+def _atomic_write_json(path: str, data: Any):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+class TaskStore:
+    """
+    任务状态存储 (线程安全，后台任务在线程池中更新状态)
+    - 超过 max_tasks 时按最近更新时间淘汰已结束的任务；已结束超过 ttl 秒的任务在写入时清理
+    - 每次变更写回 JSON 文件；启动时加载，上次未结束的任务标记为 interrupted
+    """
+
+    def __init__(self, path: str, max_tasks: int = 200, ttl: float = 86400):
+        self.path = path
+        self.max_tasks = max_tasks
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.tasks: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ 读取任务记录失败，从空记录开始: {e}")
+            return
+        for task_id, info in saved:
+            if info.get('status') == 'running':
+                info = dict(info, status='interrupted', message='Dashboard 重启，任务已中断')
+            self.tasks[task_id] = info
+
+    def _evict(self):
+        now = time.time()
+        expired = [
+            task_id for task_id, info in self.tasks.items()
+            if info.get('status') in FINISHED_STATUSES and now - info.get('updated_at', now) > self.ttl
+        ]
+        for task_id in expired:
+            del self.tasks[task_id]
+        # 仍超出容量：从最久未更新的已结束任务开始淘汰，运行中的任务不淘汰
+        for task_id in list(self.tasks):
+            if len(self.tasks) <= self.max_tasks:
+                break
+            if self.tasks[task_id].get('status') in FINISHED_STATUSES:
+                del self.tasks[task_id]
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            _atomic_write_json(self.path, list(self.tasks.items()))
+        except OSError as e:
+            logger.warning(f"⚠️ 保存任务记录失败: {e}")
+
+    def __contains__(self, task_id):
+        return task_id in self.tasks
+
+    def __getitem__(self, task_id):
+        return self.tasks[task_id]
+
+    def __setitem__(self, task_id, info):
+        with self.lock:
+            self.tasks[task_id] = dict(info, updated_at=time.time())
+            self.tasks.move_to_end(task_id)
+            self._evict()
+            self._save()
+
+    def get(self, task_id, default=None):
+        return self.tasks.get(task_id, default)
+
+    def update(self, task_id, **fields):
+        """更新部分字段 (原地修改返回的字典不会落盘，需通过本方法)"""
+        with self.lock:
+            info = self.tasks.get(task_id)
+            if info is None:
+                return
+            self.tasks[task_id] = dict(info, **fields, updated_at=time.time())
+            self.tasks.move_to_end(task_id)
+            self._save()
+
+    def items(self):
+        with self.lock:
+            return list(self.tasks.items())
+
+    def running(self) -> Dict[str, Dict[str, Any]]:
+        return {k: v for k, v in self.items() if v.get('status') == 'running'}
+
+
+class MissingIdStore:
+    """
+    缺失数据落盘存储 (每个爬虫保留最近一次检查结果，超过 ttl 秒视为过期)
+    """
+
+    def __init__(self, root_dir: str, ttl: float = 7 * 86400):
+        self.root_dir = root_dir
+        self.ttl = ttl
+
+    def _paths(self, spider_name: str):
+        base = os.path.join(self.root_dir, spider_name)
+        return f"{base}.ids", f"{base}.jsonl.gz", f"{base}.meta.json"
+
+    def save(self, spider_name: str, missing_data: Optional[Dict[str, Any]]) -> int:
+        """写入检查结果 (替换上一次的结果)，返回条数"""
+        os.makedirs(self.root_dir, exist_ok=True)
+        ids_path, data_path, meta_path = self._paths(spider_name)
+        count = 0
+        with open(f"{ids_path}.tmp", 'w', encoding='utf-8') as ids_file, \
+                gzip.open(f"{data_path}.tmp", 'wt', encoding='utf-8') as data_file:
+            for missing_id, record in (missing_data or {}).items():
+                ids_file.write(f"{missing_id}\n")
+                data_file.write(json.dumps([missing_id, record], ensure_ascii=False, default=str))
+                data_file.write('\n')
+                count += 1
+        os.replace(f"{ids_path}.tmp", ids_path)
+        os.replace(f"{data_path}.tmp", data_path)
+        _atomic_write_json(meta_path, {'count': count, 'created_at': time.time()})
+        return count
+
+    def meta(self, spider_name: str) -> Optional[Dict[str, Any]]:
+        _, _, meta_path = self._paths(spider_name)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - meta.get('created_at', 0) > self.ttl:
+            self.discard(spider_name)
+            return None
+        return meta
+
+    def count(self, spider_name: str) -> int:
+        meta = self.meta(spider_name)
+        return meta['count'] if meta else 0
+
+    def page(self, spider_name: str, offset: int = 0, limit: int = 50) -> List[str]:
+        """分页读取缺失 ID (流式跳过，不加载整个文件)"""
+        if not self.meta(spider_name):
+            return []
+        ids_path, _, _ = self._paths(spider_name)
+        with open(ids_path, 'r', encoding='utf-8') as f:
+            return [line.rstrip('\n') for line in islice(f, offset, offset + limit)]
+
+    def load(self, spider_name: str) -> Dict[str, Any]:
+        """读取完整记录 (补采时使用)"""
+        if not self.meta(spider_name):
+            return {}
+        _, data_path, _ = self._paths(spider_name)
+        missing_data = {}
+        with gzip.open(data_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                missing_id, record = json.loads(line)
+                missing_data[missing_id] = record
+        return missing_data
+
+    def discard(self, spider_name: str):
+        for path in self._paths(spider_name):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -31,6 +31,9 @@ def init_tables():
         from hybrid_crawler.models import Base, engine, init_db
         from hybrid_crawler.models.crawl_status import CrawlStatus
         from hybrid_crawler.models.spider_progress import SpiderProgress
+        from hybrid_crawler.models.write_dead_letter import WriteDeadLetter
+        from hybrid_crawler.models.crawl_run import CrawlRun
+        from hybrid_crawler.models.crawl_metric_bucket import CrawlMetricBucket
         from hybrid_crawler.models.fujian_drug import FujianDrug
         from hybrid_crawler.models.guangdong_drug import GuangdongDrug
         from hybrid_crawler.models.hainan_drug import HainanDrug
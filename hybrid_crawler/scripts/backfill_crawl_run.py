@@ -0,0 +1,30 @@
+import os
+import sys
+import logging
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+env_path = os.path.join(project_root, ".env")
+try:
+    from dotenv import load_dotenv
+    load_dotenv(env_path)
+except Exception:
+    pass
+
+from hybrid_crawler.utils.status_retention import summarize_status
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+
+def backfill() -> None:
+    """
+    一次性将 crawl_run 上线前的 crawl_status 历史汇总进 crawl_run
+    历史数据没有运行边界，按 (爬虫, 日期) 归为一次运行，run_id 为 backfill-<爬虫>-<日期>
+    """
+    summarize_status()
+
+
+if __name__ == "__main__":
+    backfill()
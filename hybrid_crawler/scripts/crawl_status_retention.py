@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+import logging
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+env_path = os.path.join(project_root, ".env")
+try:
+    from dotenv import load_dotenv
+    load_dotenv(env_path)
+except Exception:
+    pass
+
+from hybrid_crawler.utils.status_retention import partition_table, ensure_partitions, expire_partitions
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+RETENTION_MONTHS = int(os.getenv("CRAWL_STATUS_RETENTION_MONTHS", 3))
+PARTITIONS_AHEAD = int(os.getenv("CRAWL_STATUS_PARTITIONS_AHEAD", 2))
+ARCHIVE_DIR = os.getenv("CRAWL_STATUS_ARCHIVE_DIR", os.path.join(project_root, "archive", "crawl_status"))
+
+
+def rotate(retention_months: int = RETENTION_MONTHS, archive_dir: str = ARCHIVE_DIR, dry_run: bool = False) -> None:
+    """预建未来分区，并归档、删除超出保留期的分区 (周任务每次运行前调用)"""
+    ensure_partitions(PARTITIONS_AHEAD)
+    expire_partitions(retention_months, archive_dir, dry_run=dry_run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="crawl_status 按月分区、汇总归档与过期清理")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init", help="将现有 crawl_status 改造为按月分区表 (一次性，会重建表)")
+    rotate_parser = sub.add_parser("rotate", help="预建未来分区，归档并删除过期分区")
+    rotate_parser.add_argument("--retention-months", type=int, default=RETENTION_MONTHS)
+    rotate_parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    rotate_parser.add_argument("--dry-run", action="store_true", help="只列出将要处理的分区")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        partition_table(PARTITIONS_AHEAD)
+    else:
+        rotate(args.retention_months, args.archive_dir, args.dry_run)
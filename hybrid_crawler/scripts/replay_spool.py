@@ -0,0 +1,73 @@
+import os
+import sys
+import argparse
+import logging
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+env_path = os.path.join(project_root, ".env")
+try:
+    from dotenv import load_dotenv
+    load_dotenv(env_path)
+except Exception:
+    pass
+
+os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "hybrid_crawler.settings")
+
+from scrapy.utils.project import get_project_settings
+
+from hybrid_crawler.pipelines import UniversalBatchWritePipeline
+from hybrid_crawler.storage.spool import WriteAheadSpool
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("replay_spool")
+
+
+def list_spool_spiders(spool_dir: str) -> list[str]:
+    if not os.path.isdir(spool_dir):
+        return []
+    return sorted(d for d in os.listdir(spool_dir) if os.path.isdir(os.path.join(spool_dir, d)))
+
+
+def replay(spider_names: list[str], chunk_size: int) -> None:
+    settings = get_project_settings()
+    spool_dir = settings.get("SPOOL_DIR")
+    targets = spider_names or list_spool_spiders(spool_dir)
+    if not targets:
+        logger.info(f"没有需要重放的 WAL: {spool_dir}")
+        return
+
+    storage = UniversalBatchWritePipeline.create_storage(settings)
+    try:
+        for spider_name in targets:
+            storage.open(spider_name)
+            spool = WriteAheadSpool(os.path.join(spool_dir, spider_name))
+            if spool.leftover_segments:
+                logger.info(f"[{spider_name}] 重放 {len(spool.leftover_segments)} 个 WAL 段...")
+                count = spool.replay(storage, chunk_size=chunk_size)
+                if count is None:
+                    logger.error(f"[{spider_name}] 重放中断，段文件已保留")
+                else:
+                    logger.info(f"[{spider_name}] 重放完成: {count} 条")
+            else:
+                logger.info(f"[{spider_name}] 无残留 WAL 段")
+            # 组合存储：各从 Sink 的死信只重放到对应后端
+            if getattr(storage, 'dead_letter_segments', 0):
+                for name, count in storage.replay_dead_letters(chunk_size).items():
+                    if count is None:
+                        logger.error(f"[{spider_name}] {name} 死信重放中断，段文件已保留")
+                    elif count:
+                        logger.info(f"[{spider_name}] {name} 死信重放完成: {count} 条")
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重放批量写入 WAL 中未落库的数据")
+    parser.add_argument("spiders", nargs="*", help="爬虫名称，留空则重放 SPOOL_DIR 下的全部爬虫")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    replay(args.spiders, args.chunk_size)
@@ -32,12 +32,22 @@ from hybrid_crawler.models import nhsa_drug
 from hybrid_crawler.models import ningxia_drug
 from hybrid_crawler.models import shandong_drug
 from hybrid_crawler.models import tianjin_drug
+from hybrid_crawler.models import write_dead_letter
+from hybrid_crawler.models import crawl_run
+from hybrid_crawler.models import crawl_metric_bucket
 from hybrid_crawler.recrawl.manager import RecrawlManager
+from hybrid_crawler.storage.parquet import week_partition, mark_week_complete
+from hybrid_crawler.utils.status_retention import ensure_partitions, expire_partitions
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("weekly_job_runner")
 
-EXCLUDE_TABLES = {"crawl_status", "spider_progress", "crawl_data"}
+EXCLUDE_TABLES = {"crawl_status", "spider_progress", "crawl_data", "write_dead_letter", "crawl_run", "crawl_metric_bucket"}
+STORAGE_BACKENDS = {b.strip().lower() for b in os.getenv("STORAGE_BACKEND", "mysql").split(",")}
+PARQUET_DIR = os.getenv("PARQUET_DIR", os.path.join(project_root, "parquet"))
+CRAWL_STATUS_RETENTION_MONTHS = int(os.getenv("CRAWL_STATUS_RETENTION_MONTHS", 3))
+CRAWL_STATUS_PARTITIONS_AHEAD = int(os.getenv("CRAWL_STATUS_PARTITIONS_AHEAD", 2))
+CRAWL_STATUS_ARCHIVE_DIR = os.getenv("CRAWL_STATUS_ARCHIVE_DIR", os.path.join(project_root, "archive", "crawl_status"))
 
 
 def get_week_suffix(run_dt: datetime) -> str:
@@ -76,14 +86,39 @@ def rename_tables(suffix: str) -> None:
             logger.info(f"已重命名表 {table_name} -> {new_name}")
 
 
+def finalize_parquet(week: str) -> None:
+    """采集直接写出了 Parquet 分区：标记本周分区完整，分析侧直接读取，不再需要 MySQL 导出"""
+    marked = mark_week_complete(PARQUET_DIR, week)
+    if not marked:
+        logger.warning(f"未找到第 {week} 周的 Parquet 分区: {PARQUET_DIR}")
+        return
+    logger.info(f"已标记 {len(marked)} 个 Parquet 分区 (week={week})，跳过 MySQL 导出")
+
+
+def rotate_crawl_status() -> None:
+    """crawl_status 预建未来分区，超出保留期的月份汇总进 crawl_run、归档后删除"""
+    try:
+        ensure_partitions(CRAWL_STATUS_PARTITIONS_AHEAD)
+        expired = expire_partitions(CRAWL_STATUS_RETENTION_MONTHS, CRAWL_STATUS_ARCHIVE_DIR)
+        if expired:
+            logger.info(f"crawl_status 已归档并删除: {', '.join(expired)}")
+    except Exception as e:
+        # 清理失败不影响本周采集，下次运行重试
+        logger.error(f"crawl_status 分区维护失败: {e}")
+
+
 def run_once() -> None:
     logger.info("开始执行周度采集任务")
+    run_dt = datetime.now()
     ensure_tables()
     logger.info("已确认数据库表存在")
+    rotate_crawl_status()
     run_full_crawl()
     logger.info("全量采集完成")
     asyncio.run(run_recrawl())
     logger.info("补充采集完成")
+    if "parquet" in STORAGE_BACKENDS:
+        finalize_parquet(week_partition(run_dt))
     suffix = get_week_suffix(datetime.now())
     rename_tables(suffix)
     ensure_tables()
@@ -29,13 +29,20 @@ from hybrid_crawler.models import nhsa_drug
 from hybrid_crawler.models import ningxia_drug
 from hybrid_crawler.models import shandong_drug
 from hybrid_crawler.models import tianjin_drug
+from hybrid_crawler.models import write_dead_letter
+from hybrid_crawler.models import crawl_run
+from hybrid_crawler.models import crawl_metric_bucket
 from hybrid_crawler.recrawl.manager import RecrawlManager
 from hybrid_crawler.recrawl.registry import get_adapter
+from hybrid_crawler.recrawl.catalog import CATALOG
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("weekly_stats")
 
-EXCLUDE_TABLES = {"crawl_status", "spider_progress", "crawl_data"}
+# 统计时引用的官网目录快照最长时效 (秒)：本周补采时保存的快照，不为统计重新翻页
+CATALOG_MAX_AGE_SEC = 7 * 24 * 3600
+
+EXCLUDE_TABLES = {"crawl_status", "spider_progress", "crawl_data", "write_dead_letter", "crawl_run", "crawl_metric_bucket"}
 
 
 def parse_week_key(table_name: str) -> str:
@@ -52,7 +59,8 @@ def get_adapter_meta() -> dict[str, dict[str, str]]:
         adapter = get_adapter(spider_name)
         if adapter.table_name:
             adapter_meta[adapter.table_name] = {
-                "unique_id": adapter.unique_id or ""
+                "unique_id": adapter.unique_id or "",
+                "spider_name": spider_name
             }
     return adapter_meta
 
@@ -67,6 +75,16 @@ def fetch_distinct_count(conn, table_name: str, column_name: str) -> int:
     return int(result or 0)
 
 
+def log_catalog_coverage(base: str, week_table: str, spider_name: str, distinct_count: int) -> None:
+    """最近一周的表对照官网目录快照：官网条数与已采集的 unique_id 覆盖率"""
+    snapshot = CATALOG.latest(spider_name, max_age=CATALOG_MAX_AGE_SEC)
+    if not snapshot:
+        return
+    fetched_at = datetime.fromtimestamp(snapshot["fetched_at"]).strftime("%Y-%m-%d %H:%M")
+    coverage = distinct_count / snapshot["total"] if snapshot["total"] else 0
+    logger.info(f"{base} 官网目录 {snapshot['total']} 条 (快照 {fetched_at})，{week_table} 覆盖 {coverage:.2%}")
+
+
 def run_stats() -> None:
     inspector = inspect(engine)
     existing_tables = set(inspector.get_table_names())
@@ -81,6 +99,7 @@ def run_stats() -> None:
             week_tables = sorted(week_tables, key=parse_week_key)
             logger.info(f"统计表: {base}")
             prev_count = None
+            distinct_count = None
             for week_table in week_tables:
                 count = fetch_count(conn, week_table)
                 delta = count - prev_count if prev_count is not None else 0
@@ -91,6 +110,8 @@ def run_stats() -> None:
                 else:
                     logger.info(f"{week_table} rows={count} diff={delta}")
                 prev_count = count
+            if distinct_count is not None:
+                log_catalog_coverage(base, week_tables[-1], adapter_meta[base]["spider_name"], distinct_count)
     logger.info(f"统计完成 {datetime.now()}")
 
 
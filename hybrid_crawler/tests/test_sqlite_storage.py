@@ -0,0 +1,53 @@
+"""
+SQLiteStorage 写入真实 Item (collect_time 等时间字段为字符串)
+"""
+import os
+import sys
+import tempfile
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+# models 在导入时按 DATABASE_URL 创建引擎，需先指向临时 SQLite 文件
+_db_dir = tempfile.mkdtemp(prefix='sqlite_storage_test_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+import pytest
+from datetime import datetime
+
+from hybrid_crawler.models import SessionLocal
+from hybrid_crawler.models.hebei_drug import HebeiDrug, HebeiDrugItem
+from hybrid_crawler.storage.sqlite import SQLiteStorage
+
+
+def make_item(prod_code):
+    item = HebeiDrugItem(
+        prodId='1', prodCode=prod_code, prodName='注射用卡非佐米', dosform='注射剂',
+        prodSpec='60mg', prodPac='60mg×1瓶/盒', prodentpName='测试药业', pubonlnPric='1429.59',
+        hospital_name=f'测试医院-{prod_code}', hospital_shp_time='2024-01-02 10:00:00',
+    )
+    item.generate_md5_id()
+    return item
+
+
+@pytest.mark.parametrize('write_mode', ['orm', 'upsert', 'ignore'])
+def test_save_real_items(write_mode):
+    storage = SQLiteStorage(write_mode=write_mode)
+    items = [make_item(f'{write_mode}-{i}') for i in range(3)]
+    assert isinstance(items[0]['collect_time'], str)
+
+    stats = storage.save_batch_stats(items)
+    assert stats['inserted'] == 3
+
+    session = SessionLocal()
+    try:
+        rows = session.query(HebeiDrug).filter(HebeiDrug.prodCode.like(f'{write_mode}-%')).all()
+    finally:
+        session.close()
+    assert len(rows) == 3
+    assert all(isinstance(row.collect_time, datetime) for row in rows)
+
+    # 同一批再次写入：按 md5_id 去重 / 更新，不报错
+    again = storage.save_batch_stats(items)
+    assert again['inserted'] == 0